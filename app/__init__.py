@@ -1,36 +1,23 @@
 import os
 import logging
-from logging.handlers import RotatingFileHandler
 from flask import Flask, session, request, render_template, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from config import config
+from .services.conexiones import SesionEnrutada
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': SesionEnrutada})
+migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 
 def configure_logging(app):
-    """Configura el sistema de logging de la aplicación."""
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    
-    file_handler = RotatingFileHandler(
-        'logs/sis_facturacion.log',
-        maxBytes=10*1024*1024,
-        backupCount=10,
-        encoding='utf-8'
-    )
-    
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    
-    file_handler.setLevel(app.config['LOG_LEVEL'])
-    
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(app.config['LOG_LEVEL'])
+    """Configura el sistema de logging de la aplicación (ver services/registro.py)."""
+    from .services import registro
+
+    registro.configurar(app)
     
     werkzeug_logger = logging.getLogger('werkzeug')
     werkzeug_logger.setLevel(logging.ERROR)
@@ -56,6 +43,9 @@ def create_app(config_name=None):
     )
     
     db.init_app(app)
+    from .services import conexiones
+    conexiones.configurar(app, db)
+    migrate.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
     
@@ -66,11 +56,25 @@ def create_app(config_name=None):
     
     configure_logging(app)
     
+    from .services.identidad import identidades
+    identidades.configurar(maximo=app.config['CACHE_USUARIOS_MAX'], ttl=app.config['CACHE_USUARIOS_TTL'])
+    from .services.catalogo import catalogos
+    catalogos.configurar(ttl=app.config['CATALOGO_TTL'])
+    from .services.facturas import vistas
+    vistas.configurar(maximo=app.config['CACHE_FACTURAS_MAX'], ttl=app.config['CACHE_FACTURAS_TTL'])
+    
     from .routes import main_bp
     from .auth import auth_bp
+    from .commands import register_commands
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
+    register_commands(app)
+
+    from .services import metricas
+    metricas.instrumentar(app)
+    from .services import estaticos
+    estaticos.instalar(app)
 
     @app.route('/favicon.ico')
     def favicon():
@@ -78,59 +82,49 @@ def create_app(config_name=None):
     
     @app.shell_context_processor
     def make_shell_context():
-        from .models import Usuario, Cliente, Producto, Factura, DetalleFactura
+        from .models import Usuario, Cliente, Producto, Factura, DetalleFactura, VentaDiaria
         return {
             'db': db,
             'Usuario': Usuario,
             'Cliente': Cliente,
             'Producto': Producto,
             'Factura': Factura,
-            'DetalleFactura': DetalleFactura
+            'DetalleFactura': DetalleFactura,
+            'VentaDiaria': VentaDiaria
         }
     
     @login_manager.user_loader
     def load_user(user_id):
-        """Carga un usuario o cliente basado en el ID."""
-        from .models import Usuario, Cliente
-        
-        app.logger.debug(f"Intentando cargar usuario con ID: {user_id}")
-        
-        user = db.session.get(Usuario, int(user_id)) if user_id.isdigit() else None
-        
-        if user:
-            app.logger.debug(f"Usuario administrador cargado: {user.email}")
-            return user
+        """Carga un usuario o cliente a partir del id tipado de la sesión (`u:<id>` / `c:<id>`)."""
+        from .services import identidad
         
-        cliente = Cliente.query.filter_by(email=user_id).first()
-        if cliente:
-            app.logger.debug(f"Cliente cargado: {cliente.email}")
-        else:
-            app.logger.warning(f"No se encontró ningún usuario con ID: {user_id}")
-            
-        return cliente
+        usuario = identidad.cargar(user_id)
+        if usuario is None:
+            app.logger.warning("No se encontró ningún usuario con ID: %s", user_id)
+        return usuario
     
     @app.before_request
     def log_request_info():
         if app.logger.isEnabledFor(logging.DEBUG) and app.config.get('LOG_REQUEST_DETAILS'):
-            app.logger.debug(f"Petición: {request.method} {request.path}")
-            app.logger.debug(f"Headers: {dict(request.headers)}")
-            app.logger.debug(f"Sesión: {dict(session)}")
+            app.logger.debug("Petición: %s %s", request.method, request.path)
+            app.logger.debug("Headers: %s", dict(request.headers))
+            app.logger.debug("Sesión: %s", dict(session))
     
     @app.errorhandler(404)
     def page_not_found(e):
         if request.path.endswith('favicon.ico'):
             return ('', 204)
-        app.logger.warning(f'Página no encontrada: {request.url}')
+        app.logger.warning('Página no encontrada: %s', request.url)
         return render_template('errors/404.html'), 404
     
     @app.errorhandler(500)
     def internal_server_error(e):
-        app.logger.error(f'Error interno del servidor: {e}', exc_info=True)
+        app.logger.error('Error interno del servidor: %s', e, exc_info=True)
         return render_template('errors/500.html'), 500
     
     @app.errorhandler(403)
     def forbidden(e):
-        app.logger.warning(f'Acceso denegado: {request.url}')
+        app.logger.warning('Acceso denegado: %s', request.url)
         return render_template('errors/403.html'), 403
     
     return app
@@ -4,13 +4,14 @@ from .forms import LoginForm, ClienteRegistrationForm
 from .models import Usuario, Cliente
 from . import db
 from .constants.messages import msg
+from .services import seguridad
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     current_app.logger.debug("Ruta /login accedida")
-    current_app.logger.debug(f"Método: {request.method}")
+    current_app.logger.debug("Método: %s", request.method)
     if current_user.is_authenticated:
         current_app.logger.debug("Usuario ya autenticado, redirigiendo a index")
         return redirect(url_for('main.index'))
@@ -19,29 +20,50 @@ def login():
 
     if form.validate_on_submit():
         current_app.logger.info("==== INTENTO DE INICIO DE SESIÓN ====")
-        current_app.logger.debug(f"Email proporcionado: {form.email.data}")
+        current_app.logger.debug("Email proporcionado: %s", form.email.data)
+        try:
+            seguridad.registrar_intento(form.email.data, request.remote_addr)
+        except seguridad.LoginLimitado as e:
+            current_app.logger.warning("Inicio de sesión limitado para %s desde %s", form.email.data, request.remote_addr)
+            flash(str(e), 'danger')
+            return render_template('auth/login.html', form=form), 429
         user = Usuario.query.filter_by(email=form.email.data).first()
         if not user:
             user = Cliente.query.filter_by(email=form.email.data).first()
 
         if user:
             current_app.logger.debug("Usuario encontrado en la base de datos")
-            current_app.logger.debug(f"ID del usuario: {getattr(user, 'id', 'N/A')}")
-            current_app.logger.debug(f"Email del usuario: {getattr(user, 'email', 'N/A')}")
-            current_app.logger.debug(f"Tipo de usuario: {'Administrador' if hasattr(user, 'password_hash') and hasattr(user, 'nombre') and hasattr(user, 'verify_password') and hasattr(user, 'id') else 'Cliente'}")
-            if user.verify_password(form.password.data):
+            current_app.logger.debug("ID del usuario: %s", getattr(user, 'id', 'N/A'))
+            current_app.logger.debug("Email del usuario: %s", getattr(user, 'email', 'N/A'))
+            current_app.logger.debug("Tipo de usuario: %s", 'Administrador' if user.is_admin else 'Cliente')
+            try:
+                password_valida = user.verify_password(form.password.data)
+            except seguridad.SobrecargaLogin:
+                current_app.logger.warning("Verificación de contraseña rechazada por sobrecarga")
+                flash('El servidor está ocupado. Intente nuevamente en unos segundos.', 'warning')
+                return render_template('auth/login.html', form=form), 503
+            if password_valida:
                 current_app.logger.info("Contraseña válida - Iniciando sesión...")
+                if seguridad.necesita_rehash(user.password_hash):
+                    try:
+                        user.password_hash = seguridad.generar_hash(form.password.data)
+                        db.session.commit()
+                        current_app.logger.info("Hash de contraseña actualizado a los parámetros vigentes")
+                    except Exception as e:
+                        db.session.rollback()
+                        current_app.logger.error("Error al actualizar el hash de contraseña: %s", e)
+                seguridad.limpiar_intentos(form.email.data, request.remote_addr)
                 remember_field = getattr(form, 'remember', None)
                 remember_value = remember_field.data if remember_field is not None else False
                 login_user(user, remember=remember_value)
                 current_app.logger.info("Usuario autenticado con éxito")
                 next_page = request.args.get('next')
-                current_app.logger.debug(f"Redirigiendo a: {next_page if next_page else 'main.index'}")
+                current_app.logger.debug("Redirigiendo a: %s", next_page or 'main.index')
                 return redirect(next_page or url_for('main.index'))
             else:
                 current_app.logger.warning("La contraseña proporcionada no coincide")
         else:
-            current_app.logger.warning(f"No se encontró ningún usuario con el email: {form.email.data}")
+            current_app.logger.warning("No se encontró ningún usuario con el email: %s", form.email.data)
 
         flash(getattr(msg, 'INVALID_CREDENTIALS', 'Credenciales inválidas'), 'danger')
 
@@ -52,7 +74,7 @@ def register():
     form = ClienteRegistrationForm()
     if form.validate_on_submit():
         current_app.logger.info("==== REGISTRO DE NUEVO CLIENTE ====")
-        current_app.logger.debug(f"Datos del formulario: {form.data}")
+        current_app.logger.debug("Datos del formulario: %s", form.data)
         direccion_field = getattr(form, 'direccion', None)
         telefono_field = getattr(form, 'telefono', None)
         cliente = Cliente(
@@ -66,12 +88,12 @@ def register():
         try:
             db.session.add(cliente)
             db.session.commit()
-            current_app.logger.info(f"Cliente registrado exitosamente: {cliente.email}")
+            current_app.logger.info("Cliente registrado exitosamente: %s", cliente.email)
             flash(getattr(msg, 'CREATE_SUCCESS', 'Creado correctamente').format('Cliente') if hasattr(msg, 'CREATE_SUCCESS') else 'Cliente creado', 'success')
             return redirect(url_for('auth.login'))
         except Exception as e:
             db.session.rollback()
-            current_app.logger.error(f"Error al registrar cliente: {str(e)}")
+            current_app.logger.error("Error al registrar cliente: %s", e)
             flash(getattr(msg, 'UNEXPECTED_ERROR', 'Ocurrió un error inesperado'), 'danger')
 
     return render_template('auth/register.html', form=form)
@@ -79,6 +101,6 @@ def register():
 @auth_bp.route('/logout')
 @login_required
 def logout():
-    current_app.logger.info(f"Cierre de sesión para el usuario: {getattr(current_user, 'email', 'N/A')}")
+    current_app.logger.info("Cierre de sesión para el usuario: %s", getattr(current_user, 'email', 'N/A'))
     logout_user()
     return redirect(url_for('main.index'))
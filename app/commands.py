@@ -0,0 +1,160 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from . import db
+from .services import busqueda, conexiones, estaticos, facturas, importacion, resumenes
+
+resumenes_cli = AppGroup('resumenes', help='Mantenimiento de los resúmenes de ventas.')
+
+
+@resumenes_cli.command('reconstruir')
+def reconstruir_resumenes():
+    """Recalcula la tabla ventas_diarias a partir de todas las facturas."""
+    filas = resumenes.reconstruir()
+    db.session.commit()
+    click.echo(f'Resumen de ventas reconstruido: {filas} filas.')
+
+
+productos_cli = AppGroup('productos', help='Mantenimiento del catálogo de productos.')
+
+
+@productos_cli.command('reindexar')
+def reindexar_productos():
+    """Regenera el índice de búsqueda de texto completo de productos."""
+    filas = busqueda.reconstruir_indice()
+    db.session.commit()
+    click.echo(f'Índice de productos reconstruido: {filas} filas.')
+
+
+replica_cli = AppGroup('replica', help='Réplica de lectura.')
+
+
+@replica_cli.command('sincronizar')
+def sincronizar_replica():
+    """Copia la base principal sobre la réplica (sólo con dos archivos SQLite)."""
+    try:
+        ruta = conexiones.sincronizar_replica()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Réplica sincronizada: {ruta}')
+
+
+facturas_cli = AppGroup('facturas', help='Mantenimiento de las facturas.')
+
+
+@facturas_cli.command('verificar')
+@click.option('--reparar', is_flag=True, help='Recalcula desde las líneas los totales que no coinciden.')
+def verificar_facturas(reparar):
+    """Comprueba que total, cantidad de líneas y de unidades de cada factura coincidan con sus líneas."""
+    diferencias = facturas.verificar_totales()
+    if not diferencias:
+        click.echo('Los totales de todas las facturas coinciden con sus líneas.')
+        return
+    for fila in diferencias[:20]:
+        click.echo(
+            f'Factura {fila.id}: total {fila.total} / {fila.total_real}, '
+            f'líneas {fila.cantidad_lineas} / {fila.lineas}, unidades {fila.cantidad_unidades} / {fila.unidades}',
+            err=True,
+        )
+    if len(diferencias) > 20:
+        click.echo(f'... y {len(diferencias) - 20} más', err=True)
+    if not reparar:
+        raise click.ClickException(f'{len(diferencias)} facturas no coinciden con sus líneas; use --reparar.')
+    reparadas = facturas.reparar_totales([fila.id for fila in diferencias])
+    db.session.commit()
+    click.echo(f'Totales recalculados en {reparadas} facturas; resumen de ventas reconstruido.')
+
+
+importar_cli = AppGroup('import', help='Importación masiva desde archivos CSV o JSONL.')
+
+_archivo = click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+_formato = click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Por defecto, según la extensión.')
+_lote = click.option('--lote', type=click.IntRange(min=1), default=importacion.LOTE, show_default=True,
+                     help='Filas por transacción.')
+
+
+def _informar(resultado, nombre):
+    click.echo(f'{nombre.capitalize()}: {resultado.importadas} filas importadas en {resultado.segundos:.1f} s '
+               f'({resultado.por_segundo:,.0f} filas/s), {resultado.rechazadas} rechazadas.')
+    if resultado.hasheadas:
+        click.echo(f'{resultado.hasheadas} contraseñas hasheadas en {resultado.segundos_hash:.1f} s.')
+    for error in resultado.errores:
+        click.echo(f'  {error}', err=True)
+    if resultado.rechazadas > len(resultado.errores):
+        click.echo(f'  ... y {resultado.rechazadas - len(resultado.errores)} más', err=True)
+
+
+def _importar(funcion, *args, **kwargs):
+    try:
+        return funcion(*args, **kwargs)
+    except importacion.ErrorImportacion as e:
+        raise click.ClickException(str(e))
+
+
+@importar_cli.command('clientes')
+@_archivo
+@_formato
+@_lote
+@click.option('--passwords', type=click.Choice(['diferir', 'omitir']), default='diferir', show_default=True,
+              help='Qué hacer con las contraseñas en texto plano (columna password).')
+@click.option('--workers', type=click.IntRange(min=1), default=os.cpu_count() or 1, show_default=True,
+              help='Procesos para hashear las contraseñas diferidas.')
+def importar_clientes(archivo, formato, lote, passwords, workers):
+    """Importa clientes (nombre, email, direccion, telefono, password o password_hash)."""
+    _informar(_importar(importacion.importar_clientes, archivo, formato, lote, passwords, workers), 'clientes')
+
+
+@importar_cli.command('productos')
+@_archivo
+@_formato
+@_lote
+def importar_productos(archivo, formato, lote):
+    """Importa productos (id opcional, descripcion, precio, stock)."""
+    _informar(_importar(importacion.importar_productos, archivo, formato, lote), 'productos')
+
+
+@importar_cli.command('facturas')
+@_archivo
+@_formato
+@_lote
+def importar_facturas(archivo, formato, lote):
+    """Importa facturas históricas con sus ítems.
+
+    JSONL: una factura por línea con id_cliente, fecha, id opcional e items
+    (id_producto, cantidad, precio_unitario). CSV: un ítem por fila, agrupado
+    por la columna factura.
+    """
+    _informar(_importar(importacion.importar_facturas, archivo, formato, lote), 'facturas')
+
+
+estaticos_cli = AppGroup('estaticos', help='Archivos estáticos versionados.')
+
+
+@estaticos_cli.command('construir')
+@click.option('--sin-minificar', is_flag=True, help='Copia CSS y JS tal cual.')
+@click.option('--limpiar', is_flag=True, help='Borra las versiones que ya no figuran en el manifiesto.')
+def construir_estaticos(sin_minificar, limpiar):
+    """Minifica, versiona por contenido y comprime los estáticos, y escribe el manifiesto."""
+    resultado = estaticos.construir(
+        current_app.static_folder, current_app.config['ESTATICOS_DIR'],
+        minificar=not sin_minificar, limpiar=limpiar,
+    )
+    for original, datos in resultado.items():
+        comprimidos = ' '.join(datos['comprimidos']) or '-'
+        click.echo(f"{original} -> {datos['ruta']} ({datos['original']} -> {datos['bytes']} bytes, {comprimidos})")
+    if estaticos.brotli is None:
+        click.echo('Sin el paquete brotli: sólo se generaron versiones .gz.', err=True)
+    click.echo(f'{len(resultado)} archivos versionados.')
+
+
+def register_commands(app):
+    """Registra los comandos de la CLI `flask` de la aplicación."""
+    app.cli.add_command(resumenes_cli)
+    app.cli.add_command(productos_cli)
+    app.cli.add_command(replica_cli)
+    app.cli.add_command(facturas_cli)
+    app.cli.add_command(importar_cli)
+    app.cli.add_command(estaticos_cli)
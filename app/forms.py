@@ -17,6 +17,7 @@ from wtforms.validators import (
     EqualTo,
     ValidationError,
     NumberRange,
+    Optional,
 )
 from datetime import date
 from .models import Cliente
@@ -75,7 +76,7 @@ class ItemFacturaForm(FlaskForm):
     subtotal = DecimalField('Subtotal', render_kw={'readonly': True})
 
 class FacturaForm(FlaskForm):
-    cliente_id = SelectField('Cliente', coerce=int, validators=[DataRequired()], choices=[])
+    cliente_id = SelectField('Cliente', coerce=int, validators=[DataRequired()], choices=[], validate_choice=False)
     fecha = DateField('Fecha', default=date.today, validators=[DataRequired()])
     items = FieldList(FormField(ItemFacturaForm), min_entries=1)
     submit = SubmitField('Guardar Factura')
@@ -83,5 +84,27 @@ class FacturaForm(FlaskForm):
 class ReporteForm(FlaskForm):
     fecha_desde = DateField('Desde', validators=[DataRequired()])
     fecha_hasta = DateField('Hasta', validators=[DataRequired()])
-    cliente_id = SelectField('Cliente (opcional)', coerce=int)
-    submit = SubmitField('Generar Reporte')
\ No newline at end of file
+    cliente_id = SelectField('Cliente (opcional)', coerce=int, validate_choice=False)
+    agrupacion = SelectField('Agrupar por', default='', choices=[
+        ('', 'Solo por cliente'),
+        ('dia', 'Día'),
+        ('semana', 'Semana'),
+        ('mes', 'Mes'),
+        ('producto', 'Producto'),
+        ('producto_mes', 'Producto y mes'),
+    ])
+    submit = SubmitField('Generar Reporte')
+
+class AnularFacturasForm(FlaskForm):
+    fecha_desde = DateField('Desde', validators=[DataRequired()])
+    fecha_hasta = DateField('Hasta', validators=[DataRequired()])
+    cliente_id = SelectField('Cliente (opcional)', coerce=int, validate_choice=False)
+    submit = SubmitField('Anular Facturas')
+
+class FiltroFacturasForm(FlaskForm):
+    class Meta:
+        csrf = False
+    cliente_id = SelectField('Cliente', coerce=int, choices=[], validators=[Optional()], validate_choice=False)
+    fecha_desde = DateField('Desde', validators=[Optional()])
+    fecha_hasta = DateField('Hasta', validators=[Optional()])
+    submit = SubmitField('Filtrar')
\ No newline at end of file
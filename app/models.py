@@ -1,9 +1,11 @@
 from . import db
 from flask_login import UserMixin
+from collections import Counter
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import CheckConstraint, event
-from sqlalchemy.engine import Engine
+from decimal import Decimal
+from .services.dinero import Dinero, redondear
+from .services.seguridad import generar_hash, verificar
+from sqlalchemy import CheckConstraint
 
 
 class Usuario(db.Model, UserMixin):
@@ -23,10 +25,13 @@ class Usuario(db.Model, UserMixin):
     
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generar_hash(password)
     
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verificar(self.password_hash, password)
+
+    def get_id(self):
+        return f'u:{self.id}'
         
     @property
     def is_admin(self) -> bool:
@@ -36,6 +41,7 @@ class Cliente(db.Model, UserMixin):
     __tablename__ = "clientes"
     __table_args__ = (
         db.Index('idx_cliente_email', 'email', unique=True),
+        db.Index('idx_cliente_nombre', 'nombre', 'id'),
         {'sqlite_autoincrement': True}
     )
     
@@ -48,13 +54,13 @@ class Cliente(db.Model, UserMixin):
     es_cliente = db.Column(db.Boolean, default=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generar_hash(password)
 
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verificar(self.password_hash, password)
 
     def get_id(self):
-        return str(self.email)
+        return f'c:{self.id}'
 
     @property
     def is_admin(self) -> bool:
@@ -63,6 +69,7 @@ class Cliente(db.Model, UserMixin):
 class Producto(db.Model):
     __tablename__ = "productos"
     __table_args__ = (
+        db.Index('idx_producto_descripcion', 'descripcion', 'id'),
         CheckConstraint('precio >= 0', name='check_precio_positivo'),
         CheckConstraint('stock >= 0', name='check_stock_no_negativo'),
         {'sqlite_autoincrement': True}
@@ -70,43 +77,65 @@ class Producto(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     descripcion = db.Column(db.String(200), nullable=False)
-    precio = db.Column(db.Numeric(10, 2), nullable=False)
+    precio = db.Column(Dinero, nullable=False)
     stock = db.Column(db.Integer, default=0, nullable=False)
 
 class Factura(db.Model):
     __tablename__ = "facturas"
     __table_args__ = (
-        db.Index('idx_factura_cliente', 'id_cliente'),
+        # Cubre el listado de un cliente ordenado por fecha y la verificación
+        # de la clave foránea al eliminar clientes.
+        db.Index('idx_factura_cliente_fecha', 'id_cliente', 'fecha', 'id'),
         db.Index('idx_factura_fecha', 'fecha'),
         CheckConstraint('total >= 0', name='check_total_no_negativo'),
+        CheckConstraint('cantidad_lineas >= 0', name='check_cantidad_lineas_no_negativa'),
+        CheckConstraint('cantidad_unidades >= 0', name='check_cantidad_unidades_no_negativa'),
         {'sqlite_autoincrement': True}
     )
     
     id = db.Column(db.Integer, primary_key=True)
     id_cliente = db.Column(db.Integer, db.ForeignKey("clientes.id", ondelete='RESTRICT'), nullable=False)
     fecha = db.Column(db.DateTime, default=lambda: datetime.now(), nullable=False)
-    total = db.Column(db.Numeric(10, 2), default=0.0, nullable=False)
+    # Totales de las líneas, guardados en la factura para que los listados no
+    # tengan que leer detalle_factura. Se mantienen en la misma transacción
+    # que las líneas (ver services/facturas.py) y `flask facturas verificar`
+    # los contrasta con las líneas.
+    total = db.Column(Dinero, default=Decimal('0'), nullable=False)
+    cantidad_lineas = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    cantidad_unidades = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
-    cliente = db.relationship('Cliente', backref=db.backref('facturas', lazy=True, cascade='all, delete-orphan'))
+    # passive_deletes: al eliminar un cliente no se carga su historial; la
+    # clave foránea (RESTRICT) impide borrar uno con facturas.
+    cliente = db.relationship('Cliente', backref=db.backref('facturas', lazy=True, cascade='all, delete-orphan',
+                                                            passive_deletes=True))
     detalles = db.relationship('DetalleFactura', backref='factura', cascade='all, delete-orphan', lazy=True)
 
-    def calcular_total(self):
-        self.total = sum(detalle.subtotal for detalle in self.detalles)
+    def calcular_total(self, detalles=None):
+        """Recalcula total, cantidad de líneas y de unidades a partir de `detalles` (por defecto, las líneas cargadas)."""
+        detalles = self.detalles if detalles is None else detalles
+        self.total = sum((redondear(detalle.subtotal) for detalle in detalles), Decimal('0'))
+        self.cantidad_lineas = len(detalles)
+        self.cantidad_unidades = sum(detalle.cantidad for detalle in detalles)
         return self.total
 
     def actualizar_stock(self):
-        """Resta del stock las cantidades vendidas."""
+        """Resta del stock las cantidades vendidas con UPDATE condicionales.
+
+        Lanza ConflictoStock si algún producto no tiene stock suficiente.
+        """
+        from .services.facturacion import reservar_stock
+        cantidades = Counter()
         for detalle in self.detalles:
-            producto = detalle.producto
-            if producto is None:
-                producto = Producto.query.get(detalle.id_producto)
-            if producto is None:
-                continue
-            producto.stock = (producto.stock or 0) - (detalle.cantidad or 0)
+            cantidades[detalle.id_producto] += detalle.cantidad or 0
+        reservar_stock(cantidades)
 
 class DetalleFactura(db.Model):
     __tablename__ = "detalle_factura"
     __table_args__ = (
+        # Sin él, cada factura borrada recorre toda la tabla al verificar la clave foránea.
+        db.Index('idx_detalle_factura_factura', 'id_factura'),
+        # Idem para los productos: qué facturas los usan y el borrado en cascada.
+        db.Index('idx_detalle_factura_producto', 'id_producto'),
         CheckConstraint('cantidad > 0', name='check_cantidad_positiva'),
         CheckConstraint('precio_unitario >= 0', name='check_precio_unitario_positivo'),
         CheckConstraint('subtotal >= 0', name='check_subtotal_positivo'),
@@ -117,8 +146,8 @@ class DetalleFactura(db.Model):
     id_factura = db.Column(db.Integer, db.ForeignKey("facturas.id", ondelete='CASCADE'), nullable=False)
     id_producto = db.Column(db.Integer, db.ForeignKey("productos.id", ondelete='CASCADE'), nullable=False)
     cantidad = db.Column(db.Integer, nullable=False, default=1)
-    precio_unitario = db.Column(db.Numeric(10, 2), nullable=False)
-    subtotal = db.Column(db.Numeric(10, 2), nullable=False)
+    precio_unitario = db.Column(Dinero, nullable=False)
+    subtotal = db.Column(Dinero, nullable=False)
     
     producto = db.relationship('Producto', backref=db.backref('detalles_factura', passive_deletes=True, lazy=True))
     
@@ -128,15 +157,16 @@ class DetalleFactura(db.Model):
     
     def calcular_subtotal(self):
         if self.precio_unitario is not None and self.cantidad is not None:
-            self.subtotal = float(self.precio_unitario) * int(self.cantidad)
-    
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    try:
-        from sqlite3 import Connection as SQLite3Connection
-        if isinstance(dbapi_connection, SQLite3Connection):
-            cursor = dbapi_connection.cursor()
-            cursor.execute("PRAGMA foreign_keys=ON")
-            cursor.close()
-    except Exception:
-        pass
\ No newline at end of file
+            self.subtotal = redondear(self.precio_unitario) * int(self.cantidad)
+
+class VentaDiaria(db.Model):
+    """Resumen de ventas por día y cliente, mantenido al crear o eliminar facturas."""
+    __tablename__ = "ventas_diarias"
+    __table_args__ = (
+        db.Index('idx_venta_diaria_cliente', 'id_cliente', 'fecha'),
+    )
+
+    fecha = db.Column(db.Date, primary_key=True)
+    id_cliente = db.Column(db.Integer, db.ForeignKey("clientes.id", ondelete='CASCADE'), primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    monto = db.Column(Dinero, nullable=False, default=0)
@@ -1,9 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, abort, Response, stream_with_context, jsonify, send_file
 from flask_login import login_required, current_user
-from datetime import datetime
-from . import db
-from .models import Cliente, Producto, Factura, DetalleFactura
-from .forms import ClienteForm, ClienteCreateForm, ProductoForm, FacturaForm, ReporteForm
+from . import db, csrf
+from .models import Cliente, Producto, Factura
+from .forms import ClienteForm, ClienteCreateForm, ProductoForm, FacturaForm, ReporteForm, FiltroFacturasForm, AnularFacturasForm
+from .services import facturas as facturas_service
+from .services import clientes as clientes_service
+from .services import resumenes
+from .services import reportes as reportes_service
+from .services import exportacion
+from .services import facturacion
+from .services import cache
+from .services import catalogo
+from .services import busqueda
+from .services import documentos
+from .services import conexiones
+from .services import metricas
 from functools import wraps
 
 main_bp = Blueprint("main", __name__)
@@ -17,18 +28,61 @@ def admin_required(f):
         return f(*args, **kwargs)
     return wrapper
 
+
+def _opciones_clientes(campo, primera):
+    """Carga en `campo` las opciones de clientes desde la caché.
+
+    Con catálogos grandes sólo se incluye el cliente ya elegido y el resto se
+    busca con el autocompletado; devuelve True en ese caso.
+    """
+    clientes = catalogo.clientes()
+    limite = current_app.config['CATALOGO_MAX_OPCIONES']
+    opciones = list(clientes.visibles(limite, [campo.data]))
+    if campo.data and clientes.get(campo.data) is None:
+        # Cliente creado en otro worker después de cargar la caché: se lo
+        # muestra igual. Las opciones no validan el campo (validate_choice=False).
+        fila = db.session.query(Cliente.id, Cliente.nombre).filter(Cliente.id == campo.data).first()
+        if fila is not None:
+            opciones.append(catalogo.OpcionCliente(*fila))
+    campo.choices = [primera] + opciones
+    return clientes.es_grande(limite)
+
 @main_bp.route("/")
 @login_required
 def index():
     """Redirige al listado de facturas"""
     return redirect(url_for('main.listar_facturas'))
 
+@main_bp.route("/admin/cache")
+@login_required
+@admin_required
+def estado_cache():
+    """Aciertos, fallos y tamaño de las cachés de este proceso."""
+    return jsonify(cache.estadisticas())
+
+@main_bp.route("/metrics")
+@login_required
+@admin_required
+def exportar_metricas():
+    """Métricas de este proceso en el formato de texto de Prometheus."""
+    return Response(metricas.metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
 @main_bp.route("/clientes")
 @login_required
 @admin_required
 def listar_clientes():
-    clientes = Cliente.query.all()
-    return render_template("clientes/listar.html", clientes=clientes)
+    conexiones.usar_lectura(db.session)
+    texto = request.args.get('q', '').strip()
+    try:
+        pagina = clientes_service.listar_clientes(
+            current_app.config['ITEMS_PER_PAGE'],
+            texto=texto,
+            despues=request.args.get('despues'),
+            antes=request.args.get('antes'),
+        )
+    except ValueError:
+        return abort(400)
+    return render_template("clientes/listar.html", clientes=pagina, pagina=pagina, texto=texto)
 
 @main_bp.route("/clientes/nuevo", methods=['GET', 'POST'])
 @login_required
@@ -70,7 +124,8 @@ def editar_cliente(id):
 @admin_required
 def confirmar_eliminar_cliente(id):
     cliente = Cliente.query.get_or_404(id)
-    return render_template("clientes/eliminar.html", cliente=cliente)
+    return render_template("clientes/eliminar.html", cliente=cliente,
+                           tiene_facturas=clientes_service.tiene_facturas(id))
 
 @main_bp.route("/clientes/eliminar/<int:id>", methods=['POST'])
 @login_required
@@ -78,7 +133,7 @@ def confirmar_eliminar_cliente(id):
 def eliminar_cliente(id):
     cliente = Cliente.query.get_or_404(id)
     try:
-        if cliente.facturas:
+        if clientes_service.tiene_facturas(id):
             flash('No se puede eliminar el cliente porque tiene facturas asociadas', 'danger')
             return redirect(url_for('main.listar_clientes'))
 
@@ -88,7 +143,7 @@ def eliminar_cliente(id):
         return redirect(url_for('main.listar_clientes'))
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f'Error al eliminar cliente {id}: {str(e)}')
+        current_app.logger.error('Error al eliminar cliente %s: %s', id, e)
         flash('Error al eliminar el cliente', 'danger')
         return redirect(url_for('main.listar_clientes'))
 
@@ -96,8 +151,43 @@ def eliminar_cliente(id):
 @login_required
 @admin_required
 def listar_productos():
-    productos = Producto.query.all()
-    return render_template("productos/listar.html", productos=productos)
+    conexiones.usar_lectura(db.session)
+    texto = request.args.get('q', '').strip()
+    try:
+        pagina = busqueda.buscar_productos(
+            current_app.config['ITEMS_PER_PAGE'],
+            texto=texto,
+            despues=request.args.get('despues'),
+            antes=request.args.get('antes'),
+        )
+    except ValueError:
+        return abort(400)
+    return render_template("productos/listar.html", productos=pagina, pagina=pagina, texto=texto)
+
+@main_bp.route("/api/productos")
+@login_required
+@admin_required
+def buscar_productos():
+    """Búsqueda paginada de productos: ?q=texto&despues=cursor."""
+    conexiones.usar_lectura(db.session)
+    por_pagina = max(1, min(request.args.get('por_pagina', current_app.config['ITEMS_PER_PAGE'], type=int), 100))
+    try:
+        pagina = busqueda.buscar_productos(
+            por_pagina,
+            texto=request.args.get('q', ''),
+            despues=request.args.get('despues'),
+            antes=request.args.get('antes'),
+        )
+    except ValueError:
+        return jsonify({'error': 'Cursor de paginación inválido'}), 400
+    return jsonify({
+        'productos': [
+            {'id': p.id, 'descripcion': p.descripcion, 'precio': f"{p.precio:.2f}", 'stock': p.stock}
+            for p in pagina
+        ],
+        'siguiente': pagina.siguiente,
+        'anterior': pagina.anterior,
+    })
 
 @main_bp.route("/productos/nuevo", methods=['GET', 'POST'])
 @login_required
@@ -107,7 +197,7 @@ def nuevo_producto():
     if form.validate_on_submit():
         producto = Producto(
             descripcion=form.descripcion.data,
-            precio=float(form.precio.data) if form.precio.data is not None else 0.0,
+            precio=form.precio.data if form.precio.data is not None else 0,
             stock=form.stock.data if form.stock.data is not None else 0,
         )
         db.session.add(producto)
@@ -140,208 +230,404 @@ def confirmar_eliminar_producto(id):
 @login_required
 @admin_required
 def eliminar_producto(id):
-    current_app.logger.info(f"[POST] Solicitud de eliminación de producto ID={id}")
+    current_app.logger.info("[POST] Solicitud de eliminación de producto ID=%s", id)
     producto = Producto.query.get_or_404(id)
     try:
         db.session.delete(producto)
         db.session.commit()
-        current_app.logger.info(f"Producto ID={id} eliminado correctamente")
+        current_app.logger.info("Producto ID=%s eliminado correctamente", id)
         flash('Producto eliminado correctamente', 'success')
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f'Error al eliminar producto {id}: {str(e)}', exc_info=True)
+        current_app.logger.error('Error al eliminar producto %s: %s', id, e, exc_info=True)
         flash('Error al eliminar el producto', 'danger')
     return redirect(url_for('main.listar_productos'))
 
 @main_bp.route("/facturas")
 @login_required
 def listar_facturas():
+    conexiones.usar_lectura(db.session)
+    filtros = FiltroFacturasForm(formdata=request.args)
+    autocompletar_clientes = False
     if getattr(current_user, "is_admin", False):
-        facturas = Factura.query.all()
+        autocompletar_clientes = _opciones_clientes(filtros.cliente_id, (0, 'Todos'))
+        cliente_id = filtros.cliente_id.data or None
     else:
-        facturas = Factura.query.filter(Factura.id_cliente == current_user.id).all()
-    return render_template("facturas/listar.html", facturas=facturas)
+        cliente_id = current_user.id
+    filtros.validate()
+    try:
+        pagina = facturas_service.listar_facturas(
+            current_app.config['ITEMS_PER_PAGE'],
+            cliente_id=cliente_id,
+            desde=filtros.fecha_desde.data,
+            hasta=filtros.fecha_hasta.data,
+            despues=request.args.get('despues'),
+            antes=request.args.get('antes'),
+        )
+    except ValueError:
+        return abort(400)
+    args_filtro = {k: v for k, v in request.args.items() if k not in ('despues', 'antes')}
+    return render_template("facturas/listar.html", facturas=pagina, pagina=pagina, filtros=filtros, args_filtro=args_filtro,
+                           autocompletar_clientes=autocompletar_clientes)
 
 @main_bp.route("/facturas/nueva", methods=['GET', 'POST'])
 @login_required
 @admin_required
 def nueva_factura():
-    clientes = [(c.id, c.nombre) for c in Cliente.query.all()]
-    clientes_choices = [(0, 'Seleccione un cliente')] + clientes
-    productos = Producto.query.all()
-    productos_choices = [(p.id, f"{p.descripcion} (${p.precio})") for p in productos]
     form = FacturaForm()
-    form.cliente_id.choices = clientes_choices
-    for item in form.items:
-        item.producto_id.choices = productos_choices
+    autocompletar_clientes = _opciones_clientes(form.cliente_id, (0, 'Seleccione un cliente'))
+    catalogo_productos = catalogo.productos()
+    limite = current_app.config['CATALOGO_MAX_OPCIONES']
+    autocompletar_productos = catalogo_productos.es_grande(limite)
+    productos = catalogo_productos.visibles(limite, [item.producto_id.data for item in form.items])
     if form.validate_on_submit():
-        fecha_factura = datetime.combine(form.fecha.data, datetime.now().time()) if form.fecha.data else datetime.now()
-        factura = Factura(id_cliente=form.cliente_id.data, fecha=fecha_factura)
-        hubo_error = False
-        for idx, item in enumerate(form.items):
-            current_app.logger.info(
-                f"Procesando item {idx}: producto_id={item.producto_id.data}, cantidad={item.cantidad.data}, precio={item.precio_unitario.data}"
-            )
-            producto = Producto.query.get(item.producto_id.data)
-            if not producto:
-                item.producto_id.errors.append('Producto inválido o inexistente')
-                hubo_error = True
-                continue
-            try:
-                cantidad_solicitada = int(item.cantidad.data or 0)
-            except Exception:
-                cantidad_solicitada = 0
-            if cantidad_solicitada <= 0:
-                item.cantidad.errors.append('Cantidad debe ser mayor a 0')
-                hubo_error = True
-                continue
-            if (producto.stock or 0) < cantidad_solicitada:
-                item.cantidad.errors.append('Cantidad supera el stock disponible')
-                hubo_error = True
-                continue
-            detalle = DetalleFactura(
-                id_producto=producto.id,
-                cantidad=item.cantidad.data,
-                precio_unitario=float(item.precio_unitario.data or 0),
-                subtotal=float(item.cantidad.data or 0) * float(item.precio_unitario.data or 0)
-            )
-            factura.detalles.append(detalle)
-        if hubo_error or len(factura.detalles) == 0:
-            flash('Corrige los errores en los ítems de la factura.', 'danger')
-            precios_por_producto = {p.id: p.precio for p in productos}
-            return render_template("facturas/nueva_factura.html", form=form, productos=productos, precios_por_producto=precios_por_producto)
-        
+        datos = {
+            'id_cliente': form.cliente_id.data,
+            'fecha': form.fecha.data,
+            'items': [
+                {
+                    'id_producto': item.producto_id.data,
+                    'cantidad': item.cantidad.data,
+                    'precio_unitario': item.precio_unitario.data,
+                }
+                for item in form.items
+            ],
+        }
         try:
-            factura.calcular_total()
-            factura.actualizar_stock()
-            db.session.add(factura)
-            for detalle in factura.detalles:
-                producto = detalle.producto or Producto.query.get(detalle.id_producto)
-                if producto and producto.stock < 0:
-                    raise ValueError(f"Stock insuficiente para el producto: {producto.descripcion}")
-            db.session.commit()
-            flash('Factura creada exitosamente', 'success')
-            return redirect(url_for('main.listar_facturas'))
-            
-        except ValueError as ve:
+            resultado = facturacion.crear_facturas([datos])[0]
+            if resultado['ok']:
+                db.session.commit()
+                documentos.encolar([resultado['id']])
+                current_app.logger.info("Factura %s creada con %s ítems", resultado['id'], len(form.items))
+                flash('Factura creada exitosamente', 'success')
+                return redirect(url_for('main.listar_facturas'))
+
+            db.session.rollback()
+            if resultado['item'] is not None and resultado['campo'] in ('producto_id', 'cantidad', 'precio_unitario'):
+                campo = getattr(form.items[resultado['item']], resultado['campo'])
+                campo.errors.append(resultado['error'])
+                flash('Corrige los errores en los ítems de la factura.', 'danger')
+            else:
+                flash(resultado['error'], 'danger')
+
+        except facturacion.ConflictoStock as e:
             db.session.rollback()
-            flash(str(ve), 'danger')
+            flash(str(e), 'danger')
         except Exception as e:
             db.session.rollback()
             current_app.logger.exception("Error al guardar la factura")
             flash(f"Error al guardar la factura: {str(e)}", 'danger')
         
-        precios_por_producto = {p.id: p.precio for p in productos}
-        return render_template("facturas/nueva_factura.html", form=form, productos=productos, precios_por_producto=precios_por_producto)
     elif request.method == 'POST':
         flash(f"Errores al validar la factura: {form.errors}", 'danger')
     precios_por_producto = {p.id: p.precio for p in productos}
-    return render_template("facturas/nueva_factura.html", form=form, productos=productos, precios_por_producto=precios_por_producto)
+    return render_template(
+        "facturas/nueva_factura.html",
+        form=form,
+        productos=productos,
+        precios_por_producto=precios_por_producto,
+        autocompletar_clientes=autocompletar_clientes,
+        autocompletar_productos=autocompletar_productos,
+    )
+
+@main_bp.route("/api/catalogo/<nombre>")
+@login_required
+@admin_required
+def autocompletar(nombre):
+    """Busca clientes o productos cuyo nombre empieza con `q`."""
+    prefijo = request.args.get('q', '')
+    limite = current_app.config['CATALOGO_AUTOCOMPLETAR_LIMITE']
+    limite = max(1, min(request.args.get('limite', limite, type=int), 100))
+    if nombre == 'clientes':
+        resultados = [{'id': c.id, 'texto': c.nombre} for c in catalogo.clientes().buscar(prefijo, limite)]
+    elif nombre == 'productos':
+        resultados = [
+            {
+                'id': p.id,
+                'texto': f"{p.descripcion} (${p.precio:.2f}) - Stock: {p.stock}",
+                'precio': f"{p.precio:.2f}",
+                'stock': p.stock,
+            }
+            for p in catalogo.productos().buscar(prefijo, limite)
+        ]
+    else:
+        return abort(404)
+    return jsonify({'resultados': resultados})
+
+@main_bp.route("/api/facturas/lote", methods=['POST'])
+@csrf.exempt
+@login_required
+@admin_required
+def crear_facturas_lote():
+    """Crea un lote de facturas enviado como JSON: {"facturas": [...]}."""
+    if not request.is_json:
+        return jsonify({'error': 'Se esperaba un cuerpo JSON'}), 415
+    datos = request.get_json(silent=True)
+    lote = datos.get('facturas') if isinstance(datos, dict) else None
+    if not isinstance(lote, list):
+        return jsonify({'error': 'El cuerpo debe incluir la lista "facturas"'}), 400
+    if len(lote) > current_app.config['FACTURAS_LOTE_MAX']:
+        return jsonify({'error': f"El lote supera el máximo de {current_app.config['FACTURAS_LOTE_MAX']} facturas"}), 413
+
+    try:
+        resultados = facturacion.crear_facturas(lote)
+        db.session.commit()
+    except facturacion.ConflictoStock as e:
+        db.session.rollback()
+        current_app.logger.warning("Lote de facturas revertido: %s", e)
+        return jsonify({'error': str(e)}), 409
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Error al guardar el lote de facturas")
+        return jsonify({'error': 'Error al guardar el lote de facturas'}), 500
+
+    documentos.encolar([r['id'] for r in resultados if r['ok']])
+    creadas = sum(1 for r in resultados if r['ok'])
+    current_app.logger.info("Lote de facturas procesado: %s creadas, %s rechazadas", creadas, len(resultados) - creadas)
+    for resultado in resultados:
+        if 'total' in resultado:
+            resultado['total'] = '%.2f' % resultado['total']
+    return jsonify({
+        'creadas': creadas,
+        'rechazadas': len(resultados) - creadas,
+        'resultados': resultados,
+    })
 
 @main_bp.route("/facturas/<int:id>")
 @login_required
 def ver_factura(id):
-    factura = Factura.query.get_or_404(id)
-    if getattr(current_user, "is_admin", False) or (factura.id_cliente == getattr(current_user, "id", None)):
-        return render_template("facturas/ver_factura.html", factura=factura)
+    conexiones.usar_lectura(db.session)
+    vista = facturas_service.vista_factura(id)
+    if vista is None:
+        return abort(404)
+    if getattr(current_user, "is_admin", False) or (vista.id_cliente == getattr(current_user, "id", None)):
+        return render_template("facturas/ver_factura.html", id=id, vista=vista)
     return abort(403)
 
+@main_bp.route("/api/facturas/<int:id>")
+@login_required
+def ver_factura_json(id):
+    conexiones.usar_lectura(db.session)
+    vista = facturas_service.vista_factura(id)
+    if vista is None:
+        return jsonify({'error': 'Factura no encontrada'}), 404
+    if getattr(current_user, "is_admin", False) or (vista.id_cliente == getattr(current_user, "id", None)):
+        return jsonify(vista.datos)
+    return jsonify({'error': 'Acceso denegado'}), 403
+
+@main_bp.route("/facturas/<int:id>/pdf")
+@login_required
+def ver_factura_pdf(id):
+    conexiones.usar_lectura(db.session)
+    vista = facturas_service.vista_factura(id)
+    if vista is None:
+        return abort(404)
+    if not (getattr(current_user, "is_admin", False) or (vista.id_cliente == getattr(current_user, "id", None))):
+        return abort(403)
+    return send_file(
+        documentos.archivo_pdf(vista.datos),
+        mimetype='application/pdf',
+        download_name=documentos.nombre_archivo(vista.datos),
+        conditional=True,
+        max_age=3600,
+    )
+
+@main_bp.route("/facturas/pdf/lote")
+@login_required
+@admin_required
+def facturas_pdf_lote():
+    """ZIP con los PDFs de las facturas de un rango de fechas."""
+    conexiones.usar_lectura(db.session)
+    form = ReporteForm(formdata=request.args, meta={'csrf': False})
+    _opciones_clientes(form.cliente_id, (0, 'Todos'))
+    if not form.validate() or form.fecha_desde.data > form.fecha_hasta.data:
+        current_app.logger.warning("Lote de PDFs rechazado por filtros inválidos: %s", form.errors)
+        return abort(400)
+    fecha_desde = form.fecha_desde.data
+    fecha_hasta = form.fecha_hasta.data
+    nombre = f"facturas_{fecha_desde.isoformat()}_{fecha_hasta.isoformat()}.zip"
+    current_app.logger.info("Generando lote de PDFs %s", nombre)
+    return Response(
+        stream_with_context(documentos.generar_zip(fecha_desde, fecha_hasta, cliente_id=form.cliente_id.data or None)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{nombre}"'},
+    )
+
 @main_bp.route("/reportes", methods=['GET', 'POST'])
 @login_required
 @admin_required
 def reportes():
+    resultados_vacios = {'facturas': [], 'ventas_total': 0, 'cantidad_facturas': 0, 'por_cliente': [], 'agrupado': []}
+    conexiones.usar_lectura(db.session)
     try:
         current_app.logger.info("Accediendo a la ruta de reportes")
-        form = ReporteForm()
+        # Los enlaces de paginación del detalle reenvían los filtros por GET.
+        por_get = request.method == 'GET' and 'fecha_desde' in request.args
+        if por_get:
+            form = ReporteForm(formdata=request.args, meta={'csrf': False})
+        else:
+            form = ReporteForm()
         try:
-            clientes = Cliente.query.all()
-            form.cliente_id.choices = [(0, 'Todos')] + [(c.id, c.nombre) for c in clientes]
-            current_app.logger.debug(f"Clientes cargados: {len(clientes)}")
+            autocompletar_clientes = _opciones_clientes(form.cliente_id, (0, 'Todos'))
         except Exception as e:
-            current_app.logger.error(f"Error al cargar clientes: {str(e)}", exc_info=True)
+            current_app.logger.error("Error al cargar clientes: %s", e, exc_info=True)
             flash("Error al cargar la lista de clientes", 'danger')
-            clientes = []
+            autocompletar_clientes = False
             form.cliente_id.choices = [(0, 'Todos')]
         
-        resultados = {'facturas': [], 'ventas_total': 0, 'por_cliente': []}
+        resultados = dict(resultados_vacios)
+        args_reporte = {}
         
-        if form.validate_on_submit():
+        if form.validate() if por_get else form.validate_on_submit():
             try:
-                current_app.logger.info(f"Generando reporte con datos: {form.data}")
+                current_app.logger.info("Generando reporte con datos: %s", form.data)
                 if form.fecha_desde.data > form.fecha_hasta.data:
                     flash("La fecha de inicio no puede ser posterior a la fecha final", 'danger')
-                    return render_template('reportes.html', form=form, resultados=resultados)
+                    return render_template('reportes.html', form=form, resultados=resultados, args_reporte=args_reporte,
+                                           autocompletar_clientes=autocompletar_clientes)
                 fecha_desde = form.fecha_desde.data
                 fecha_hasta = form.fecha_hasta.data
-                current_app.logger.debug(f"Buscando facturas entre {fecha_desde} y {fecha_hasta} (por fecha de día)")
-                query = Factura.query.options(db.joinedload(Factura.cliente)).filter(
-                    db.func.date(Factura.fecha) >= fecha_desde,
-                    db.func.date(Factura.fecha) <= fecha_hasta,
+                cliente_id = form.cliente_id.data or None
+                current_app.logger.debug("Buscando facturas entre %s y %s (por fecha de día)", fecha_desde, fecha_hasta)
+
+                por_cliente, ventas_total, cantidad = resumenes.totales_por_cliente(
+                    fecha_desde, fecha_hasta, cliente_id=cliente_id
                 )
+                resultados['por_cliente'] = por_cliente
+                resultados['ventas_total'] = ventas_total
+                resultados['cantidad_facturas'] = cantidad
 
-                if form.cliente_id.data != 0:
-                    current_app.logger.debug(f"Filtrando por cliente ID: {form.cliente_id.data}")
-                    query = query.filter(Factura.id_cliente == form.cliente_id.data)
-                resultados['facturas'] = query.order_by(Factura.fecha.asc()).all()
-                current_app.logger.debug(f"Se encontraron {len(resultados['facturas'])} facturas")
-                resultados['ventas_total'] = sum(float(f.total) if f.total is not None else 0.0 for f in resultados['facturas'])
-                totales = {}
-                for factura in resultados['facturas']:
-                    try:
-                        cid = factura.id_cliente
-                        cliente_nombre = factura.cliente.nombre if (factura and factura.cliente) else 'Cliente no encontrado'
-
-                        if cid not in totales:
-                            totales[cid] = {
-                                'cliente_id': cid,
-                                'cliente_nombre': cliente_nombre,
-                                'monto_total': 0.0,
-                                'cantidad': 0,
-                            }
-
-                        totales[cid]['monto_total'] += float(factura.total) if factura.total is not None else 0.0
-                        totales[cid]['cantidad'] += 1
-
-                    except Exception as e:
-                        current_app.logger.error(f"Error procesando factura ID {getattr(factura, 'id', 'N/A')}: {str(e)}", exc_info=True)
-                        continue
-
-                resultados['por_cliente'] = sorted(totales.values(), key=lambda x: x['cliente_nombre'])
+                agrupacion = form.agrupacion.data
+                if agrupacion in reportes_service.PERIODOS:
+                    resultados['agrupado'] = reportes_service.por_periodo(
+                        fecha_desde, fecha_hasta, periodo=agrupacion, cliente_id=cliente_id
+                    )
+                elif agrupacion in ('producto', 'producto_mes'):
+                    resultados['agrupado'] = reportes_service.por_producto(
+                        fecha_desde, fecha_hasta,
+                        periodo='mes' if agrupacion == 'producto_mes' else None,
+                        cliente_id=cliente_id,
+                    )
+
+                resultados['facturas'] = facturas_service.listar_facturas(
+                    current_app.config['ITEMS_PER_PAGE'],
+                    cliente_id=cliente_id,
+                    desde=fecha_desde,
+                    hasta=fecha_hasta,
+                    despues=request.args.get('despues'),
+                    antes=request.args.get('antes'),
+                    descendente=False,
+                )
+                args_reporte = {
+                    'fecha_desde': fecha_desde.isoformat(),
+                    'fecha_hasta': fecha_hasta.isoformat(),
+                    'cliente_id': form.cliente_id.data or 0,
+                    'agrupacion': agrupacion,
+                }
+                current_app.logger.debug("Se encontraron %s facturas", cantidad)
                 current_app.logger.info("Reporte generado exitosamente")
 
             except Exception as e:
-                current_app.logger.error(f"Error al generar reporte: {str(e)}", exc_info=True)
+                current_app.logger.error("Error al generar reporte: %s", e, exc_info=True)
                 flash(f"Error al generar el reporte: {str(e)}", 'danger')
                 
-        elif request.method == 'POST':
+        elif request.method == 'POST' or por_get:
             error_msgs = ", ".join([f"{field}: {', '.join(errors)}" for field, errors in form.errors.items()])
-            current_app.logger.warning(f"Error de validación en el formulario: {error_msgs}")
+            current_app.logger.warning("Error de validación en el formulario: %s", error_msgs)
             flash(f"Por favor corrija los errores en el formulario: {error_msgs}", 'danger')
             
-        return render_template('reportes.html', form=form, resultados=resultados)
+        return render_template('reportes.html', form=form, resultados=resultados, args_reporte=args_reporte,
+                               autocompletar_clientes=autocompletar_clientes)
         
     except Exception as e:
-        current_app.logger.critical(f"Error inesperado en reportes: {str(e)}", exc_info=True)
+        current_app.logger.critical("Error inesperado en reportes: %s", e, exc_info=True)
         flash("Ocurrió un error inesperado al procesar la solicitud. Por favor intente nuevamente.", 'danger')
-        return render_template('reportes.html', form=form, resultados={'facturas': [], 'ventas_total': 0, 'por_cliente': []})
+        return render_template('reportes.html', form=form, resultados=resultados_vacios, args_reporte={})
+
+@main_bp.route("/reportes/exportar/<formato>")
+@login_required
+@admin_required
+def exportar_reporte(formato):
+    if formato not in ('csv', 'xlsx'):
+        return abort(404)
+    conexiones.usar_lectura(db.session)
+    tipo = request.args.get('tipo', 'facturas')
+    if tipo not in exportacion.FILAS:
+        return abort(400)
+
+    form = ReporteForm(formdata=request.args, meta={'csrf': False})
+    _opciones_clientes(form.cliente_id, (0, 'Todos'))
+    if not form.validate() or form.fecha_desde.data > form.fecha_hasta.data:
+        current_app.logger.warning("Exportación rechazada por filtros inválidos: %s", form.errors)
+        return abort(400)
+
+    fecha_desde = form.fecha_desde.data
+    fecha_hasta = form.fecha_hasta.data
+    filas = exportacion.FILAS[tipo](fecha_desde, fecha_hasta, cliente_id=form.cliente_id.data or None)
+    encabezado = exportacion.ENCABEZADOS[tipo]
+    nombre = f"reporte_{tipo}_{fecha_desde.isoformat()}_{fecha_hasta.isoformat()}.{formato}"
+    current_app.logger.info("Exportando reporte %s", nombre)
+
+    if formato == 'csv':
+        cuerpo = exportacion.generar_csv(encabezado, filas)
+        mimetype = 'text/csv; charset=utf-8'
+    else:
+        cuerpo = exportacion.generar_xlsx(encabezado, filas)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return Response(
+        stream_with_context(cuerpo),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{nombre}"'},
+    )
 
 @main_bp.route("/facturas/eliminar/<int:id>", methods=['GET'])
 @login_required
+@admin_required
 def confirmar_eliminar_factura(id):
     factura = Factura.query.get_or_404(id)
     return render_template("facturas/eliminar.html", factura=factura)
 
 @main_bp.route("/facturas/eliminar/<int:id>", methods=['POST'])
 @login_required
+@admin_required
 def eliminar_factura(id):
-    factura = Factura.query.get_or_404(id)
     try:
-        db.session.delete(factura)
+        eliminadas = facturacion.eliminar_facturas(Factura.id == id)
         db.session.commit()
-        flash('Factura eliminada correctamente', 'success')
-        return redirect(url_for('main.listar_facturas'))
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f'Error al eliminar factura {id}: {str(e)}')
+        current_app.logger.error('Error al eliminar factura %s: %s', id, e)
         flash('Error al eliminar la factura', 'danger')
-        return redirect(url_for('main.listar_facturas'))
\ No newline at end of file
+        return redirect(url_for('main.listar_facturas'))
+    if not eliminadas:
+        return abort(404)
+    facturas_service.invalidar_vista(id)
+    flash('Factura eliminada correctamente', 'success')
+    return redirect(url_for('main.listar_facturas'))
+
+@main_bp.route("/facturas/anular", methods=['GET', 'POST'])
+@login_required
+@admin_required
+def anular_facturas():
+    form = AnularFacturasForm()
+    autocompletar_clientes = _opciones_clientes(form.cliente_id, (0, 'Todos'))
+    if form.validate_on_submit():
+        desde, hasta = form.fecha_desde.data, form.fecha_hasta.data
+        if desde > hasta:
+            flash("La fecha de inicio no puede ser posterior a la fecha final", 'danger')
+        else:
+            condicion = facturas_service.condicion_facturas(form.cliente_id.data or None, desde, hasta)
+            try:
+                ids = facturacion.eliminar_facturas(condicion)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception('Error al anular las facturas entre %s y %s', desde, hasta)
+                flash('Error al anular las facturas', 'danger')
+            else:
+                for id in ids:
+                    facturas_service.invalidar_vista(id)
+                current_app.logger.info('%s facturas anuladas entre %s y %s', len(ids), desde, hasta)
+                flash(f'{len(ids)} facturas anuladas; se devolvió el stock de sus productos', 'success')
+                return redirect(url_for('main.listar_facturas'))
+    return render_template("facturas/anular.html", form=form, autocompletar_clientes=autocompletar_clientes)
\ No newline at end of file
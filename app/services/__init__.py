@@ -0,0 +1 @@
+"""Servicios de la aplicación: consultas y operaciones reutilizables por las rutas."""
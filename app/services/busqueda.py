@@ -0,0 +1,150 @@
+import re
+import weakref
+
+from sqlalchemy import DDL, column, event, false, inspect, literal_column, select, table
+
+from .. import db
+from ..models import Producto
+from .paginacion import paginar_keyset
+
+TABLA_FTS = 'productos_fts'
+
+# Guarda su propia copia de la descripción (no es external content) para
+# poder borrar filas por rowid sin conocer el texto anterior.
+CREAR_FTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+    "descripcion, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+# Sin FTS5, la búsqueda compara `lower(descripcion) LIKE 'texto%'`: en
+# PostgreSQL sólo la resuelve un índice sobre esa expresión con
+# `text_pattern_ops` (el operador por defecto no sirve para LIKE salvo en la
+# collation C).
+INDICE_MINUSCULAS = 'idx_producto_descripcion_minusculas'
+CREAR_INDICE_MINUSCULAS = (
+    f'CREATE INDEX IF NOT EXISTS {INDICE_MINUSCULAS} ON productos (lower(descripcion) text_pattern_ops)'
+)
+
+_fts = table(TABLA_FTS, column('rowid'), column('descripcion'))
+_disponible = weakref.WeakKeyDictionary()
+
+
+def fts_disponible(conexion):
+    """Indica si la base de `conexion` es SQLite y tiene el índice FTS5 de productos."""
+    if conexion.dialect.name != 'sqlite':
+        return False
+    motor = conexion.engine
+    if motor not in _disponible:
+        _disponible[motor] = conexion.execute(
+            db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"),
+            {'nombre': TABLA_FTS},
+        ).first() is not None
+    return _disponible[motor]
+
+
+def consulta_fts(texto):
+    """Convierte lo escrito por el usuario en una consulta MATCH de prefijos.
+
+    Cada palabra se busca como prefijo y todas deben aparecer: `lap 15` ->
+    `"lap"* "15"*`. Devuelve None si no queda ninguna palabra.
+    """
+    palabras = re.findall(r'\w+', texto or '')
+    if not palabras:
+        return None
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def filtrar_productos(query, texto):
+    """Restringe `query` a los productos que coinciden con `texto`.
+
+    En SQLite con FTS5 cada palabra puede estar en cualquier parte de la
+    descripción; en el resto de los motores se busca la descripción que
+    empieza con `texto`, sin distinguir mayúsculas (en PostgreSQL, por
+    `INDICE_MINUSCULAS`).
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return query
+    if fts_disponible(db.session.connection()):
+        consulta = consulta_fts(texto)
+        if consulta is None:
+            return query.filter(false())
+        coincidencias = select(_fts.c.rowid).where(literal_column(TABLA_FTS).op('MATCH')(consulta))
+        return query.filter(Producto.id.in_(coincidencias))
+    patron = escapar_like(texto.lower()) + '%'
+    return query.filter(db.func.lower(Producto.descripcion).like(patron, escape='\\'))
+
+
+def buscar_productos(por_pagina, texto=None, despues=None, antes=None):
+    """Página de productos ordenada por descripción, opcionalmente filtrada por `texto`."""
+    query = filtrar_productos(Producto.query, texto)
+    return paginar_keyset(
+        query,
+        [Producto.descripcion, Producto.id],
+        por_pagina,
+        despues=despues,
+        antes=antes,
+        descendente=False,
+    )
+
+
+def reconstruir_indice():
+    """Regenera el índice FTS desde `productos`; devuelve la cantidad de filas indexadas.
+
+    Hace falta tras cargas masivas que no pasan por el ORM.
+    """
+    conexion = db.session.connection()
+    if not fts_disponible(conexion):
+        return 0
+    conexion.execute(db.text(f'DELETE FROM {TABLA_FTS}'))
+    resultado = conexion.execute(db.text(
+        f'INSERT INTO {TABLA_FTS} (rowid, descripcion) SELECT id, descripcion FROM productos'
+    ))
+    return resultado.rowcount
+
+
+# --- Sincronización con el modelo --------------------------------------------
+
+def _indexar(conexion, producto):
+    conexion.execute(
+        _fts.insert().values(rowid=producto.id, descripcion=producto.descripcion)
+    )
+
+
+def _desindexar(conexion, id):
+    conexion.execute(_fts.delete().where(_fts.c.rowid == id))
+
+
+@event.listens_for(Producto, 'after_insert')
+def _producto_creado(mapper, conexion, producto):
+    if fts_disponible(conexion):
+        _indexar(conexion, producto)
+
+
+@event.listens_for(Producto, 'after_update')
+def _producto_modificado(mapper, conexion, producto):
+    if fts_disponible(conexion) and inspect(producto).attrs.descripcion.history.has_changes():
+        _desindexar(conexion, producto.id)
+        _indexar(conexion, producto)
+
+
+@event.listens_for(Producto, 'after_delete')
+def _producto_eliminado(mapper, conexion, producto):
+    if fts_disponible(conexion):
+        _desindexar(conexion, producto.id)
+
+
+def _olvidar_motor(tabla, conexion, **kwargs):
+    _disponible.pop(conexion.engine, None)
+
+
+# Las bases creadas con `db.create_all()` (pruebas, benchmarks) también tienen los índices.
+event.listen(Producto.__table__, 'after_create', DDL(CREAR_FTS).execute_if(dialect='sqlite'))
+event.listen(Producto.__table__, 'after_create', DDL(CREAR_INDICE_MINUSCULAS).execute_if(dialect='postgresql'))
+event.listen(Producto.__table__, 'after_create', _olvidar_motor)
+event.listen(Producto.__table__, 'before_drop', DDL(f'DROP TABLE IF EXISTS {TABLA_FTS}').execute_if(dialect='sqlite'))
+event.listen(Producto.__table__, 'after_drop', _olvidar_motor)
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Todas las cachés creadas en el proceso, por nombre, para exponer sus contadores.
+REGISTRO = {}
+
+
+class CacheTTL:
+    """Caché LRU en memoria del proceso con vencimiento por tiempo.
+
+    Cada worker de gunicorn tiene su propia copia: una invalidación sólo
+    afecta al proceso que la ejecuta y el resto ve el cambio, a más tardar,
+    cuando vence el TTL.
+    """
+
+    def __init__(self, nombre, maximo=1024, ttl=60):
+        self.nombre = nombre
+        self.maximo = maximo
+        self.ttl = ttl
+        self.aciertos = 0
+        self.fallos = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        REGISTRO[nombre] = self
+
+    def configurar(self, maximo=None, ttl=None):
+        with self._lock:
+            if maximo is not None:
+                self.maximo = maximo
+            if ttl is not None:
+                self.ttl = ttl
+            self._datos.clear()
+
+    def get(self, clave, defecto=None):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < ahora:
+                if entrada is not None:
+                    del self._datos[clave]
+                self.fallos += 1
+                return defecto
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def set(self, clave, valor):
+        if self.maximo <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'maximo': self.maximo,
+                'ttl': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / total, 4) if total else 0.0,
+            }
+
+
+def estadisticas():
+    """Contadores de todas las cachés registradas en este proceso."""
+    return {nombre: cache.estadisticas() for nombre, cache in REGISTRO.items()}
@@ -0,0 +1,128 @@
+from bisect import bisect_left
+from collections import namedtuple
+from threading import Lock
+
+from sqlalchemy import event
+
+from .. import db
+from ..models import Cliente, Producto
+from .cache import CacheTTL
+from .conexiones import en_principal
+
+OpcionCliente = namedtuple('OpcionCliente', 'id nombre')
+OpcionProducto = namedtuple('OpcionProducto', 'id descripcion precio stock')
+
+catalogos = CacheTTL('catalogos', maximo=8, ttl=300)
+
+# Versión vigente de cada catálogo en este proceso; forma parte de la clave
+# de la caché, así que incrementarla descarta la lista anterior. En los demás
+# workers la lista puede quedar atrasada hasta CATALOGO_TTL: sirve para
+# mostrar opciones, no para validar (los SelectField de clientes usan
+# validate_choice=False y la existencia se comprueba al guardar).
+_versiones = {'clientes': 0, 'productos': 0}
+_versiones_lock = Lock()
+_MODELOS = {Cliente: 'clientes', Producto: 'productos'}
+_CLAVE_SESION = 'catalogos_modificados'
+
+
+class Catalogo:
+    """Lista de opciones ordenada por nombre, con búsqueda por prefijo en memoria."""
+
+    def __init__(self, filas, nombre):
+        self.filas = sorted(filas, key=lambda fila: getattr(fila, nombre).casefold())
+        self._claves = [getattr(fila, nombre).casefold() for fila in self.filas]
+        self._por_id = {fila.id: fila for fila in self.filas}
+        self._nombre = nombre
+
+    def __len__(self):
+        return len(self.filas)
+
+    def __iter__(self):
+        return iter(self.filas)
+
+    def get(self, id):
+        return self._por_id.get(id)
+
+    def buscar(self, prefijo, limite=20):
+        """Primeras `limite` filas cuyo nombre empieza con `prefijo`, sin distinguir mayúsculas."""
+        prefijo = (prefijo or '').strip().casefold()
+        inicio = bisect_left(self._claves, prefijo)
+        resultado = []
+        for posicion in range(inicio, min(inicio + limite, len(self.filas))):
+            if not self._claves[posicion].startswith(prefijo):
+                break
+            resultado.append(self.filas[posicion])
+        return resultado
+
+    def es_grande(self, limite):
+        return len(self.filas) > limite
+
+    def visibles(self, limite, seleccion=()):
+        """Filas a enviar al navegador: todas, o sólo las seleccionadas si el catálogo es grande."""
+        if not self.es_grande(limite):
+            return self.filas
+        return [self._por_id[id] for id in dict.fromkeys(seleccion) if id in self._por_id]
+
+
+def _cargar(clave, consulta, nombre):
+    version = _versiones[clave]
+    catalogo = catalogos.get((clave, version))
+    if catalogo is None:
+        with en_principal(db.session):
+            catalogo = Catalogo(consulta(), nombre)
+        catalogos.set((clave, version), catalogo)
+    return catalogo
+
+
+def clientes():
+    return _cargar(
+        'clientes',
+        lambda: [OpcionCliente(*fila) for fila in db.session.query(Cliente.id, Cliente.nombre)],
+        'nombre',
+    )
+
+
+def productos():
+    """Productos con precio y stock.
+
+    El stock es el del momento de la carga: las ventas lo descuentan con un
+    UPDATE directo que no invalida la caché, así que puede quedar por encima
+    del real hasta que venza el TTL. La reserva de stock al guardar la
+    factura sigue validándolo contra la base.
+    """
+    return _cargar(
+        'productos',
+        lambda: [
+            OpcionProducto(*fila)
+            for fila in db.session.query(Producto.id, Producto.descripcion, Producto.precio, Producto.stock)
+        ],
+        'descripcion',
+    )
+
+
+def invalidar(*nombres):
+    """Descarta los catálogos indicados (o todos) en este proceso."""
+    with _versiones_lock:
+        for nombre in nombres or tuple(_versiones):
+            _versiones[nombre] += 1
+
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_modificados(session, contexto):
+    modificados = session.info.setdefault(_CLAVE_SESION, set())
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        nombre = _MODELOS.get(type(objeto))
+        if nombre is not None:
+            modificados.add(nombre)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_modificados(session):
+    modificados = session.info.pop(_CLAVE_SESION, None)
+    if modificados:
+        invalidar(*modificados)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_modificados(session):
+    session.info.pop(_CLAVE_SESION, None)
@@ -0,0 +1,180 @@
+"""Perfil de conexiones SQLite y sesión con ruta de sólo lectura.
+
+Las consultas de las vistas de sólo lectura van a una réplica si está
+configurada (`SQLALCHEMY_BINDS['replica']`) o, con SQLite, a una conexión de
+sólo lectura sobre el mismo archivo. Las escrituras siempre van a la base
+principal.
+
+Este módulo se importa antes de crear `db`, así que no depende del resto de
+la aplicación.
+"""
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+
+from flask import current_app, has_request_context, session as sesion_web
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql.dml import UpdateBase
+
+# Pragmas que no tienen sentido (o fallan) en una conexión de sólo lectura.
+_SOLO_ESCRITURA = ('journal_mode',)
+
+# Momento de la última escritura confirmada, en la sesión del navegador.
+_CLAVE_ESCRITURA = '_ultima_escritura'
+
+
+def _aplicar_pragmas(pragmas):
+    def al_conectar(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for nombre, valor in pragmas.items():
+                cursor.execute(f'PRAGMA {nombre}={valor}')
+        finally:
+            cursor.close()
+    return al_conectar
+
+
+def _url_lectura(url):
+    """URL de sólo lectura (`mode=ro`) para una base SQLite en archivo, o None."""
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    if url.database.startswith('file:'):
+        return None
+    return url.set(database=f'file:{url.database}', query=dict(url.query, mode='ro', uri='true'))
+
+
+def configurar(app, db):
+    """Aplica `SQLITE_PRAGMAS` a cada conexión nueva y elige el motor de lectura.
+
+    Si hay un bind `replica`, las sesiones marcadas con `usar_lectura()` leen
+    de él. Si no, con SQLite en archivo y `SQLITE_LECTURA` activo, leen de un
+    motor que abre la misma base con `mode=ro` y `query_only`.
+    """
+    with app.app_context():
+        motor = db.engine
+        replica = db.engines.get('replica')
+    estado = app.extensions.setdefault('conexiones', {'lectura': None, 'replica': False})
+
+    pragmas = dict(app.config['SQLITE_PRAGMAS'])
+    pragmas['foreign_keys'] = 'ON'
+    pragmas_lectura = {k: v for k, v in pragmas.items() if k not in _SOLO_ESCRITURA}
+    pragmas_lectura['query_only'] = 'ON'
+    if motor.dialect.name == 'sqlite':
+        event.listen(motor, 'connect', _aplicar_pragmas(pragmas))
+
+    if replica is not None:
+        if replica.dialect.name == 'sqlite':
+            event.listen(replica, 'connect', _aplicar_pragmas(pragmas_lectura))
+        estado['lectura'] = replica
+        estado['replica'] = True
+        return
+
+    url = _url_lectura(motor.url) if motor.dialect.name == 'sqlite' else None
+    if app.config['SQLITE_LECTURA'] and url is not None:
+        lectura = create_engine(url, **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        event.listen(lectura, 'connect', _aplicar_pragmas(pragmas_lectura))
+        estado['lectura'] = lectura
+
+
+def motor_lectura(app=None):
+    app = app or current_app
+    return app.extensions.get('conexiones', {}).get('lectura')
+
+
+class SesionEnrutada(Session):
+    """Sesión que envía las consultas al motor de lectura cuando se pidió.
+
+    Las escrituras (flush y sentencias INSERT/UPDATE/DELETE) siempre van a la
+    base principal, aunque la sesión esté marcada.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('lectura') and not self._flushing \
+                and not isinstance(clause, UpdateBase):
+            lectura = motor_lectura()
+            if lectura is not None:
+                return lectura
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _escritura_reciente():
+    """True si el usuario escribió hace menos de `REPLICA_VENTANA_ESCRITURA` segundos.
+
+    Sólo aplica con réplica: la conexión de sólo lectura de SQLite lee el
+    mismo archivo y no tiene demora.
+    """
+    if not has_request_context() or not current_app.extensions['conexiones']['replica']:
+        return False
+    ultima = sesion_web.get(_CLAVE_ESCRITURA)
+    return ultima is not None and time.time() - ultima < current_app.config['REPLICA_VENTANA_ESCRITURA']
+
+
+def usar_lectura(session):
+    """Marca la sesión para que el resto de sus consultas use el motor de lectura.
+
+    La marca dura lo que la sesión: con `db.session` se descarta al terminar
+    la petición. Si el usuario acaba de escribir, la sesión sigue en la base
+    principal para que vea sus propios cambios aunque la réplica esté
+    atrasada. Devuelve True si la sesión quedó marcada.
+    """
+    if _escritura_reciente():
+        return False
+    session.info['lectura'] = True
+    return True
+
+
+@contextmanager
+def en_principal(session):
+    """Ejecuta el bloque contra la base principal aunque la sesión esté marcada.
+
+    Para cargas que se guardan en cachés del proceso: leerlas de una réplica
+    atrasada dejaría datos viejos en la caché hasta que venza su TTL.
+    """
+    lectura = session.info.pop('lectura', False)
+    try:
+        yield
+    finally:
+        if lectura:
+            session.info['lectura'] = True
+
+
+@event.listens_for(SesionEnrutada, 'after_flush')
+def _marcar_escritura(session, contexto):
+    session.info['escribio'] = True
+
+
+@event.listens_for(SesionEnrutada, 'do_orm_execute')
+def _marcar_dml(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        estado.session.info['escribio'] = True
+
+
+@event.listens_for(SesionEnrutada, 'after_commit')
+def _recordar_escritura(session):
+    if session.info.pop('escribio', False) and has_request_context() \
+            and current_app.extensions['conexiones']['replica']:
+        sesion_web[_CLAVE_ESCRITURA] = time.time()
+
+
+@event.listens_for(SesionEnrutada, 'after_rollback')
+def _descartar_escritura(session):
+    session.info.pop('escribio', None)
+
+
+def sincronizar_replica():
+    """Copia la base principal sobre la réplica cuando ambas son SQLite.
+
+    Sirve para probar la réplica en local: entre una sincronización y la
+    siguiente, la réplica se comporta como una réplica atrasada.
+    """
+    extension = current_app.extensions['sqlalchemy']
+    principal = extension.engine
+    replica = extension.engines.get('replica')
+    if replica is None or principal.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise ValueError('La sincronización sólo está disponible con una base principal y una réplica SQLite.')
+    replica.dispose()
+    with closing(sqlite3.connect(principal.url.database)) as origen, \
+            closing(sqlite3.connect(replica.url.database)) as destino:
+        origen.backup(destino)
+    return replica.url.database
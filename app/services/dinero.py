@@ -0,0 +1,44 @@
+"""Importes guardados como centavos enteros.
+
+En la base son BIGINT (sumas exactas y rápidas en cualquier motor; SQLite
+guarda NUMERIC como REAL) y en Python se ven como `Decimal` con dos
+decimales. Toda conversión redondea al centavo, con las mitades hacia arriba.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy.types import BigInteger, TypeDecorator
+
+CENTAVO = Decimal('0.01')
+
+
+def redondear(valor):
+    """`valor` (Decimal, int, float o texto) como Decimal redondeado al centavo."""
+    if not isinstance(valor, Decimal):
+        valor = Decimal(str(valor))
+    return valor.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def a_centavos(valor):
+    return int(redondear(valor).scaleb(2))
+
+
+def desde_centavos(centavos):
+    return Decimal(int(centavos)).scaleb(-2)
+
+
+class Dinero(TypeDecorator):
+    """Columna de importe: BIGINT en centavos, `Decimal` en Python.
+
+    Los literales de una expresión también se toman como importes
+    (`total >= 100` compara contra 10000 centavos), así que no hay que
+    multiplicar una columna por un literal: `precio * 2` sería `precio * 200`.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else a_centavos(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else desde_centavos(value)
@@ -0,0 +1,283 @@
+"""Facturas en PDF: generación, caché en disco y generación en segundo plano.
+
+Cada PDF se guarda bajo la huella SHA-256 de los datos que lo producen, así
+que volver a pedirlo no genera nada y un cambio en la factura (o en
+`VERSION`) produce un archivo nuevo en lugar de servir uno desactualizado.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from flask import current_app
+
+from .. import db
+from ..models import DetalleFactura, Factura
+from .exportacion import SalidaEnBloques
+from .facturas import cargar_factura, datos_factura, filtrar_facturas
+from .pdf import ALTO, ANCHO, Documento
+
+# Incrementar al cambiar el diseño para que no se sirvan PDFs anteriores.
+VERSION = 1
+
+LOTE = 200
+TANDA = 20
+LINEAS_POR_PAGINA = 38
+MARGEN = 50
+
+
+# --- Diseño ------------------------------------------------------------------
+
+def _recortar(texto, maximo):
+    return texto if len(texto) <= maximo else texto[:maximo - 1] + '…'
+
+
+def renderizar(datos):
+    """Genera el PDF de la factura a partir de `datos_factura`; no usa la base ni la app."""
+    fecha = datetime.fromisoformat(datos['fecha']).strftime('%d/%m/%Y %H:%M')
+    lineas = datos['lineas']
+    total_paginas = max(1, -(-len(lineas) // LINEAS_POR_PAGINA))
+    documento = Documento(titulo=f"Factura #{datos['id']}")
+    derecha = ANCHO - MARGEN
+    columnas = (MARGEN, 360, 440, derecha)
+
+    for numero in range(total_paginas):
+        pagina = documento.nueva_pagina()
+        y = ALTO - MARGEN
+        pagina.texto(MARGEN, y, f"Factura #{datos['id']}", tamano=18, negrita=True)
+        pagina.texto(derecha, y, fecha, tamano=10, alinear='derecha')
+        y -= 24
+        pagina.texto(MARGEN, y, 'Cliente:', negrita=True)
+        pagina.texto(MARGEN + 45, y, _recortar(datos['cliente'], 70))
+        y -= 28
+        pagina.texto(columnas[0], y, 'Producto', negrita=True)
+        pagina.texto(columnas[1], y, 'Cantidad', negrita=True, alinear='derecha')
+        pagina.texto(columnas[2], y, 'Precio', negrita=True, alinear='derecha')
+        pagina.texto(columnas[3], y, 'Subtotal', negrita=True, alinear='derecha')
+        y -= 6
+        pagina.linea(MARGEN, y, derecha, y)
+        y -= 14
+        for linea in lineas[numero * LINEAS_POR_PAGINA:(numero + 1) * LINEAS_POR_PAGINA]:
+            pagina.texto(columnas[0], y, _recortar(linea['producto'], 48))
+            pagina.texto(columnas[1], y, str(linea['cantidad']), alinear='derecha')
+            pagina.texto(columnas[2], y, f"${linea['precio_unitario']}", alinear='derecha')
+            pagina.texto(columnas[3], y, f"${linea['subtotal']}", alinear='derecha')
+            y -= 16
+        if numero == total_paginas - 1:
+            pagina.linea(MARGEN, y + 8, derecha, y + 8)
+            y -= 8
+            pagina.texto(columnas[2], y, 'Total', tamano=12, negrita=True, alinear='derecha')
+            pagina.texto(columnas[3], y, f"${datos['total']}", tamano=12, negrita=True, alinear='derecha')
+        pagina.texto(derecha, MARGEN - 20, f'Página {numero + 1} de {total_paginas}', tamano=8, alinear='derecha')
+    return documento.generar()
+
+
+def renderizar_tanda(tanda):
+    """`renderizar` para varias facturas; reduce el costo de enviar trabajo al pool."""
+    return [renderizar(datos) for datos in tanda]
+
+
+# --- Caché en disco ----------------------------------------------------------
+
+def huella(datos):
+    crudo = json.dumps({'version': VERSION, 'factura': datos}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(crudo.encode('utf-8')).hexdigest()
+
+
+def _directorio():
+    return current_app.config['PDF_CACHE_DIR'] or os.path.join(current_app.instance_path, 'pdf')
+
+
+def ruta_pdf(clave):
+    return os.path.join(_directorio(), clave[:2], f'{clave}.pdf')
+
+
+def _guardar(clave, contenido):
+    """Escribe el PDF de forma atómica; otro proceso puede estar generando el mismo."""
+    ruta = ruta_pdf(clave)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+    return ruta
+
+
+def archivo_pdf(datos):
+    """Ruta del PDF de la factura, generándolo sólo si no está en disco."""
+    clave = huella(datos)
+    ruta = ruta_pdf(clave)
+    if not os.path.exists(ruta):
+        _guardar(clave, renderizar(datos))
+    return ruta
+
+
+def nombre_archivo(datos):
+    return f"factura_{datos['id']:08d}.pdf"
+
+
+# --- Pool de procesos ---------------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool(workers):
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _pool
+
+
+def cerrar_pool():
+    """Detiene el pool de generación; se vuelve a crear en el próximo uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# --- Lote en ZIP -------------------------------------------------------------
+
+def _facturas(desde, hasta, cliente_id=None):
+    """Datos de las facturas del rango, leídas en bloques de `LOTE` por (fecha, id).
+
+    `yield_per` no se puede combinar con `selectinload`, así que cada bloque
+    es una consulta con su propia carga de líneas.
+    """
+    query = Factura.query.options(
+        db.joinedload(Factura.cliente),
+        db.selectinload(Factura.detalles).joinedload(DetalleFactura.producto),
+    )
+    query = filtrar_facturas(query, cliente_id=cliente_id, desde=desde, hasta=hasta)
+    clave = db.tuple_(Factura.fecha, Factura.id)
+    ultima = None
+    while True:
+        bloque = query if ultima is None else query.filter(clave > db.tuple_(*ultima))
+        facturas = bloque.order_by(Factura.fecha, Factura.id).limit(LOTE).all()
+        for factura in facturas:
+            yield datos_factura(factura)
+        if len(facturas) < LOTE:
+            return
+        ultima = (facturas[-1].fecha, facturas[-1].id)
+
+
+def generar_zip(desde, hasta, cliente_id=None):
+    """Genera un ZIP con los PDFs de las facturas del rango, en bloques.
+
+    Los que ya están en disco se copian directamente; el resto se genera en
+    el pool de `PDF_WORKERS` procesos, en tandas de `TANDA` facturas, y se
+    agrega al ZIP en cuanto termina, así que el orden dentro del ZIP no es el
+    de las fechas. Como mucho `PDF_EN_VUELO` tandas esperan en el pool a la vez.
+    """
+    workers = current_app.config['PDF_WORKERS']
+    en_vuelo = current_app.config['PDF_EN_VUELO']
+    pool = _obtener_pool(workers) if workers > 0 else None
+    salida = SalidaEnBloques()
+    pendientes = {}
+    tanda = []
+
+    def agregar(archivo, futuro):
+        for (nombre, clave), contenido in zip(pendientes.pop(futuro), futuro.result()):
+            _guardar(clave, contenido)
+            archivo.writestr(nombre, contenido)
+
+    def enviar():
+        pendientes[pool.submit(renderizar_tanda, [datos for datos, _ in tanda])] = [destino for _, destino in tanda]
+        tanda.clear()
+
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as archivo:
+        try:
+            for datos in _facturas(desde, hasta, cliente_id):
+                clave = huella(datos)
+                ruta = ruta_pdf(clave)
+                if os.path.exists(ruta):
+                    archivo.write(ruta, nombre_archivo(datos))
+                elif pool is None:
+                    contenido = renderizar(datos)
+                    _guardar(clave, contenido)
+                    archivo.writestr(nombre_archivo(datos), contenido)
+                else:
+                    tanda.append((datos, (nombre_archivo(datos), clave)))
+                    if len(tanda) >= TANDA:
+                        enviar()
+                    while len(pendientes) >= en_vuelo:
+                        listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                        for futuro in listos:
+                            agregar(archivo, futuro)
+                yield salida.vaciar()
+            if tanda:
+                enviar()
+            while pendientes:
+                listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    agregar(archivo, futuro)
+                yield salida.vaciar()
+        except BrokenProcessPool:
+            cerrar_pool()
+            raise
+        finally:
+            for futuro in pendientes:
+                futuro.cancel()
+    yield salida.vaciar()
+
+
+# --- Generación en segundo plano ---------------------------------------------
+
+_cola = None
+_hilo = None
+_hilo_lock = threading.Lock()
+
+
+def _trabajar(app, cola):
+    while True:
+        id = cola.get()
+        try:
+            with app.app_context():
+                factura = cargar_factura(id)
+                if factura is not None:
+                    archivo_pdf(datos_factura(factura))
+        except Exception:
+            app.logger.exception('No se pudo generar el PDF de la factura %s', id)
+        finally:
+            cola.task_done()
+
+
+def encolar(ids):
+    """Pide generar en segundo plano los PDFs de facturas recién creadas.
+
+    Un hilo por proceso los genera de a uno; si la cola (`PDF_COLA_MAX`) está
+    llena, el resto se genera cuando alguien lo pida.
+    """
+    global _cola, _hilo
+    app = current_app._get_current_object()
+    if not app.config['PDF_PRERENDER']:
+        return
+    with _hilo_lock:
+        if _hilo is None or not _hilo.is_alive():
+            _cola = queue.Queue(maxsize=app.config['PDF_COLA_MAX'])
+            _hilo = threading.Thread(target=_trabajar, args=(app, _cola), name='pdf-facturas', daemon=True)
+            _hilo.start()
+    for id in ids:
+        try:
+            _cola.put_nowait(id)
+        except queue.Full:
+            app.logger.warning('Cola de PDFs llena; se generarán a pedido')
+            break
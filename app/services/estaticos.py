@@ -0,0 +1,293 @@
+"""Archivos estáticos versionados: build, manifiesto y servido con WhiteNoise.
+
+`flask estaticos construir` minifica CSS y JS, copia cada archivo de
+`app/static/` a `app/static/dist/` con un hash de su contenido en el nombre
+(`css/custom.css` → `dist/css/custom.3fa2b1c09d4e.css`), deja al lado las
+versiones `.gz` y `.br` y escribe `dist/manifest.json` con la
+correspondencia.
+
+Con el manifiesto cargado, `url_for('static', filename='css/custom.css')`
+devuelve la ruta versionada sin cambiar las plantillas, y WhiteNoise sirve
+esos archivos con `Cache-Control: immutable` (el nombre cambia si cambia el
+contenido) y elige la versión comprimida según `Accept-Encoding`. Los
+archivos sin versionar se sirven con `ESTATICOS_MAX_AGE`.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # opcional: sin el paquete sólo se generan los .gz
+    brotli = None
+
+MANIFIESTO = 'manifest.json'
+COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Sólo se guarda la versión comprimida si ahorra al menos esta fracción.
+AHORRO_MINIMO = 0.05
+LARGO_HASH = 12
+
+_VERSIONADO = re.compile(rf'\.[0-9a-f]{{{LARGO_HASH}}}\.\w+$')
+
+
+# --- Minificación ------------------------------------------------------------
+
+# Alrededor de estos caracteres sobran los espacios.
+_PUNTUACION_CSS = set('{};,>')
+# `+`, `-` y `/` no: `a - -b`, `a + +b` o una división seguida de un regex
+# cambiarían de sentido sin el espacio.
+_PUNTUACION_JS = set('{}()[];,:=<>&|!?*%^~')
+# Después de estos caracteres (o de estas palabras) un `/` abre un regex.
+_ANTES_DE_REGEX = set('(,=:[!&|?{};+-*%<>~^')
+_PALABRAS_ANTES_DE_REGEX = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'throw', 'new', 'delete')
+
+
+def _hasta_cierre(texto, i, cierre):
+    """Índice siguiente al `cierre` que termina el literal abierto en `i - 1`, respetando escapes."""
+    while i < len(texto):
+        if texto[i] == '\\':
+            i += 2
+            continue
+        if texto[i] == cierre:
+            return i + 1
+        i += 1
+    return i
+
+
+def minificar_css(texto):
+    """Quita comentarios y espacios que no cambian el significado; las cadenas quedan como están."""
+    salida = []
+    i = 0
+    espacio = False
+    while i < len(texto):
+        c = texto[i]
+        if c in '"\'':
+            fin = _hasta_cierre(texto, i + 1, c)
+            piezas, i = texto[i:fin], fin
+        elif texto.startswith('/*', i):
+            fin = texto.find('*/', i + 2)
+            i = len(texto) if fin < 0 else fin + 2
+            espacio = True
+            continue
+        elif c.isspace():
+            espacio = True
+            i += 1
+            continue
+        else:
+            piezas, i = c, i + 1
+        if espacio and salida and salida[-1][-1] not in _PUNTUACION_CSS | {':'} and piezas[0] not in _PUNTUACION_CSS:
+            salida.append(' ')
+        espacio = False
+        if piezas == '}' and salida and salida[-1] == ';':
+            salida.pop()
+        salida.append(piezas)
+    return ''.join(salida)
+
+
+def minificar_js(texto):
+    """Quita comentarios, sangrías y espacios redundantes de un script.
+
+    Es conservador: respeta cadenas, plantillas (con `${...}` anidados) y
+    expresiones regulares, y mantiene los saltos de línea entre sentencias
+    para no depender de la inserción automática de `;`.
+    """
+    salida = []
+    plantillas = []  # profundidad de llaves al entrar a cada `${`
+    llaves = 0
+    i = 0
+    espacio = salto = False
+
+    def ultimo():
+        return salida[-1][-1] if salida else ''
+
+    def abre_regex():
+        anterior = ultimo()
+        if not anterior or anterior in _ANTES_DE_REGEX:
+            return True
+        palabra = re.search(r'([A-Za-z_$][\w$]*)$', ''.join(salida[-40:]))
+        return bool(palabra) and palabra.group(1) in _PALABRAS_ANTES_DE_REGEX
+
+    while i < len(texto):
+        c = texto[i]
+        if c == '`' or (c == '}' and plantillas and llaves == plantillas[-1]):
+            # Tramo literal de una plantilla, hasta el cierre o el próximo `${`.
+            if c == '}':
+                plantillas.pop()
+            j = i + 1
+            while j < len(texto) and texto[j] != '`' and not texto.startswith('${', j):
+                j += 2 if texto[j] == '\\' else 1
+            if texto.startswith('${', j):
+                plantillas.append(llaves)
+                j += 2
+            else:
+                j += 1
+            pieza, i = texto[i:j], j
+        elif c in '"\'':
+            fin = _hasta_cierre(texto, i + 1, c)
+            pieza, i = texto[i:fin], fin
+        elif texto.startswith('//', i):
+            fin = texto.find('\n', i)
+            i = len(texto) if fin < 0 else fin
+            continue
+        elif texto.startswith('/*', i):
+            fin = texto.find('*/', i + 2)
+            comentario = texto[i:len(texto) if fin < 0 else fin]
+            i = len(texto) if fin < 0 else fin + 2
+            salto = salto or '\n' in comentario
+            espacio = True
+            continue
+        elif c == '/' and abre_regex():
+            j = i + 1
+            en_clase = False
+            while j < len(texto) and texto[j] != '\n':
+                if texto[j] == '\\':
+                    j += 2
+                    continue
+                if texto[j] == '[':
+                    en_clase = True
+                elif texto[j] == ']':
+                    en_clase = False
+                elif texto[j] == '/' and not en_clase:
+                    break
+                j += 1
+            j += 1
+            while j < len(texto) and texto[j].isalpha():
+                j += 1
+            pieza, i = texto[i:j], j
+        elif c.isspace():
+            salto = salto or c == '\n'
+            espacio = True
+            i += 1
+            continue
+        else:
+            if c == '{':
+                llaves += 1
+            elif c == '}':
+                llaves -= 1
+            pieza, i = c, i + 1
+
+        if salida and salto:
+            salida.append('\n')
+        elif salida and espacio and ultimo() not in _PUNTUACION_JS and pieza[0] not in _PUNTUACION_JS:
+            salida.append(' ')
+        espacio = salto = False
+        salida.append(pieza)
+    return ''.join(salida) + '\n'
+
+
+MINIFICADORES = {'.css': minificar_css, '.js': minificar_js}
+
+
+# --- Build -------------------------------------------------------------------
+
+def _escribir(ruta, datos):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'wb') as archivo:
+        archivo.write(datos)
+    os.replace(temporal, ruta)
+
+
+def _comprimir(ruta, datos):
+    """Escribe `ruta.gz` (y `ruta.br`) si la versión comprimida ahorra lo suficiente."""
+    limite = len(datos) * (1 - AHORRO_MINIMO)
+    versiones = {'.gz': gzip.compress(datos, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versiones['.br'] = brotli.compress(datos, quality=11)
+    escritas = []
+    for sufijo, comprimido in versiones.items():
+        if len(comprimido) < limite:
+            _escribir(ruta + sufijo, comprimido)
+            escritas.append(sufijo)
+    return escritas
+
+
+def construir(origen, destino='dist', minificar=True, comprimir=True, limpiar=False):
+    """Versiona los archivos de `origen` en `origen/destino` y escribe el manifiesto.
+
+    Devuelve `{ruta original: {'ruta', 'bytes', 'original', 'comprimidos'}}`.
+    Las versiones anteriores se conservan (las páginas ya servidas pueden
+    seguir pidiéndolas) salvo con `limpiar`.
+    """
+    salida = os.path.join(origen, destino)
+    resultado = {}
+    for carpeta, subcarpetas, archivos in os.walk(origen):
+        subcarpetas[:] = sorted(d for d in subcarpetas if not d.startswith('.')
+                                and os.path.abspath(os.path.join(carpeta, d)) != os.path.abspath(salida))
+        for nombre in sorted(archivos):
+            if nombre.startswith('.'):
+                continue
+            ruta = os.path.join(carpeta, nombre)
+            relativa = os.path.relpath(ruta, origen).replace(os.sep, '/')
+            with open(ruta, 'rb') as archivo:
+                datos = archivo.read()
+            base, extension = os.path.splitext(relativa)
+            original = len(datos)
+            if minificar and extension in MINIFICADORES:
+                datos = MINIFICADORES[extension](datos.decode('utf-8')).encode('utf-8')
+            huella = hashlib.sha256(datos).hexdigest()[:LARGO_HASH]
+            versionada = f'{destino}/{base}.{huella}{extension}'
+            absoluta = os.path.join(origen, *versionada.split('/'))
+            _escribir(absoluta, datos)
+            comprimidos = _comprimir(absoluta, datos) if comprimir and extension in COMPRIMIBLES else []
+            resultado[relativa] = {'ruta': versionada, 'bytes': len(datos), 'original': original,
+                                   'comprimidos': comprimidos}
+
+    manifiesto = {relativa: datos['ruta'] for relativa, datos in resultado.items()}
+    _escribir(os.path.join(salida, MANIFIESTO),
+              json.dumps(manifiesto, indent=2, sort_keys=True).encode('utf-8'))
+    if limpiar:
+        _limpiar(salida, {os.path.join(origen, *r.split('/')) for r in manifiesto.values()})
+    return resultado
+
+
+def _limpiar(salida, vigentes):
+    """Borra de `salida` los archivos versionados (y sus comprimidos) que no están en `vigentes`."""
+    for carpeta, _, archivos in os.walk(salida):
+        for nombre in archivos:
+            ruta = os.path.join(carpeta, nombre)
+            base = ruta[:-3] if ruta.endswith(('.gz', '.br')) else ruta
+            if nombre != MANIFIESTO and base not in vigentes:
+                os.remove(ruta)
+
+
+# --- Servido -----------------------------------------------------------------
+
+def cargar_manifiesto(app):
+    ruta = os.path.join(app.static_folder, app.config['ESTATICOS_DIR'], MANIFIESTO)
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return {}
+
+
+def _inmutable(ruta, url):
+    return bool(_VERSIONADO.search(url))
+
+
+def instalar(app):
+    """Usa el manifiesto en `url_for('static', ...)` y sirve los estáticos con WhiteNoise."""
+    manifiesto = cargar_manifiesto(app) if app.config['ESTATICOS_MANIFIESTO'] else {}
+    app.extensions['estaticos'] = manifiesto
+    if manifiesto:
+        @app.url_defaults
+        def _versionar(endpoint, valores):
+            if endpoint == 'static':
+                versionada = manifiesto.get(valores.get('filename'))
+                if versionada is not None:
+                    valores['filename'] = versionada
+
+    if app.config['ESTATICOS_WHITENOISE']:
+        from whitenoise import WhiteNoise
+
+        app.wsgi_app = WhiteNoise(
+            app.wsgi_app,
+            root=app.static_folder,
+            prefix=app.static_url_path,
+            max_age=app.config['ESTATICOS_MAX_AGE'],
+            autorefresh=app.debug,
+            immutable_file_test=_inmutable,
+        )
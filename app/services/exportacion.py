@@ -0,0 +1,209 @@
+"""Exportación de reportes a CSV y XLSX generada fila por fila.
+
+Los generadores de este módulo nunca materializan el resultado completo: leen
+la base en lotes de `LOTE` filas y emiten el archivo por partes, por lo que la
+memoria usada no depende del tamaño del rango exportado.
+"""
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from .. import db
+from ..models import Cliente, DetalleFactura, Factura, Producto
+from .facturas import filtrar_facturas
+from .resumenes import totales_por_cliente
+
+LOTE = 1000
+
+FORMATO_FECHA = '%d/%m/%Y %H:%M'
+
+ENCABEZADOS = {
+    'facturas': ['Fecha y hora', 'Cliente', 'Ítems', 'Unidades', 'Total'],
+    'lineas': ['Factura', 'Fecha y hora', 'Cliente', 'Producto', 'Cantidad', 'Precio', 'Subtotal'],
+    'clientes': ['Cliente', 'Cantidad de Facturas', 'Total'],
+}
+
+
+class Monto(str):
+    """Importe ya formateado como en el reporte HTML; el XLSX lo escribe como número."""
+
+
+def formatear_monto(valor):
+    return Monto('%.2f' % (valor or 0))
+
+
+def _en_lotes(statement):
+    return db.session.execute(statement.execution_options(yield_per=LOTE))
+
+
+def filas_facturas(desde, hasta, cliente_id=None):
+    query = (
+        db.session.query(
+            Factura.fecha, Cliente.nombre, Factura.cantidad_lineas, Factura.cantidad_unidades, Factura.total,
+        )
+        .join(Cliente, Cliente.id == Factura.id_cliente)
+    )
+    query = filtrar_facturas(query, cliente_id=cliente_id, desde=desde, hasta=hasta)
+    for fecha, nombre, lineas, unidades, total in _en_lotes(query.order_by(Factura.fecha, Factura.id).statement):
+        yield [fecha.strftime(FORMATO_FECHA), nombre, lineas, unidades, formatear_monto(total)]
+
+
+def filas_lineas(desde, hasta, cliente_id=None):
+    query = (
+        db.session.query(
+            Factura.id, Factura.fecha, Cliente.nombre, Producto.descripcion,
+            DetalleFactura.cantidad, DetalleFactura.precio_unitario, DetalleFactura.subtotal,
+        )
+        .select_from(DetalleFactura)
+        .join(Factura, Factura.id == DetalleFactura.id_factura)
+        .join(Cliente, Cliente.id == Factura.id_cliente)
+        .join(Producto, Producto.id == DetalleFactura.id_producto)
+    )
+    query = filtrar_facturas(query, cliente_id=cliente_id, desde=desde, hasta=hasta)
+    statement = query.order_by(Factura.fecha, Factura.id, DetalleFactura.id).statement
+    for id_factura, fecha, nombre, descripcion, cantidad, precio, subtotal in _en_lotes(statement):
+        yield [
+            id_factura, fecha.strftime(FORMATO_FECHA), nombre, descripcion,
+            cantidad, formatear_monto(precio), formatear_monto(subtotal),
+        ]
+
+
+def filas_clientes(desde, hasta, cliente_id=None):
+    por_cliente, _, _ = totales_por_cliente(desde, hasta, cliente_id=cliente_id)
+    for fila in por_cliente:
+        yield [fila['cliente_nombre'], fila['cantidad'], formatear_monto(fila['monto_total'])]
+
+
+FILAS = {
+    'facturas': filas_facturas,
+    'lineas': filas_lineas,
+    'clientes': filas_clientes,
+}
+
+
+class SalidaEnBloques(io.RawIOBase):
+    """Destino de escritura que acumula bytes hasta que el generador los entrega."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+# Una celda de texto que empieza así se abre en Excel como fórmula.
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def celda_csv(valor):
+    """Neutraliza el texto que una planilla interpretaría como fórmula anteponiendo `'`.
+
+    Los nombres de cliente vienen del registro público; los importes
+    (`Monto`) y los números se dejan como están.
+    """
+    if isinstance(valor, str) and not isinstance(valor, Monto) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def generar_csv(encabezado, filas):
+    """Genera el CSV en bloques de texto; incluye BOM para que Excel detecte UTF-8."""
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    salida.write('\ufeff')
+    escritor.writerow(encabezado)
+    for numero, fila in enumerate(filas, start=1):
+        escritor.writerow([celda_csv(valor) for valor in fila])
+        if numero % LOTE == 0:
+            yield salida.getvalue()
+            salida.seek(0)
+            salida.truncate()
+    yield salida.getvalue()
+
+
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _celda(valor):
+    if isinstance(valor, (Monto, int)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(_CARACTERES_INVALIDOS.sub('', str(valor if valor is not None else '')))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(valores):
+    return '<row>' + ''.join(_celda(v) for v in valores) + '</row>'
+
+
+def generar_xlsx(encabezado, filas, hoja='Reporte'):
+    """Genera un libro XLSX de una hoja escribiendo el ZIP a medida que llegan las filas."""
+    salida = SalidaEnBloques()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        libro.writestr('_rels/.rels', _RELS)
+        libro.writestr('xl/workbook.xml', _WORKBOOK.format(hoja=escape(hoja, {'"': '&quot;'})))
+        libro.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield salida.vaciar()
+
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja_xml:
+            hoja_xml.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            hoja_xml.write(_fila_xml(encabezado).encode('utf-8'))
+            for numero, fila in enumerate(filas, start=1):
+                hoja_xml.write(_fila_xml(fila).encode('utf-8'))
+                if numero % LOTE == 0:
+                    yield salida.vaciar()
+            hoja_xml.write(b'</sheetData></worksheet>')
+    yield salida.vaciar()
@@ -0,0 +1,282 @@
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from .. import db
+from ..models import Cliente, DetalleFactura, Factura, Producto
+from . import resumenes
+from .dinero import redondear
+
+# Por debajo del límite histórico de 999 parámetros por sentencia de SQLite.
+TAMANO_IN = 900
+
+
+class ErrorFacturacion(Exception):
+    """Error de datos en una factura del lote.
+
+    `item` es el índice del ítem afectado y `campo` el nombre del dato con error
+    (`cliente_id`, `fecha`, `producto_id`, `cantidad` o `precio_unitario`).
+    """
+
+    def __init__(self, mensaje, item=None, campo=None):
+        super().__init__(mensaje)
+        self.item = item
+        self.campo = campo
+
+    def como_resultado(self):
+        return {'ok': False, 'error': str(self), 'item': self.item, 'campo': self.campo}
+
+
+class ConflictoStock(Exception):
+    """El stock cambió entre la validación y la reserva; el lote debe revertirse."""
+
+
+def _trozos(valores, tamano=TAMANO_IN):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
+
+def _entero(valor, mensaje, item=None, campo=None):
+    try:
+        if isinstance(valor, bool):
+            raise TypeError
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErrorFacturacion(mensaje, item, campo)
+
+
+def _fecha(valor):
+    if valor is None:
+        return datetime.now()
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime.combine(valor, datetime.now().time())
+    try:
+        if len(valor) == 10:
+            return datetime.combine(date.fromisoformat(valor), datetime.now().time())
+        return datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise ErrorFacturacion('Fecha inválida', campo='fecha')
+
+
+def _normalizar(datos):
+    """Valida la forma de una factura y devuelve `(id_cliente, fecha, items)`."""
+    if not isinstance(datos, dict):
+        raise ErrorFacturacion('Formato de factura inválido')
+    id_cliente = _entero(datos.get('id_cliente'), 'Cliente inválido', campo='cliente_id')
+    fecha = _fecha(datos.get('fecha'))
+    items = datos.get('items')
+    if not isinstance(items, list) or not items:
+        raise ErrorFacturacion('La factura no tiene ítems')
+
+    normalizados = []
+    for indice, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ErrorFacturacion('Formato de ítem inválido', indice)
+        id_producto = _entero(item.get('id_producto'), 'Producto inválido o inexistente', indice, 'producto_id')
+        cantidad = _entero(item.get('cantidad'), 'Cantidad inválida', indice, 'cantidad')
+        if cantidad <= 0:
+            raise ErrorFacturacion('Cantidad debe ser mayor a 0', indice, 'cantidad')
+        precio = item.get('precio_unitario')
+        if precio is not None:
+            try:
+                precio = Decimal(str(precio))
+            except InvalidOperation:
+                raise ErrorFacturacion('Precio unitario inválido', indice, 'precio_unitario')
+            if not precio.is_finite() or precio < 0:
+                raise ErrorFacturacion('Precio unitario inválido', indice, 'precio_unitario')
+            precio = redondear(precio)
+        normalizados.append((id_producto, cantidad, precio))
+    return id_cliente, fecha, normalizados
+
+
+def iniciar_escritura():
+    """Abre la transacción actual en modo escritura antes de leer el stock.
+
+    En SQLite emite `BEGIN IMMEDIATE`, que toma el lock de escritura de la base
+    al comenzar: la validación en memoria y el descuento ven el mismo stock y se
+    evita el SQLITE_BUSY que ocurre al pasar de lectura a escritura. Los
+    lectores no se bloquean. En otros motores no hace nada; ahí alcanza con el
+    bloqueo de filas de `_cargar_productos`.
+    """
+    conexion = db.session.connection()
+    if conexion.dialect.name != 'sqlite':
+        return
+    dbapi = conexion.connection.driver_connection
+    if not dbapi.in_transaction:
+        dbapi.execute('BEGIN IMMEDIATE')
+
+
+def _cargar_productos(ids):
+    """Carga id, stock y precio de los productos, bloqueando sus filas donde el motor lo permite.
+
+    Los ids se recorren en orden ascendente para que dos lotes concurrentes
+    tomen los bloqueos en el mismo orden y no se produzcan deadlocks.
+    """
+    productos = {}
+    for trozo in _trozos(sorted(ids)):
+        filas = (
+            db.session.query(Producto.id, Producto.stock, Producto.precio)
+            .filter(Producto.id.in_(trozo))
+            .order_by(Producto.id)
+            .with_for_update()
+        )
+        for fila in filas:
+            productos[fila.id] = fila
+    return productos
+
+
+def _cargar_clientes(ids):
+    existentes = set()
+    for trozo in _trozos(ids):
+        existentes.update(i for (i,) in db.session.query(Cliente.id).filter(Cliente.id.in_(trozo)))
+    return existentes
+
+
+def reservar_stock(cantidades):
+    """Descuenta `cantidades` ({id_producto: unidades}) con UPDATE condicionales.
+
+    Cada sentencia sólo afecta la fila si todavía hay stock suficiente, de modo
+    que nunca se vende por debajo de cero. Lanza ConflictoStock si alguna
+    reserva no pudo aplicarse; el llamador debe hacer rollback.
+    """
+    if not cantidades:
+        return
+    tabla = Producto.__table__
+    sentencia = (
+        tabla.update()
+        .where(tabla.c.id == db.bindparam('p_id'), tabla.c.stock >= db.bindparam('p_cantidad'))
+        .values(stock=tabla.c.stock - db.bindparam('p_cantidad'))
+    )
+    parametros = [{'p_id': pid, 'p_cantidad': cantidad} for pid, cantidad in cantidades.items()]
+    if db.session.get_bind().dialect.supports_sane_multi_rowcount:
+        if db.session.execute(sentencia, parametros).rowcount != len(parametros):
+            raise ConflictoStock('Stock insuficiente al reservar los productos')
+        return
+    for fila in parametros:
+        if db.session.execute(sentencia, fila).rowcount != 1:
+            raise ConflictoStock('Stock insuficiente al reservar los productos')
+
+
+def crear_facturas(lote):
+    """Crea las facturas de `lote` en la transacción actual, sin hacer commit.
+
+    Cada elemento es un dict con `id_cliente`, `items` (lista de dicts con
+    `id_producto`, `cantidad` y opcionalmente `precio_unitario`) y `fecha`
+    opcional en formato ISO. Las facturas con errores se rechazan sin afectar
+    al resto. Devuelve una lista, en el mismo orden que `lote`, de dicts con
+    `ok` y además `id` y `total`, o `error`, `item` y `campo` si fue rechazada.
+
+    Lanza ConflictoStock si otro proceso consumió el stock validado.
+    """
+    resultados = [None] * len(lote)
+    iniciar_escritura()
+    normalizadas = {}
+    for indice, datos in enumerate(lote):
+        try:
+            normalizadas[indice] = _normalizar(datos)
+        except ErrorFacturacion as e:
+            resultados[indice] = e.como_resultado()
+
+    productos = _cargar_productos({i[0] for _, _, items in normalizadas.values() for i in items})
+    clientes = _cargar_clientes({id_cliente for id_cliente, _, _ in normalizadas.values()})
+    disponible = {pid: (p.stock or 0) for pid, p in productos.items()}
+
+    aceptadas = []
+    reservas = Counter()
+    for indice, (id_cliente, fecha, items) in normalizadas.items():
+        try:
+            if id_cliente not in clientes:
+                raise ErrorFacturacion('Cliente inválido o inexistente', campo='cliente_id')
+            requerido = Counter()
+            lineas = []
+            for numero, (id_producto, cantidad, precio) in enumerate(items):
+                producto = productos.get(id_producto)
+                if producto is None:
+                    raise ErrorFacturacion('Producto inválido o inexistente', numero, 'producto_id')
+                requerido[id_producto] += cantidad
+                if disponible[id_producto] < requerido[id_producto]:
+                    raise ErrorFacturacion('Cantidad supera el stock disponible', numero, 'cantidad')
+                precio = producto.precio if precio is None else precio
+                lineas.append((id_producto, cantidad, precio, precio * cantidad))
+        except ErrorFacturacion as e:
+            resultados[indice] = e.como_resultado()
+            continue
+        for id_producto, cantidad in requerido.items():
+            disponible[id_producto] -= cantidad
+        reservas.update(requerido)
+        aceptadas.append((indice, id_cliente, fecha, lineas, sum(l[3] for l in lineas)))
+
+    if not aceptadas:
+        return resultados
+
+    reservar_stock(reservas)
+
+    insertar = (
+        db.insert(Factura.__table__)
+        .returning(Factura.__table__.c.id, sort_by_parameter_order=True)
+    )
+    ids = db.session.execute(insertar, [
+        {
+            'id_cliente': id_cliente,
+            'fecha': fecha,
+            'total': total,
+            'cantidad_lineas': len(lineas),
+            'cantidad_unidades': sum(l[1] for l in lineas),
+        }
+        for _, id_cliente, fecha, lineas, total in aceptadas
+    ]).scalars().all()
+
+    db.session.execute(db.insert(DetalleFactura.__table__), [
+        {
+            'id_factura': id_factura,
+            'id_producto': id_producto,
+            'cantidad': cantidad,
+            'precio_unitario': precio,
+            'subtotal': subtotal,
+        }
+        for id_factura, (_, _, _, lineas, _) in zip(ids, aceptadas)
+        for id_producto, cantidad, precio, subtotal in lineas
+    ])
+
+    resumenes.registrar_lote((fecha, id_cliente, total) for _, id_cliente, fecha, _, total in aceptadas)
+
+    for id_factura, (indice, _, _, _, total) in zip(ids, aceptadas):
+        resultados[indice] = {'ok': True, 'id': id_factura, 'total': total}
+    return resultados
+
+
+def eliminar_facturas(condicion):
+    """Elimina las facturas que cumplen `condicion` sin cargar objetos del ORM.
+
+    En la transacción actual y sin commit: devuelve al stock lo vendido con un
+    UPDATE ... FROM sobre las líneas agregadas por producto, descuenta las
+    facturas del resumen diario y borra líneas y facturas con un DELETE cada
+    una. La cantidad de sentencias no depende de cuántas facturas o líneas
+    haya. Devuelve los ids eliminados.
+    """
+    iniciar_escritura()
+    ids = db.session.scalars(db.select(Factura.id).where(condicion).with_for_update()).all()
+    if not ids:
+        return []
+    seleccion = db.select(Factura.id).where(condicion)
+    lineas = DetalleFactura.__table__
+    productos = Producto.__table__
+
+    vendido = (
+        db.select(lineas.c.id_producto, db.func.sum(lineas.c.cantidad).label('unidades'))
+        .where(lineas.c.id_factura.in_(seleccion))
+        .group_by(lineas.c.id_producto)
+        .subquery()
+    )
+    db.session.execute(
+        productos.update()
+        .where(productos.c.id == vendido.c.id_producto)
+        .values(stock=productos.c.stock + vendido.c.unidades)
+    )
+    resumenes.descontar_facturas(condicion)
+    db.session.execute(lineas.delete().where(lineas.c.id_factura.in_(seleccion)))
+    db.session.execute(Factura.__table__.delete().where(condicion))
+    return ids
@@ -0,0 +1,217 @@
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from itertools import chain
+
+from flask import render_template
+from sqlalchemy import event, inspect
+
+from .. import db
+from ..models import DetalleFactura, Factura
+from . import resumenes
+from .cache import CacheTTL
+from .conexiones import SesionEnrutada
+from .facturacion import TAMANO_IN
+from .paginacion import paginar_keyset
+
+VistaFactura = namedtuple('VistaFactura', 'id_cliente datos html version')
+
+# Por proceso: al eliminar o reparar una factura en otro worker (o desde la
+# CLI) la entrada de éste no se entera, así que `vista_factura` la contrasta
+# con la fila antes de servirla.
+vistas = CacheTTL('facturas', maximo=2048, ttl=3600)
+
+
+def rango_fechas(desde=None, hasta=None):
+    """Convierte un rango de días en límites [inicio, fin) sobre `Factura.fecha`.
+
+    Comparar la columna directamente (en lugar de `date(fecha)`) permite que
+    la consulta use `idx_factura_fecha`.
+    """
+    inicio = datetime.combine(desde, time.min) if desde else None
+    fin = datetime.combine(hasta + timedelta(days=1), time.min) if hasta else None
+    return inicio, fin
+
+
+def _condiciones(cliente_id=None, desde=None, hasta=None):
+    inicio, fin = rango_fechas(desde, hasta)
+    condiciones = []
+    if cliente_id:
+        condiciones.append(Factura.id_cliente == cliente_id)
+    if inicio is not None:
+        condiciones.append(Factura.fecha >= inicio)
+    if fin is not None:
+        condiciones.append(Factura.fecha < fin)
+    return condiciones
+
+
+def filtrar_facturas(query, cliente_id=None, desde=None, hasta=None):
+    return query.filter(*_condiciones(cliente_id, desde, hasta))
+
+
+def condicion_facturas(cliente_id=None, desde=None, hasta=None):
+    """Los mismos filtros que `filtrar_facturas`, como expresión para UPDATE o DELETE."""
+    condiciones = _condiciones(cliente_id, desde, hasta)
+    return db.and_(*condiciones) if condiciones else db.true()
+
+
+def listar_facturas(por_pagina, cliente_id=None, desde=None, hasta=None, despues=None, antes=None,
+                    descendente=True):
+    """Página de facturas con el cliente precargado.
+
+    Por defecto se ordenan de la más reciente a la más antigua.
+    """
+    query = Factura.query.options(db.joinedload(Factura.cliente))
+    query = filtrar_facturas(query, cliente_id=cliente_id, desde=desde, hasta=hasta)
+    return paginar_keyset(
+        query,
+        [Factura.fecha, Factura.id],
+        por_pagina,
+        despues=despues,
+        antes=antes,
+        descendente=descendente,
+    )
+
+
+def cargar_factura(id):
+    """Factura con su cliente, líneas y productos en dos consultas."""
+    return db.session.get(Factura, id, options=[
+        db.joinedload(Factura.cliente),
+        db.selectinload(Factura.detalles).joinedload(DetalleFactura.producto),
+    ])
+
+
+def datos_factura(factura):
+    """Copia de la factura en tipos simples (JSON y pickle), con los montos ya formateados."""
+    return {
+        'id': factura.id,
+        'id_cliente': factura.id_cliente,
+        'cliente': factura.cliente.nombre,
+        'fecha': factura.fecha.isoformat(),
+        'total': '%.2f' % factura.total,
+        'lineas': [
+            {
+                'id_producto': detalle.id_producto,
+                'producto': detalle.producto.descripcion,
+                'cantidad': detalle.cantidad,
+                'precio_unitario': '%.2f' % detalle.precio_unitario,
+                'subtotal': '%.2f' % detalle.subtotal,
+            }
+            for detalle in factura.detalles
+        ],
+    }
+
+
+def vista_factura(id):
+    """Datos y HTML del detalle de la factura, desde la caché si ya se generaron.
+
+    Una vista en caché se sirve sólo si la factura sigue existiendo con los
+    mismos totales (una consulta por clave primaria); si no, se descarta.
+    Devuelve None si la factura no existe.
+    """
+    vista = vistas.get(id)
+    if vista is not None:
+        fila = db.session.query(Factura.total, Factura.cantidad_lineas, Factura.cantidad_unidades) \
+            .filter(Factura.id == id).first()
+        if fila is None or tuple(fila) != vista.version:
+            vistas.invalidar(id)
+            if fila is None:
+                return None
+            vista = None
+    if vista is None:
+        factura = cargar_factura(id)
+        if factura is None:
+            return None
+        vista = VistaFactura(
+            factura.id_cliente,
+            datos_factura(factura),
+            render_template('facturas/_detalle.html', factura=factura),
+            (factura.total, factura.cantidad_lineas, factura.cantidad_unidades),
+        )
+        vistas.set(id, vista)
+    return vista
+
+
+def invalidar_vista(id):
+    vistas.invalidar(id)
+
+
+# --- Totales desnormalizados -------------------------------------------------
+
+Diferencia = namedtuple('Diferencia', 'id total cantidad_lineas cantidad_unidades total_real lineas unidades')
+
+
+@event.listens_for(SesionEnrutada, 'before_flush')
+def _actualizar_totales(session, contexto, instancias):
+    """Recalcula los totales de las facturas cuyas líneas cambian por el ORM, antes de escribirlas.
+
+    Las altas con sentencias Core (`facturacion.crear_facturas`, la
+    importación) ya insertan los totales calculados.
+    """
+    afectadas = {objeto for objeto in session.new if isinstance(objeto, Factura)}
+    for objeto in chain(session.new, session.dirty, session.deleted):
+        if isinstance(objeto, DetalleFactura):
+            estado = inspect(objeto)
+            if objeto not in session.deleted and (
+                estado.attrs.cantidad.history.has_changes() or estado.attrs.precio_unitario.history.has_changes()
+            ):
+                objeto.calcular_subtotal()
+            if objeto.factura is not None:
+                afectadas.add(objeto.factura)
+        elif isinstance(objeto, Factura) and inspect(objeto).attrs.detalles.history.has_changes():
+            afectadas.add(objeto)
+    for factura in afectadas:
+        if factura not in session.deleted:
+            factura.calcular_total([d for d in factura.detalles if d not in session.deleted])
+
+
+def _diferencias():
+    detalle = DetalleFactura.__table__.c
+    lineas = db.func.count(detalle.id)
+    unidades = db.func.coalesce(db.func.sum(detalle.cantidad), 0)
+    total = db.func.coalesce(db.func.sum(detalle.subtotal), 0)
+    return (
+        db.select(
+            Factura.id, Factura.total, Factura.cantidad_lineas, Factura.cantidad_unidades,
+            total, lineas, unidades,
+        )
+        .outerjoin(DetalleFactura.__table__, detalle.id_factura == Factura.id)
+        .group_by(Factura.id, Factura.total, Factura.cantidad_lineas, Factura.cantidad_unidades)
+        # Los montos son centavos enteros: la comparación es exacta.
+        .having(
+            (Factura.cantidad_lineas != lineas)
+            | (Factura.cantidad_unidades != unidades)
+            | (Factura.total != total)
+        )
+        .order_by(Factura.id)
+    )
+
+
+def verificar_totales():
+    """Facturas cuyos totales guardados no coinciden con sus líneas, en una sola consulta agregada."""
+    return [Diferencia(*fila) for fila in db.session.execute(_diferencias())]
+
+
+def reparar_totales(ids):
+    """Recalcula desde las líneas los totales de las facturas `ids` y el resumen de ventas. No hace commit."""
+    if not ids:
+        return 0
+    detalle = DetalleFactura.__table__.c
+
+    def agregado(expresion):
+        return db.select(expresion).where(detalle.id_factura == Factura.id).scalar_subquery()
+
+    reparadas = 0
+    for inicio in range(0, len(ids), TAMANO_IN):
+        reparadas += db.session.execute(
+            db.update(Factura.__table__)
+            .where(Factura.id.in_(ids[inicio:inicio + TAMANO_IN]))
+            .values(
+                total=agregado(db.func.coalesce(db.func.sum(detalle.subtotal), 0)),
+                cantidad_lineas=agregado(db.func.count(detalle.id)),
+                cantidad_unidades=agregado(db.func.coalesce(db.func.sum(detalle.cantidad), 0)),
+            )
+        ).rowcount
+    resumenes.reconstruir()
+    for id in ids:
+        invalidar_vista(id)
+    return reparadas
@@ -0,0 +1,114 @@
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+
+from .. import db
+from ..models import Cliente, Usuario
+from .cache import CacheTTL
+
+PREFIJO_USUARIO = 'u'
+PREFIJO_CLIENTE = 'c'
+
+# Clave: `u:<id>` / `c:<id>`, o `c:<email>` para las sesiones anteriores que
+# guardaban el email del cliente. Las modificaciones confirmadas en este
+# proceso invalidan sus entradas; los demás workers ven el cambio al vencer
+# CACHE_USUARIOS_TTL.
+identidades = CacheTTL('identidades')
+
+_TIPOS = {Usuario: PREFIJO_USUARIO, Cliente: PREFIJO_CLIENTE}
+_CLAVE_SESION = 'identidades_modificadas'
+
+
+class Identidad(UserMixin):
+    """Datos mínimos del usuario en sesión, reconstruidos sin tocar la base en cada petición.
+
+    Expone lo que usan las vistas y plantillas de `current_user`; no es un
+    objeto del ORM, así que no tiene relaciones cargables.
+    """
+
+    def __init__(self, tipo, id, nombre, email):
+        self.tipo = tipo
+        self.id = id
+        self.nombre = nombre
+        self.email = email
+
+    @property
+    def is_admin(self) -> bool:
+        return self.tipo == PREFIJO_USUARIO
+
+    def get_id(self):
+        return f'{self.tipo}:{self.id}'
+
+
+def id_sesion(tipo, id):
+    return f'{tipo}:{id}'
+
+
+def _interpretar(user_id):
+    """Devuelve `(tipo, valor)` para ids tipados y para los formatos anteriores.
+
+    Antes se guardaba el id numérico de `Usuario` o el email de `Cliente`; se
+    siguen aceptando para no invalidar las sesiones y cookies existentes.
+    """
+    tipo, separador, valor = user_id.partition(':')
+    if separador and tipo in (PREFIJO_USUARIO, PREFIJO_CLIENTE) and valor.isdigit():
+        return tipo, int(valor)
+    if user_id.isdigit():
+        return PREFIJO_USUARIO, int(user_id)
+    if '@' in user_id:
+        return PREFIJO_CLIENTE, user_id
+    return None, None
+
+
+def _buscar(tipo, valor):
+    modelo = Usuario if tipo == PREFIJO_USUARIO else Cliente
+    query = db.session.query(modelo.id, modelo.nombre, modelo.email)
+    if isinstance(valor, int):
+        fila = query.filter(modelo.id == valor).first()
+    else:
+        fila = query.filter(modelo.email == valor).first()
+    if fila is None:
+        return None
+    return Identidad(tipo, fila.id, fila.nombre, fila.email)
+
+
+def cargar(user_id):
+    """Obtiene la identidad de la sesión, desde la caché si está vigente."""
+    tipo, valor = _interpretar(user_id)
+    if tipo is None:
+        return None
+    clave = id_sesion(tipo, valor)
+    identidad = identidades.get(clave)
+    if identidad is not None:
+        return identidad
+    identidad = _buscar(tipo, valor)
+    if identidad is not None:
+        identidades.set(clave, identidad)
+    return identidad
+
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_modificadas(session, contexto):
+    # Después del flush el historial de atributos sigue disponible: se
+    # invalidan también las claves por el email anterior de un cliente.
+    claves = session.info.setdefault(_CLAVE_SESION, set())
+    for objeto in (*session.dirty, *session.deleted):
+        tipo = _TIPOS.get(type(objeto))
+        if tipo is None or objeto.id is None:
+            continue
+        claves.add(id_sesion(tipo, objeto.id))
+        if tipo == PREFIJO_CLIENTE:
+            historial = inspect(objeto).attrs.email.history
+            for email in (*historial.added, *historial.unchanged, *historial.deleted):
+                if email:
+                    claves.add(id_sesion(tipo, email))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_modificadas(session):
+    for clave in session.info.pop(_CLAVE_SESION, ()):
+        identidades.invalidar(clave)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_modificadas(session):
+    session.info.pop(_CLAVE_SESION, None)
@@ -0,0 +1,452 @@
+"""Importación masiva de clientes, productos y facturas históricas.
+
+Los archivos (CSV con encabezado o JSONL) se leen en streaming y se insertan
+con `executemany` en lotes, una transacción por lote, sin pasar por el ORM:
+la memoria no depende del tamaño del archivo salvo por los conjuntos de ids
+y emails que se usan para validar en memoria. Las filas inválidas se saltean
+y se informan con su número de línea; un error de la base corta la
+importación, pero los lotes anteriores quedan confirmados.
+
+Como las inserciones no disparan los eventos del ORM, al terminar se
+reconstruyen el índice de búsqueda o el resumen de ventas y se invalidan los
+catálogos según corresponda.
+"""
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+from flask import current_app
+from werkzeug.security import generate_password_hash
+
+from .. import db
+from ..models import Cliente, DetalleFactura, Factura, Producto
+from . import busqueda, catalogo, resumenes
+from .dinero import redondear
+
+LOTE = 5000
+# Contraseñas por tarea del pool: con los parámetros de producción, unos segundos de CPU.
+TANDA_HASH = 32
+MAX_ERRORES_INFORMADOS = 20
+
+
+class ErrorImportacion(Exception):
+    """La importación no puede continuar (archivo ilegible o error de la base)."""
+
+
+class Resultado:
+    def __init__(self):
+        self.importadas = 0
+        self.rechazadas = 0
+        self.errores = []
+        self.inicio = time.perf_counter()
+        self.segundos = 0.0
+        self.hasheadas = 0
+        self.segundos_hash = 0.0
+
+    def rechazar(self, linea, mensaje):
+        self.rechazadas += 1
+        if len(self.errores) < MAX_ERRORES_INFORMADOS:
+            self.errores.append(f'línea {linea}: {mensaje}')
+
+    def terminar(self):
+        self.segundos = time.perf_counter() - self.inicio
+        return self
+
+    @property
+    def por_segundo(self):
+        return self.importadas / self.segundos if self.segundos else 0.0
+
+
+# --- Lectura -----------------------------------------------------------------
+
+def formato_de(ruta):
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    raise ErrorImportacion(f'No se reconoce el formato de {ruta}; use --formato csv o jsonl')
+
+
+def leer_filas(ruta, formato=None):
+    """Genera `(número de línea, dict)` por cada registro del archivo."""
+    formato = formato or formato_de(ruta)
+    with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+        if formato == 'csv':
+            lector = csv.DictReader(archivo)
+            for fila in lector:
+                yield lector.line_num, {k: (v.strip() if isinstance(v, str) else v) for k, v in fila.items()}
+            return
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except json.JSONDecodeError as e:
+                raise ErrorImportacion(f'línea {numero}: JSON inválido ({e.msg})')
+            if not isinstance(fila, dict):
+                raise ErrorImportacion(f'línea {numero}: se esperaba un objeto JSON')
+            yield numero, fila
+
+
+def _lotes(iterable, tamano):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _texto(fila, campo, requerido=True, largo=None):
+    valor = fila.get(campo)
+    valor = '' if valor is None else str(valor).strip()
+    if requerido and not valor:
+        raise ValueError(f'falta {campo}')
+    if largo is not None and len(valor) > largo:
+        raise ValueError(f'{campo} supera {largo} caracteres')
+    return valor or None
+
+
+def _entero(fila, campo, requerido=True, minimo=None):
+    valor = fila.get(campo)
+    if valor in (None, ''):
+        if requerido:
+            raise ValueError(f'falta {campo}')
+        return None
+    try:
+        if isinstance(valor, bool):
+            raise TypeError
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f'{campo} no es un entero')
+    if minimo is not None and numero < minimo:
+        raise ValueError(f'{campo} debe ser al menos {minimo}')
+    return numero
+
+
+def _monto(fila, campo):
+    valor = fila.get(campo)
+    try:
+        monto = redondear(valor)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'{campo} no es un monto válido')
+    if not monto.is_finite() or monto < 0:
+        raise ValueError(f'{campo} debe ser un monto no negativo')
+    return monto
+
+
+def _fecha(fila, campo):
+    try:
+        return datetime.fromisoformat(str(fila.get(campo) or ''))
+    except ValueError:
+        raise ValueError(f'{campo} no es una fecha ISO (AAAA-MM-DD[THH:MM:SS])')
+
+
+def _insertar(tabla, filas):
+    try:
+        with db.engine.begin() as conexion:
+            conexion.execute(tabla.insert(), filas)
+    except Exception as e:
+        raise ErrorImportacion(f'La base rechazó un lote de {tabla.name}: {e.__class__.__name__}: {e}') from e
+
+
+def _insertar_por_columnas(tabla, filas):
+    """Inserta separando las filas con y sin `id`: executemany necesita las mismas columnas."""
+    for con_id in (True, False):
+        grupo = [f for f in filas if ('id' in f) == con_id]
+        if grupo:
+            _insertar(tabla, grupo)
+
+
+def _ajustar_secuencia(tabla):
+    """En PostgreSQL, lleva la secuencia del id por encima de los ids importados."""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with db.engine.begin() as conexion:
+        conexion.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{tabla.name}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {tabla.name}))"
+        ))
+
+
+def _ids(columna):
+    return set(db.session.scalars(db.select(columna)))
+
+
+# --- Clientes ----------------------------------------------------------------
+
+def _hashear(argumentos):
+    """Se ejecuta en el pool: hashea una tanda de `(email, password)`."""
+    metodo, largo_sal, pares = argumentos
+    return [
+        {'hash': generate_password_hash(password, method=metodo, salt_length=largo_sal), 'e': email}
+        for email, password in pares
+    ]
+
+
+def _en_paralelo(funcion, trabajos, workers):
+    """`map` ordenado en un pool de procesos con a lo sumo `2 * workers` trabajos pendientes."""
+    if workers <= 1:
+        yield from map(funcion, trabajos)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pendientes = deque()
+        for trabajo in trabajos:
+            pendientes.append(pool.submit(funcion, trabajo))
+            if len(pendientes) >= 2 * workers:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+
+def _hashear_diferidos(ruta, formato, emails, lote, workers):
+    """Segunda pasada: lee de nuevo el archivo y guarda el hash de las contraseñas en texto plano.
+
+    Sólo se actualizan los clientes insertados en esta importación.
+    """
+    metodo = current_app.config['PASSWORD_HASH_METHOD']
+    largo_sal = current_app.config['PASSWORD_SALT_LENGTH']
+    pares = (
+        (fila['email'].strip(), str(fila['password']))
+        for _, fila in leer_filas(ruta, formato)
+        if fila.get('password') and not fila.get('password_hash') and (fila.get('email') or '').strip() in emails
+    )
+    trabajos = ((metodo, largo_sal, tanda) for tanda in _lotes(pares, TANDA_HASH))
+    tabla = Cliente.__table__
+    sentencia = tabla.update().where(tabla.c.email == db.bindparam('e')).values(password_hash=db.bindparam('hash'))
+    total = 0
+    for filas in _lotes((f for tanda in _en_paralelo(_hashear, trabajos, workers) for f in tanda), lote):
+        with db.engine.begin() as conexion:
+            conexion.execute(sentencia, filas)
+        total += len(filas)
+    return total
+
+
+def importar_clientes(ruta, formato=None, lote=LOTE, passwords='diferir', workers=1):
+    """Importa clientes: `nombre`, `email` y opcionalmente `id`, `direccion`, `telefono`.
+
+    La contraseña puede venir ya hasheada (`password_hash`, formato de
+    Werkzeug) o en texto plano (`password`). Con `passwords='diferir'` las de
+    texto plano se hashean después de insertar todas las filas, en una
+    segunda pasada en paralelo; con `'omitir'` se ignoran y esos clientes no
+    pueden iniciar sesión hasta que se les asigne una.
+    """
+    largos = current_app.config['STRING_LENGTHS']
+    resultado = Resultado()
+    emails = set(db.session.scalars(db.select(Cliente.email)))
+    ids = _ids(Cliente.id)
+    diferidos = set()
+
+    def validar(numero, fila):
+        try:
+            id = _entero(fila, 'id', requerido=False, minimo=1)
+            email = _texto(fila, 'email', largo=largos['email'])
+            if '@' not in email:
+                raise ValueError('email inválido')
+            if email in emails:
+                raise ValueError(f'el email {email} ya existe')
+            if id is not None and id in ids:
+                raise ValueError(f'el id {id} ya existe')
+            password_hash = _texto(fila, 'password_hash', requerido=False, largo=largos['password'])
+            if password_hash is not None and '$' not in password_hash:
+                raise ValueError('password_hash no tiene el formato de Werkzeug')
+            valores = {
+                'nombre': _texto(fila, 'nombre', largo=largos['nombre']),
+                'email': email,
+                'direccion': _texto(fila, 'direccion', requerido=False, largo=largos['direccion']),
+                'telefono': _texto(fila, 'telefono', requerido=False, largo=largos['telefono']),
+                'password_hash': password_hash,
+                'es_cliente': True,
+            }
+        except ValueError as e:
+            resultado.rechazar(numero, e)
+            return None
+        emails.add(email)
+        if id is not None:
+            ids.add(id)
+            valores['id'] = id
+        if password_hash is None and fila.get('password') and passwords == 'diferir':
+            diferidos.add(email)
+        return valores
+
+    try:
+        for lote_filas in _lotes(leer_filas(ruta, formato), lote):
+            filas = [v for v in (validar(n, f) for n, f in lote_filas) if v is not None]
+            _insertar_por_columnas(Cliente.__table__, filas)
+            resultado.importadas += len(filas)
+    finally:
+        _ajustar_secuencia(Cliente.__table__)
+        catalogo.invalidar('clientes')
+    # El ritmo informado es el de la carga; el hasheo se mide por separado.
+    resultado.terminar()
+    if diferidos:
+        inicio = time.perf_counter()
+        resultado.hasheadas = _hashear_diferidos(ruta, formato, diferidos, lote, workers)
+        resultado.segundos_hash = time.perf_counter() - inicio
+    return resultado
+
+
+# --- Productos ---------------------------------------------------------------
+
+def importar_productos(ruta, formato=None, lote=LOTE):
+    """Importa productos: `descripcion`, `precio` y opcionalmente `id` y `stock`."""
+    largos = current_app.config['STRING_LENGTHS']
+    resultado = Resultado()
+    ids = _ids(Producto.id)
+
+    def validar(numero, fila):
+        try:
+            id = _entero(fila, 'id', requerido=False, minimo=1)
+            if id is not None and id in ids:
+                raise ValueError(f'el id {id} ya existe')
+            valores = {
+                'descripcion': _texto(fila, 'descripcion', largo=largos['descripcion']),
+                'precio': _monto(fila, 'precio'),
+                'stock': _entero(fila, 'stock', requerido=False, minimo=0) or 0,
+            }
+        except ValueError as e:
+            resultado.rechazar(numero, e)
+            return None
+        if id is not None:
+            ids.add(id)
+            valores['id'] = id
+        return valores
+
+    try:
+        for lote_filas in _lotes(leer_filas(ruta, formato), lote):
+            filas = [v for v in (validar(n, f) for n, f in lote_filas) if v is not None]
+            _insertar_por_columnas(Producto.__table__, filas)
+            resultado.importadas += len(filas)
+    finally:
+        _ajustar_secuencia(Producto.__table__)
+        busqueda.reconstruir_indice()
+        db.session.commit()
+        catalogo.invalidar('productos')
+    return resultado.terminar()
+
+
+# --- Facturas ----------------------------------------------------------------
+
+def _facturas_de(ruta, formato):
+    """Genera `(número de línea, factura)` con sus ítems en `items`.
+
+    En JSONL cada línea es una factura con su lista `items`. En CSV cada fila
+    es un ítem y las filas consecutivas con el mismo valor en `factura` forman
+    una factura (el archivo debe venir agrupado por esa columna).
+    """
+    formato = formato or formato_de(ruta)
+    filas = leer_filas(ruta, formato)
+    if formato == 'jsonl':
+        yield from filas
+        return
+    for clave, grupo in groupby(filas, key=lambda nf: nf[1].get('factura')):
+        grupo = list(grupo)
+        numero, primera = grupo[0]
+        yield numero, {
+            'id': primera.get('id'),
+            'id_cliente': primera.get('id_cliente'),
+            'fecha': primera.get('fecha'),
+            'items': [f for _, f in grupo],
+        }
+
+
+def importar_facturas(ruta, formato=None, lote=LOTE):
+    """Importa facturas históricas con sus ítems.
+
+    Cada factura tiene `id_cliente`, `fecha` y opcionalmente `id` (para
+    conservar la numeración); cada ítem `id_producto`, `cantidad` y
+    `precio_unitario`. El total y los subtotales se calculan con Decimal.
+    Son ventas pasadas: no se descuenta stock. `lote` cuenta ítems.
+
+    Las facturas sin `id` se numeran a continuación de la última existente.
+    Un `id` explícito que ya exista en la base hace fallar su lote.
+    """
+    resultado = Resultado()
+    clientes = _ids(Cliente.id)
+    productos = _ids(Producto.id)
+    siguiente = (db.session.scalar(db.select(db.func.max(Factura.id))) or 0) + 1
+    usados = set()
+    lineas = 0
+
+    def validar(numero, datos):
+        try:
+            id = _entero(datos, 'id', requerido=False, minimo=1)
+            if id is not None and id in usados:
+                raise ValueError(f'la factura {id} está repetida en el archivo')
+            id_cliente = _entero(datos, 'id_cliente')
+            if id_cliente not in clientes:
+                raise ValueError(f'el cliente {id_cliente} no existe')
+            fecha = _fecha(datos, 'fecha')
+            items = datos.get('items')
+            if not isinstance(items, list) or not items:
+                raise ValueError('la factura no tiene ítems')
+            detalles = []
+            for item in items:
+                id_producto = _entero(item, 'id_producto')
+                if id_producto not in productos:
+                    raise ValueError(f'el producto {id_producto} no existe')
+                cantidad = _entero(item, 'cantidad', minimo=1)
+                precio = _monto(item, 'precio_unitario')
+                detalles.append({
+                    'id_producto': id_producto,
+                    'cantidad': cantidad,
+                    'precio_unitario': precio,
+                    'subtotal': precio * cantidad,
+                })
+        except ValueError as e:
+            resultado.rechazar(numero, e)
+            return None
+        return id, {'id_cliente': id_cliente, 'fecha': fecha}, detalles
+
+    pendientes = []
+    try:
+        for numero, datos in _facturas_de(ruta, formato):
+            validada = validar(numero, datos)
+            if validada is None:
+                continue
+            id, factura, detalles = validada
+            if id is None:
+                while siguiente in usados:
+                    siguiente += 1
+                id = siguiente
+            usados.add(id)
+            factura['id'] = id
+            factura['total'] = sum((d['subtotal'] for d in detalles), Decimal('0'))
+            factura['cantidad_lineas'] = len(detalles)
+            factura['cantidad_unidades'] = sum(d['cantidad'] for d in detalles)
+            for detalle in detalles:
+                detalle['id_factura'] = id
+            pendientes.append((factura, detalles))
+            lineas += len(detalles)
+            if lineas >= lote:
+                _insertar_facturas(pendientes)
+                resultado.importadas += len(pendientes)
+                pendientes, lineas = [], 0
+        if pendientes:
+            _insertar_facturas(pendientes)
+            resultado.importadas += len(pendientes)
+    finally:
+        # También si un lote falló: el resumen debe reflejar los lotes confirmados.
+        _ajustar_secuencia(Factura.__table__)
+        resumenes.reconstruir()
+        db.session.commit()
+    return resultado.terminar()
+
+
+def _insertar_facturas(pendientes):
+    try:
+        with db.engine.begin() as conexion:
+            conexion.execute(Factura.__table__.insert(), [f for f, _ in pendientes])
+            conexion.execute(DetalleFactura.__table__.insert(), [d for _, ds in pendientes for d in ds])
+    except Exception as e:
+        raise ErrorImportacion(f'La base rechazó un lote de facturas: {e.__class__.__name__}: {e}') from e
@@ -0,0 +1,237 @@
+"""Métricas de peticiones y de SQL por endpoint, en formato de texto de Prometheus.
+
+Como las cachés, los contadores son del proceso: con varios workers de
+gunicorn cada uno expone los suyos y se reinician al reiniciar el worker.
+
+Las sentencias SQL se miden con eventos de `Engine`, así que cuentan todos
+los motores (principal, réplica y lectura). Fuera de una petición sólo se
+registran las consultas lentas.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SENTENCIAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Marcadores de parámetros y listas de IN: dos sentencias que sólo difieren
+# en la cantidad de valores cuentan como la misma forma. Sólo se agrupan los
+# SELECT; los INSERT repetidos de un lote son esperables.
+_MARCADORES = re.compile(r'%\(\w+\)s|\$\d+|\?')
+_LISTAS = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+def forma_sentencia(sentencia):
+    return _LISTAS.sub('?', _MARCADORES.sub('?', ' '.join(sentencia.split())))
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)
+        self.suma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        self.cuentas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulados(self):
+        acumulado = 0
+        for limite, cuenta in zip((*self.limites, '+Inf'), self.cuentas):
+            acumulado += cuenta
+            yield limite, acumulado
+
+
+class _Peticion:
+    __slots__ = ('inicio', 'sentencias', 'tiempo_sql', 'formas')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.sentencias = 0
+        self.tiempo_sql = 0.0
+        self.formas = Counter()
+
+
+def _etiquetas(**valores):
+    pares = []
+    for nombre, valor in valores.items():
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{nombre}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.duraciones = {}
+        self.sentencias = {}
+        self.peticiones = Counter()
+        self.sql_segundos = Counter()
+        self.sql_lentas = Counter()
+        self.n_mas_uno = Counter()
+
+    def limpiar(self):
+        with self._lock:
+            self._reiniciar()
+
+    def registrar(self, endpoint, metodo, estado, duracion, peticion, n_mas_uno):
+        with self._lock:
+            clave = (endpoint, metodo)
+            if clave not in self.duraciones:
+                self.duraciones[clave] = Histograma(BUCKETS_SEGUNDOS)
+            self.duraciones[clave].observar(duracion)
+            if endpoint not in self.sentencias:
+                self.sentencias[endpoint] = Histograma(BUCKETS_SENTENCIAS)
+            self.sentencias[endpoint].observar(peticion.sentencias)
+            self.peticiones[(endpoint, metodo, estado)] += 1
+            self.sql_segundos[endpoint] += peticion.tiempo_sql
+            if n_mas_uno:
+                self.n_mas_uno[endpoint] += 1
+
+    def consulta_lenta(self, endpoint):
+        with self._lock:
+            self.sql_lentas[endpoint] += 1
+
+    def exportar(self):
+        """Texto en el formato de exposición de Prometheus (versión 0.0.4)."""
+        lineas = []
+
+        def encabezado(nombre, tipo, ayuda):
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+
+        def histograma(nombre, etiquetas, h):
+            for limite, acumulado in h.acumulados():
+                lineas.append(f'{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}')
+            lineas.append(f'{nombre}_sum{_etiquetas(**etiquetas)} {h.suma:.6f}')
+            lineas.append(f'{nombre}_count{_etiquetas(**etiquetas)} {h.total}')
+
+        with self._lock:
+            encabezado('sis_peticion_duracion_segundos', 'histogram', 'Duración de las peticiones por endpoint.')
+            for (endpoint, metodo), h in sorted(self.duraciones.items()):
+                histograma('sis_peticion_duracion_segundos', {'endpoint': endpoint, 'metodo': metodo}, h)
+
+            encabezado('sis_peticiones_total', 'counter', 'Peticiones atendidas por endpoint y estado.')
+            for (endpoint, metodo, estado), n in sorted(self.peticiones.items()):
+                lineas.append(f'sis_peticiones_total{_etiquetas(endpoint=endpoint, metodo=metodo, estado=estado)} {n}')
+
+            encabezado('sis_sql_sentencias_por_peticion', 'histogram', 'Sentencias SQL ejecutadas por petición.')
+            for endpoint, h in sorted(self.sentencias.items()):
+                histograma('sis_sql_sentencias_por_peticion', {'endpoint': endpoint}, h)
+
+            encabezado('sis_sql_segundos_total', 'counter', 'Tiempo total en SQL por endpoint.')
+            for endpoint, segundos in sorted(self.sql_segundos.items()):
+                lineas.append(f'sis_sql_segundos_total{_etiquetas(endpoint=endpoint)} {segundos:.6f}')
+
+            encabezado('sis_sql_lentas_total', 'counter', 'Sentencias que superaron SQL_LENTA_SEGUNDOS.')
+            for endpoint, n in sorted(self.sql_lentas.items()):
+                lineas.append(f'sis_sql_lentas_total{_etiquetas(endpoint=endpoint)} {n}')
+
+            encabezado('sis_n_mas_uno_total', 'counter', 'Peticiones con muchas sentencias SQL de la misma forma.')
+            for endpoint, n in sorted(self.n_mas_uno.items()):
+                lineas.append(f'sis_n_mas_uno_total{_etiquetas(endpoint=endpoint)} {n}')
+        return '\n'.join(lineas) + '\n'
+
+
+metricas = Metricas()
+
+
+# --- Eventos de SQL ----------------------------------------------------------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._inicio_metricas = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_inicio_metricas', None)
+    if inicio is None or not has_app_context():
+        return
+    duracion = time.perf_counter() - inicio
+    peticion = g.get('_metricas')
+    if peticion is not None:
+        peticion.sentencias += 1
+        peticion.tiempo_sql += duracion
+        if statement.lstrip()[:6].upper() == 'SELECT':
+            peticion.formas[forma_sentencia(statement)] += 1
+    if duracion >= current_app.config['SQL_LENTA_SEGUNDOS']:
+        endpoint = (request.endpoint or 'sin_ruta') if peticion is not None else 'fuera_de_peticion'
+        metricas.consulta_lenta(endpoint)
+        current_app.logger.warning(
+            'Consulta lenta (%.3f s) en %s: %s', duracion, endpoint, ' '.join(statement.split())[:500]
+        )
+
+
+# --- Hooks de la aplicación --------------------------------------------------
+
+def _iniciar_peticion():
+    g._metricas = _Peticion()
+
+
+def _registrar_peticion(app, peticion, endpoint, metodo, ruta, estado):
+    """Registra la petición ya terminada; no usa el contexto, que en una respuesta en streaming ya no está."""
+    duracion = time.perf_counter() - peticion.inicio
+    n_mas_uno = False
+    if peticion.formas:
+        forma, veces = peticion.formas.most_common(1)[0]
+        if veces >= app.config['SQL_N_MAS_UNO_UMBRAL']:
+            n_mas_uno = True
+            app.logger.warning(
+                'Posible N+1 en %s: %s de %s sentencias son: %s', endpoint, veces, peticion.sentencias, forma[:300]
+            )
+    if duracion >= app.config['PETICION_LENTA_SEGUNDOS']:
+        app.logger.warning(
+            'Petición lenta: %s %s en %.3f s (%s sentencias SQL, %.3f s)',
+            metodo, ruta, duracion, peticion.sentencias, peticion.tiempo_sql
+        )
+    metricas.registrar(endpoint, metodo, estado, duracion, peticion, n_mas_uno)
+
+
+def _mostrar_server_timing():
+    # Tiempo y cantidad de SQL sólo para administradores (o con el flag, en desarrollo).
+    from flask_login import current_user
+
+    return current_app.config['METRICAS_SERVER_TIMING'] or getattr(current_user, 'is_admin', False)
+
+
+def _terminar_peticion(respuesta):
+    peticion = g.get('_metricas')
+    if peticion is None:
+        return respuesta
+    datos = (current_app._get_current_object(), peticion, request.endpoint or 'sin_ruta',
+             request.method, request.path, respuesta.status_code)
+    if respuesta.is_streamed:
+        # Las exportaciones consultan la base mientras se envían: `g._metricas`
+        # sigue vigente durante el streaming y se registra al cerrar la respuesta.
+        respuesta.call_on_close(lambda: _registrar_peticion(*datos))
+    else:
+        g.pop('_metricas')
+        _registrar_peticion(*datos)
+
+    if _mostrar_server_timing():
+        duracion = time.perf_counter() - peticion.inicio
+        respuesta.headers['Server-Timing'] = (
+            f'sql;desc="{peticion.sentencias} sentencias";dur={peticion.tiempo_sql * 1000:.1f}, '
+            f'total;dur={duracion * 1000:.1f}'
+        )
+    return respuesta
+
+
+def instrumentar(app):
+    """Mide cada petición de la app si `METRICAS_ACTIVAS` está activo."""
+    if app.config['METRICAS_ACTIVAS']:
+        app.before_request(_iniciar_peticion)
+        app.after_request(_terminar_peticion)
@@ -0,0 +1,104 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from .. import db
+
+
+class PaginaKeyset:
+    """Una página de resultados con los cursores para navegar hacia adelante y atrás."""
+
+    def __init__(self, items, siguiente=None, anterior=None):
+        self.items = items
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    @property
+    def tiene_siguiente(self) -> bool:
+        return self.siguiente is not None
+
+    @property
+    def tiene_anterior(self) -> bool:
+        return self.anterior is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _serializar(valor):
+    if isinstance(valor, datetime):
+        return {'d': valor.isoformat()}
+    return valor
+
+
+def _deserializar(valor):
+    if isinstance(valor, dict) and 'd' in valor:
+        return datetime.fromisoformat(valor['d'])
+    return valor
+
+
+def codificar_cursor(valores):
+    """Codifica los valores de la clave de ordenamiento en un token opaco para la URL."""
+    crudo = json.dumps([_serializar(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token, cantidad):
+    """Decodifica un token generado por `codificar_cursor`.
+
+    Lanza ValueError si el token está malformado o no tiene `cantidad` valores.
+    """
+    try:
+        relleno = '=' * (-len(token) % 4)
+        crudo = base64.urlsafe_b64decode((token + relleno).encode('ascii'))
+        valores = [_deserializar(v) for v in json.loads(crudo.decode('utf-8'))]
+    except (binascii.Error, UnicodeError, json.JSONDecodeError, TypeError, ValueError) as e:
+        raise ValueError('Cursor de paginación inválido') from e
+    if len(valores) != cantidad:
+        raise ValueError('Cursor de paginación inválido')
+    return valores
+
+
+def paginar_keyset(query, columnas, por_pagina, despues=None, antes=None, descendente=True):
+    """Pagina `query` por la clave compuesta `columnas` sin usar OFFSET.
+
+    `despues` y `antes` son cursores devueltos en páginas anteriores; a lo sumo
+    uno de los dos debe indicarse. La última columna debe ser única (p. ej. el id)
+    para que el orden sea total.
+    """
+    clave = db.tuple_(*columnas)
+    hacia_atras = antes is not None and despues is None
+
+    if despues is not None:
+        valores = decodificar_cursor(despues, len(columnas))
+        query = query.filter(clave < db.tuple_(*valores) if descendente else clave > db.tuple_(*valores))
+    elif antes is not None:
+        valores = decodificar_cursor(antes, len(columnas))
+        query = query.filter(clave > db.tuple_(*valores) if descendente else clave < db.tuple_(*valores))
+
+    # Hacia atrás se recorre el índice en sentido inverso y luego se reordena.
+    invertir = descendente != hacia_atras
+    orden = [c.desc() if invertir else c.asc() for c in columnas]
+    filas = query.order_by(*orden).limit(por_pagina + 1).all()
+
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+
+    def cursor_de(fila):
+        return codificar_cursor([getattr(fila, c.key) for c in columnas])
+
+    siguiente = anterior = None
+    if filas:
+        if hacia_atras:
+            siguiente = cursor_de(filas[-1])
+            anterior = cursor_de(filas[0]) if hay_mas else None
+        else:
+            siguiente = cursor_de(filas[-1]) if hay_mas else None
+            anterior = cursor_de(filas[0]) if despues is not None else None
+    return PaginaKeyset(filas, siguiente=siguiente, anterior=anterior)
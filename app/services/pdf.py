@@ -0,0 +1,96 @@
+"""Escritor de PDF mínimo, sin dependencias externas.
+
+Sólo cubre lo que necesitan los documentos del sistema: texto en Helvetica
+(normal y negrita) con codificación WinAnsi, líneas y varias páginas. La
+salida es determinista: el mismo contenido produce siempre los mismos bytes.
+"""
+import zlib
+
+# A4 en puntos
+ANCHO = 595.28
+ALTO = 841.89
+
+# Anchos de Helvetica (en milésimas del tamaño) de los caracteres que se
+# alinean a la derecha; el resto se aproxima con el ancho de un dígito.
+_ANCHOS = dict.fromkeys('0123456789$', 556)
+_ANCHOS.update({'.': 278, ',': 278, ' ': 278, '-': 333, '#': 556})
+_ANCHO_DEFECTO = 556
+
+
+def ancho_texto(texto, tamano):
+    return sum(_ANCHOS.get(c, _ANCHO_DEFECTO) for c in texto) * tamano / 1000
+
+
+def _cadena(texto):
+    datos = str(texto).encode('cp1252', errors='replace')
+    for original, escapado in ((b'\\', b'\\\\'), (b'(', b'\\('), (b')', b'\\)'), (b'\r', b''), (b'\n', b' ')):
+        datos = datos.replace(original, escapado)
+    return b'(' + datos + b')'
+
+
+class Pagina:
+    def __init__(self):
+        self._operaciones = []
+
+    def texto(self, x, y, texto, tamano=10, negrita=False, alinear='izquierda'):
+        if alinear == 'derecha':
+            x -= ancho_texto(texto, tamano)
+        fuente = b'/F2' if negrita else b'/F1'
+        self._operaciones.append(
+            b'BT %s %d Tf %.2f %.2f Td %s Tj ET' % (fuente, tamano, x, y, _cadena(texto))
+        )
+
+    def linea(self, x1, y1, x2, y2, grosor=0.5):
+        self._operaciones.append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (grosor, x1, y1, x2, y2))
+
+    def contenido(self):
+        return b'\n'.join(self._operaciones)
+
+
+class Documento:
+    def __init__(self, titulo=''):
+        self.titulo = titulo
+        self.paginas = []
+
+    def nueva_pagina(self):
+        pagina = Pagina()
+        self.paginas.append(pagina)
+        return pagina
+
+    def generar(self):
+        """Devuelve el PDF completo como bytes."""
+        paginas = self.paginas or [Pagina()]
+        # 1-5 son objetos fijos; cada página ocupa dos (página y contenido).
+        numeros = [6 + 2 * i for i in range(len(paginas))]
+        objetos = {
+            1: b'<< /Type /Catalog /Pages 2 0 R >>',
+            2: b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+                b' '.join(b'%d 0 R' % n for n in numeros), len(paginas)),
+            3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            4: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+            5: b'<< /Title %s /Producer (sis_facturacion) >>' % _cadena(self.titulo),
+        }
+        for numero, pagina in zip(numeros, paginas):
+            comprimido = zlib.compress(pagina.contenido())
+            objetos[numero] = (
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] '
+                b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+                % (ANCHO, ALTO, numero + 1)
+            )
+            objetos[numero + 1] = (
+                b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(comprimido)
+                + comprimido + b'\nendstream'
+            )
+
+        salida = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        posiciones = []
+        for numero in range(1, len(objetos) + 1):
+            posiciones.append(len(salida))
+            salida += b'%d 0 obj\n' % numero + objetos[numero] + b'\nendobj\n'
+        inicio_xref = len(salida)
+        salida += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1)
+        for posicion in posiciones:
+            salida += b'%010d 00000 n \n' % posicion
+        salida += b'trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            len(objetos) + 1, inicio_xref)
+        return bytes(salida)
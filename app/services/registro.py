@@ -0,0 +1,217 @@
+"""Logging de la aplicación: cola con escritor en segundo plano, JSON y muestreo.
+
+El logger de la app sólo encola cada registro; un hilo (`QueueListener`) le
+da formato y lo escribe en el archivo rotativo y en stderr, así que ni las
+escrituras ni las rotaciones demoran la petición. El mensaje se arma recién
+en ese hilo: hay que loguear con argumentos (`logger.info('Factura %s
+creada', id)`), no con f-strings, para no formatear lo que el nivel o el
+muestreo descartan, y no pasar como argumento algo que la petición siga
+modificando.
+
+Cada registro lleva el id de la petición (`X-Request-ID` si llega uno
+válido, o uno generado), que también se devuelve en la respuesta.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+_ATRIBUTOS_REGISTRO = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id', 'muestreo'}
+_ID_VALIDO = re.compile(r'^[\w.-]{1,64}$')
+# Plantillas distintas que se cuentan por logger antes de empezar de nuevo.
+_MAX_PLANTILLAS = 10000
+
+# Handler y listener instalados en el logger de la app (compartido entre las
+# apps de un mismo proceso): se reemplazan al volver a configurar.
+_instalados = {}
+
+
+class FiltroPeticion(logging.Filter):
+    """Agrega `request_id` al registro. Corre en el hilo que loguea."""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class Muestreo(logging.Filter):
+    """Deja pasar uno de cada N registros por debajo de WARNING de los loggers indicados.
+
+    `tasas` es `{logger: N}` y vale también para sus hijos. Se cuenta por
+    logger y plantilla del mensaje, así que uno poco frecuente no se pierde
+    porque otro muy frecuente comparta el logger. Los que pasan llevan
+    `muestreo=N` para reescalar al contarlos.
+    """
+
+    def __init__(self, tasas):
+        super().__init__()
+        self.tasas = {nombre: int(n) for nombre, n in tasas.items() if int(n) > 1}
+        self._por_logger = {}
+        self._cuentas = Counter()
+        self._lock = threading.Lock()
+
+    def _tasa(self, nombre):
+        tasa = self._por_logger.get(nombre)
+        if tasa is None:
+            padre = nombre
+            while padre and padre not in self.tasas:
+                padre = padre.rpartition('.')[0]
+            tasa = self._por_logger[nombre] = self.tasas.get(padre, 1)
+        return tasa
+
+    def filter(self, record):
+        if not self.tasas or record.levelno >= logging.WARNING:
+            return True
+        tasa = self._tasa(record.name)
+        if tasa == 1:
+            return True
+        clave = (record.name, record.msg)
+        with self._lock:
+            if len(self._cuentas) >= _MAX_PLANTILLAS:
+                self._cuentas.clear()
+            cuenta = self._cuentas[clave]
+            self._cuentas[clave] = cuenta + 1
+        if cuenta % tasa:
+            return False
+        record.muestreo = tasa
+        return True
+
+
+class FormatoJSON(logging.Formatter):
+    """Un objeto JSON por línea; los campos de `extra=` se agregan tal cual."""
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'origen': f'{record.module}:{record.lineno}',
+        }
+        if getattr(record, 'muestreo', None):
+            datos['muestreo'] = record.muestreo
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_REGISTRO:
+                datos[clave] = valor
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            datos['pila'] = self.formatStack(record.stack_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class ColaDiferida(QueueHandler):
+    """Encola el registro tal cual: el formato (y el de la excepción) se hace en el hilo escritor."""
+
+    def prepare(self, record):
+        return record
+
+
+def _handlers(app):
+    archivo = RotatingFileHandler(
+        app.config['LOG_FILE'],
+        maxBytes=app.config['LOG_MAX_BYTES'],
+        backupCount=app.config['LOG_BACKUPS'],
+        encoding='utf-8',
+    )
+    if app.config['LOG_FORMATO'] == 'json':
+        archivo.setFormatter(FormatoJSON())
+    else:
+        archivo.setFormatter(logging.Formatter(app.config['LOG_FORMAT']))
+    consola = logging.StreamHandler(sys.stderr)
+    consola.setFormatter(default_handler.formatter)
+    return [archivo, consola]
+
+
+def _desinstalar(logger):
+    anterior = _instalados.pop(logger.name, None)
+    if anterior is None:
+        return
+    handlers, listener = anterior
+    for handler in handlers:
+        logger.removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    else:
+        for handler in handlers:
+            handler.close()
+
+
+def _detener_todo():
+    for nombre in list(_instalados):
+        _desinstalar(logging.getLogger(nombre))
+
+
+def _reanudar_en_hijo():
+    # Los hilos no sobreviven a fork (gunicorn --preload): cada worker
+    # arranca su propio escritor sobre la misma cola.
+    for _, listener in _instalados.values():
+        if listener is not None:
+            listener.start()
+
+
+atexit.register(_detener_todo)
+os.register_at_fork(after_in_child=_reanudar_en_hijo)
+
+
+def configurar(app):
+    """Instala los handlers del logger de la app según `LOG_*` y el id de petición."""
+    os.makedirs(os.path.dirname(app.config['LOG_FILE']) or '.', exist_ok=True)
+    logger = app.logger
+    _desinstalar(logger)
+    logger.removeHandler(default_handler)
+    logger.setLevel(app.config['LOG_LEVEL'])
+
+    handlers = _handlers(app)
+    if app.config['LOG_COLA']:
+        cola = ColaDiferida(queue.SimpleQueue())
+        listener = QueueListener(cola.queue, *handlers)
+        listener.start()
+        instalados = [cola]
+    else:
+        listener = None
+        instalados = handlers
+    for handler in instalados:
+        # Un muestreo por handler: compartido, cada registro se contaría una vez por handler.
+        handler.addFilter(FiltroPeticion())
+        handler.addFilter(Muestreo(app.config['LOG_MUESTREO']))
+        logger.addHandler(handler)
+    _instalados[logger.name] = (instalados, listener)
+
+    accesos = logging.getLogger(f'{logger.name}.peticiones')
+
+    @app.before_request
+    def _asignar_request_id():
+        recibido = request.headers.get('X-Request-ID', '')
+        g.request_id = recibido if _ID_VALIDO.match(recibido) else uuid.uuid4().hex[:16]
+        g._inicio_registro = time.perf_counter()
+
+    @app.after_request
+    def _registrar_acceso(respuesta):
+        request_id = g.get('request_id')
+        if request_id is None:
+            return respuesta
+        respuesta.headers['X-Request-ID'] = request_id
+        # Los errores del servidor van como WARNING, que el muestreo no descarta.
+        nivel = logging.WARNING if respuesta.status_code >= 500 else logging.INFO
+        if accesos.isEnabledFor(nivel):
+            ms = (time.perf_counter() - g._inicio_registro) * 1000
+            accesos.log(nivel, '%s %s %s %.1f ms', request.method, request.path, respuesta.status_code, ms,
+                        extra={'metodo': request.method, 'ruta': request.path,
+                               'estado': respuesta.status_code, 'ms': round(ms, 1)})
+        return respuesta
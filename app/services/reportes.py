@@ -0,0 +1,95 @@
+"""Agregaciones de ventas resueltas en la base de datos.
+
+Las funciones devuelven filas livianas (tuplas con nombre), no objetos del ORM.
+Los totales generales y por cliente del reporte salen del resumen diario
+(`resumenes.totales_por_cliente`); aquí quedan las agrupaciones por periodo
+y por producto.
+"""
+from .. import db
+from ..models import DetalleFactura, Factura, Producto
+from .facturas import filtrar_facturas
+
+PERIODOS = ('dia', 'semana', 'mes')
+
+_FORMATOS_SQLITE = {
+    'dia': '%Y-%m-%d',
+    'mes': '%Y-%m',
+}
+
+_FORMATOS_POSTGRES = {
+    'dia': ('day', 'YYYY-MM-DD'),
+    'semana': ('week', 'IYYY-"W"IW'),
+    'mes': ('month', 'YYYY-MM'),
+}
+
+
+def _semana_iso_sqlite(columna):
+    # SQLite no tiene %G/%V hasta 3.46: la semana ISO (lunes a domingo) es
+    # la del año de su jueves, y su número sale del día del año de ese jueves.
+    jueves = db.func.date(columna, '-3 days', 'weekday 4')
+    numero = (db.cast(db.func.strftime('%j', jueves), db.Integer) - 1) // 7 + 1
+    return db.func.printf('%s-W%02d', db.func.strftime('%Y', jueves), numero)
+
+
+def expresion_periodo(columna, periodo):
+    """Etiqueta textual del día, semana o mes de `columna`, ordenable alfabéticamente.
+
+    Las semanas son ISO 8601 (`2026-W01` es la que contiene el primer jueves
+    del año) en todos los motores.
+    """
+    if periodo not in PERIODOS:
+        raise ValueError(f'Periodo inválido: {periodo}')
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == 'sqlite':
+        if periodo == 'semana':
+            return _semana_iso_sqlite(columna)
+        return db.func.strftime(_FORMATOS_SQLITE[periodo], columna)
+    if dialecto == 'postgresql':
+        truncado, formato = _FORMATOS_POSTGRES[periodo]
+        return db.func.to_char(db.func.date_trunc(truncado, columna), formato)
+    if dialecto in ('mysql', 'mariadb'):
+        formatos = {'dia': '%Y-%m-%d', 'semana': '%x-W%v', 'mes': '%Y-%m'}
+        return db.func.date_format(columna, formatos[periodo])
+    raise ValueError(f'Agrupación por periodo no soportada para {dialecto}')
+
+
+def por_periodo(desde, hasta, periodo='dia', cliente_id=None):
+    """Cantidad y monto facturado por día, semana o mes."""
+    etiqueta = expresion_periodo(Factura.fecha, periodo).label('periodo')
+    query = db.session.query(
+        etiqueta,
+        db.func.count(Factura.id).label('cantidad'),
+        db.func.sum(Factura.total).label('monto_total'),
+    )
+    query = filtrar_facturas(query, cliente_id=cliente_id, desde=desde, hasta=hasta)
+    return query.group_by(etiqueta).order_by(etiqueta).all()
+
+
+def por_producto(desde, hasta, periodo=None, cliente_id=None):
+    """Unidades y monto vendido por producto, opcionalmente también por periodo.
+
+    Si se indica `periodo`, cada fila incluye la etiqueta `periodo` y el
+    resultado se ordena por periodo y luego por descripción del producto.
+    """
+    columnas = [
+        Producto.id.label('producto_id'),
+        Producto.descripcion.label('descripcion'),
+        db.func.sum(DetalleFactura.cantidad).label('unidades'),
+        db.func.sum(DetalleFactura.subtotal).label('monto_total'),
+    ]
+    agrupacion = [Producto.id, Producto.descripcion]
+    orden = [Producto.descripcion]
+    if periodo is not None:
+        etiqueta = expresion_periodo(Factura.fecha, periodo).label('periodo')
+        columnas.insert(0, etiqueta)
+        agrupacion.insert(0, etiqueta)
+        orden.insert(0, etiqueta)
+
+    query = (
+        db.session.query(*columnas)
+        .select_from(DetalleFactura)
+        .join(Factura, Factura.id == DetalleFactura.id_factura)
+        .join(Producto, Producto.id == DetalleFactura.id_producto)
+    )
+    query = filtrar_facturas(query, cliente_id=cliente_id, desde=desde, hasta=hasta)
+    return query.group_by(*agrupacion).order_by(*orden).all()
@@ -0,0 +1,152 @@
+from decimal import Decimal
+
+from .. import db
+from ..models import Cliente, Factura, VentaDiaria
+
+
+def _dia(columna):
+    """Expresión que trunca un DateTime al día según el motor en uso."""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return db.func.date(columna)
+    return db.cast(columna, db.Date)
+
+
+def _upsert(dialecto):
+    if dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def _acumular(fecha, id_cliente, cantidad, monto):
+    tabla = VentaDiaria.__table__
+    insert = _upsert(db.session.get_bind().dialect.name)
+    if insert is not None and cantidad > 0:
+        # Un único INSERT ... ON CONFLICT evita que dos facturas concurrentes
+        # del mismo día y cliente intenten crear la misma fila.
+        sentencia = insert(tabla).values(fecha=fecha, id_cliente=id_cliente, cantidad=cantidad, monto=monto)
+        db.session.execute(sentencia.on_conflict_do_update(
+            index_elements=[tabla.c.fecha, tabla.c.id_cliente],
+            set_={
+                'cantidad': tabla.c.cantidad + sentencia.excluded.cantidad,
+                'monto': tabla.c.monto + sentencia.excluded.monto,
+            },
+        ))
+        return
+
+    clave = (tabla.c.fecha == fecha) & (tabla.c.id_cliente == id_cliente)
+    resultado = db.session.execute(
+        tabla.update()
+        .where(clave)
+        .values(cantidad=tabla.c.cantidad + cantidad, monto=tabla.c.monto + monto)
+    )
+    if resultado.rowcount == 0 and cantidad > 0:
+        db.session.execute(
+            tabla.insert().values(fecha=fecha, id_cliente=id_cliente, cantidad=cantidad, monto=monto)
+        )
+    elif cantidad < 0:
+        db.session.execute(tabla.delete().where(clave & (tabla.c.cantidad <= 0)))
+
+
+def registrar_factura(factura):
+    """Suma la factura al resumen diario. Debe llamarse en la misma transacción que la crea."""
+    _acumular(factura.fecha.date(), factura.id_cliente, 1, Decimal(str(factura.total or 0)))
+
+
+def descontar_facturas(condicion):
+    """Resta del resumen las facturas que cumplen `condicion`, antes de eliminarlas.
+
+    Un único UPDATE ... FROM contra las facturas agregadas por día y cliente,
+    sin importar cuántas sean; las filas de esos grupos que quedan en cero se
+    borran (buscándolas por clave primaria, no recorriendo todo el resumen).
+    """
+    tabla = VentaDiaria.__table__
+    dia = _dia(Factura.fecha)
+    grupos = (
+        db.select(
+            dia.label('fecha'),
+            Factura.id_cliente,
+            db.func.count(Factura.id).label('cantidad'),
+            db.func.coalesce(db.func.sum(Factura.total), 0).label('monto'),
+        )
+        .where(condicion)
+        .group_by(dia, Factura.id_cliente)
+        .subquery()
+    )
+    db.session.execute(
+        tabla.update()
+        .where(tabla.c.fecha == grupos.c.fecha, tabla.c.id_cliente == grupos.c.id_cliente)
+        .values(cantidad=tabla.c.cantidad - grupos.c.cantidad, monto=tabla.c.monto - grupos.c.monto)
+    )
+    db.session.execute(
+        tabla.delete().where(
+            db.tuple_(tabla.c.fecha, tabla.c.id_cliente).in_(db.select(grupos.c.fecha, grupos.c.id_cliente)),
+            tabla.c.cantidad <= 0,
+        )
+    )
+
+
+def registrar_lote(facturas):
+    """Suma al resumen un lote de tuplas `(fecha, id_cliente, total)`, una sentencia por día y cliente."""
+    acumulado = {}
+    for fecha, id_cliente, total in facturas:
+        clave = (fecha.date(), id_cliente)
+        cantidad, monto = acumulado.get(clave, (0, Decimal('0')))
+        acumulado[clave] = (cantidad + 1, monto + Decimal(str(total or 0)))
+    for (dia, id_cliente), (cantidad, monto) in acumulado.items():
+        _acumular(dia, id_cliente, cantidad, monto)
+
+
+def reconstruir():
+    """Recalcula por completo `ventas_diarias` a partir de `facturas`.
+
+    Devuelve la cantidad de filas generadas. No hace commit.
+    """
+    tabla = VentaDiaria.__table__
+    dia = _dia(Factura.fecha)
+    origen = (
+        db.select(dia, Factura.id_cliente, db.func.count(Factura.id), db.func.sum(Factura.total))
+        .group_by(dia, Factura.id_cliente)
+    )
+    db.session.execute(tabla.delete())
+    db.session.execute(
+        tabla.insert().from_select(['fecha', 'id_cliente', 'cantidad', 'monto'], origen)
+    )
+    return db.session.query(db.func.count()).select_from(tabla).scalar()
+
+
+def totales_por_cliente(desde, hasta, cliente_id=None):
+    """Cantidad y monto de facturas por cliente entre `desde` y `hasta` (inclusive).
+
+    Devuelve `(por_cliente, ventas_total, cantidad_total)`, con `por_cliente`
+    ordenado por nombre de cliente.
+    """
+    query = (
+        db.session.query(
+            VentaDiaria.id_cliente,
+            Cliente.nombre,
+            db.func.sum(VentaDiaria.cantidad),
+            db.func.sum(VentaDiaria.monto),
+        )
+        .join(Cliente, Cliente.id == VentaDiaria.id_cliente)
+        .filter(VentaDiaria.fecha >= desde, VentaDiaria.fecha <= hasta)
+    )
+    if cliente_id:
+        query = query.filter(VentaDiaria.id_cliente == cliente_id)
+    filas = query.group_by(VentaDiaria.id_cliente, Cliente.nombre).order_by(Cliente.nombre).all()
+
+    por_cliente = [
+        {
+            'cliente_id': id_cliente,
+            'cliente_nombre': nombre,
+            'monto_total': Decimal(monto or 0),
+            'cantidad': int(cantidad or 0),
+        }
+        for id_cliente, nombre, cantidad, monto in filas
+    ]
+    ventas_total = sum((fila['monto_total'] for fila in por_cliente), Decimal('0'))
+    cantidad_total = sum(fila['cantidad'] for fila in por_cliente)
+    return por_cliente, ventas_total, cantidad_total
@@ -0,0 +1,183 @@
+import multiprocessing
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+METODO_POR_DEFECTO = 'pbkdf2:sha256:600000'
+
+
+class SobrecargaLogin(Exception):
+    """Hay demasiadas verificaciones de contraseña en curso en este proceso."""
+
+
+class LoginLimitado(Exception):
+    """Se superó el límite de intentos de inicio de sesión para el email o la IP."""
+
+
+def _config(clave, defecto=None):
+    if has_app_context():
+        return current_app.config.get(clave, defecto)
+    return defecto
+
+
+# --- Política de hashing -----------------------------------------------------
+
+def _prefijo(metodo):
+    """Prefijo canónico que Werkzeug escribe para `metodo`, p. ej. `pbkdf2:sha256:600000`."""
+    nombre, *argumentos = metodo.split(':')
+    if nombre == 'pbkdf2':
+        algoritmo = argumentos[0] if argumentos else 'sha256'
+        iteraciones = argumentos[1] if len(argumentos) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{algoritmo}:{iteraciones}'
+    if nombre == 'scrypt':
+        n, r, p = (argumentos + [2**15, 8, 1][len(argumentos):])[:3]
+        return f'scrypt:{n}:{r}:{p}'
+    return metodo
+
+
+def generar_hash(password):
+    """Genera el hash con el algoritmo e iteraciones configurados en `PASSWORD_HASH_METHOD`."""
+    return generate_password_hash(
+        password,
+        method=_config('PASSWORD_HASH_METHOD', METODO_POR_DEFECTO),
+        salt_length=_config('PASSWORD_SALT_LENGTH', 16),
+    )
+
+
+def necesita_rehash(password_hash):
+    """Indica si `password_hash` fue generado con parámetros distintos a los actuales."""
+    if not password_hash or '$' not in password_hash:
+        return True
+    actual = _prefijo(_config('PASSWORD_HASH_METHOD', METODO_POR_DEFECTO))
+    return password_hash.split('$', 1)[0] != actual
+
+
+# --- Verificación acotada ----------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+_pendientes = None
+_pendientes_lock = threading.Lock()
+
+
+def _semaforo():
+    global _pendientes
+    if _pendientes is None:
+        with _pendientes_lock:
+            if _pendientes is None:
+                _pendientes = threading.BoundedSemaphore(_config('PASSWORD_VERIFY_MAX_PENDING', 16))
+    return _pendientes
+
+
+def _obtener_pool(workers):
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _pool
+
+
+def cerrar_pool():
+    """Detiene el pool de verificación; se vuelve a crear en el próximo uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def verificar(password_hash, password):
+    """Comprueba `password` contra `password_hash` sin monopolizar el proceso.
+
+    Como mucho `PASSWORD_VERIFY_MAX_PENDING` verificaciones pueden estar en
+    curso a la vez; por encima de eso se lanza SobrecargaLogin en lugar de
+    encolar más trabajo de CPU. Si `PASSWORD_VERIFY_WORKERS` es mayor que cero,
+    el cálculo se hace en un pool de procesos de ese tamaño, de modo que el
+    hashing usa como mucho esa cantidad de núcleos por worker; si el pool no
+    responde en `PASSWORD_VERIFY_TIMEOUT` segundos también se lanza
+    SobrecargaLogin.
+    """
+    if not password_hash:
+        return False
+    semaforo = _semaforo()
+    if not semaforo.acquire(blocking=False):
+        raise SobrecargaLogin('Demasiadas verificaciones de contraseña en curso')
+    try:
+        workers = _config('PASSWORD_VERIFY_WORKERS', 0)
+        if workers > 0:
+            try:
+                futuro = _obtener_pool(workers).submit(check_password_hash, password_hash, password)
+                return futuro.result(timeout=_config('PASSWORD_VERIFY_TIMEOUT', 10))
+            except TimeoutError:
+                # Si todavía espera en la cola del pool, no llega a ocupar CPU.
+                futuro.cancel()
+                raise SobrecargaLogin('La verificación de contraseña tardó demasiado')
+            except BrokenProcessPool:
+                cerrar_pool()
+                if has_app_context():
+                    current_app.logger.error('El pool de verificación de contraseñas falló; se verifica en línea')
+        return check_password_hash(password_hash, password)
+    finally:
+        semaforo.release()
+
+
+# --- Límite de intentos de inicio de sesión ---------------------------------
+
+_intentos = defaultdict(deque)
+_intentos_lock = threading.Lock()
+_MAX_CLAVES = 10000
+
+
+def _purgar(limite):
+    for clave in [c for c, marcas in _intentos.items() if not marcas or marcas[-1] <= limite]:
+        del _intentos[clave]
+
+
+def _registrar(clave, maximo, ventana, ahora):
+    with _intentos_lock:
+        if len(_intentos) > _MAX_CLAVES:
+            _purgar(ahora - ventana)
+        marcas = _intentos[clave]
+        while marcas and marcas[0] <= ahora - ventana:
+            marcas.popleft()
+        if len(marcas) >= maximo:
+            return False
+        marcas.append(ahora)
+        return True
+
+
+def registrar_intento(email, ip):
+    """Cuenta un intento de inicio de sesión; lanza LoginLimitado si se superó el límite.
+
+    Los contadores son de ventana deslizante y por proceso.
+    """
+    ventana = _config('LOGIN_VENTANA_SEGUNDOS', 300)
+    ahora = time.monotonic()
+    email = (email or '').strip().lower()
+    if ip and not _registrar(('ip', ip), _config('LOGIN_MAX_INTENTOS_IP', 50), ventana, ahora):
+        raise LoginLimitado('Demasiados intentos de inicio de sesión desde esta dirección')
+    if email and not _registrar(('email', email), _config('LOGIN_MAX_INTENTOS_EMAIL', 10), ventana, ahora):
+        raise LoginLimitado('Demasiados intentos de inicio de sesión para esta cuenta')
+
+
+def limpiar_intentos(email, ip=None):
+    """Olvida los intentos de `email` tras un inicio de sesión correcto.
+
+    De la IP se descuenta sólo este intento: los demás usuarios detrás de la
+    misma dirección (una oficina con NAT) no cuentan los inicios correctos,
+    pero un inicio correcto tampoco borra los fallidos de otras cuentas.
+    """
+    with _intentos_lock:
+        _intentos.pop(('email', (email or '').strip().lower()), None)
+        marcas = _intentos.get(('ip', ip)) if ip else None
+        if marcas:
+            marcas.pop()
@@ -0,0 +1,55 @@
+// Autocompletado de clientes y productos para catálogos grandes.
+// Cada <input data-catalogo="url"> rellena el <select> de su mismo grupo
+// con los resultados de la búsqueda por prefijo.
+(function() {
+    const ESPERA_MS = 250;
+    const temporizadores = new WeakMap();
+
+    function selectAsociado(input) {
+        const grupo = input.closest('.form-group, form');
+        return grupo ? grupo.querySelector('select') : null;
+    }
+
+    function reemplazarOpciones(select, resultados) {
+        const seleccionado = select.value;
+        // Conservamos la opción "Seleccione..." / "Todos" y la elegida actualmente
+        Array.from(select.options).forEach(opcion => {
+            const esVacia = opcion.value === '' || opcion.value === '0';
+            if (!esVacia && opcion.value !== seleccionado) opcion.remove();
+        });
+        resultados.forEach(r => {
+            if (String(r.id) === seleccionado) return;
+            const opcion = document.createElement('option');
+            opcion.value = r.id;
+            opcion.textContent = r.texto;
+            if (r.precio !== undefined) opcion.dataset.precio = r.precio;
+            if (r.stock !== undefined) opcion.dataset.stock = r.stock;
+            select.appendChild(opcion);
+        });
+        if (resultados.length === 1 && String(resultados[0].id) !== seleccionado) {
+            select.value = resultados[0].id;
+            select.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+    }
+
+    function buscar(input) {
+        const select = selectAsociado(input);
+        const texto = input.value.trim();
+        if (!select || !texto) return;
+        const url = `${input.dataset.catalogo}?q=${encodeURIComponent(texto)}`;
+        fetch(url, { headers: { 'Accept': 'application/json' }, credentials: 'same-origin' })
+            .then(respuesta => respuesta.ok ? respuesta.json() : { resultados: [] })
+            .then(datos => {
+                // Ignoramos respuestas que llegan después de seguir escribiendo
+                if (input.value.trim() === texto) reemplazarOpciones(select, datos.resultados || []);
+            })
+            .catch(e => console.warn('No se pudo consultar el catálogo:', e));
+    }
+
+    document.addEventListener('input', function(e) {
+        const input = e.target;
+        if (!input.matches || !input.matches('input[data-catalogo]')) return;
+        clearTimeout(temporizadores.get(input));
+        temporizadores.set(input, setTimeout(() => buscar(input), ESPERA_MS));
+    });
+})();
@@ -55,6 +55,8 @@ function initFactura() {
         if (precioInput) precioInput.value = '';
         const subtotalInput = newItem.querySelector('[name*="subtotal"]');
         if (subtotalInput) subtotalInput.value = '';
+        const busqueda = newItem.querySelector('input[data-catalogo]');
+        if (busqueda) busqueda.value = '';
 
         // Ocultamos "Agregar otro ítem" hasta elegir un producto
         const addBtn = newItem.querySelector('.add-after');
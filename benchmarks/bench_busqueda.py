@@ -0,0 +1,106 @@
+"""Compara la búsqueda de productos: FTS5 vs. LIKE '%x%' vs. LIKE 'x%'.
+
+    python -m benchmarks.bench_busqueda --productos 100000 --json
+"""
+import argparse
+import random
+import time
+
+from .comun import crear_app, imprimir, percentiles
+
+MARCAS = ['Acme', 'Bosch', 'Philips', 'Samsung', 'Tramontina', 'Stanley', 'Faber', 'Bic', 'Arcor', 'Molinos']
+TIPOS = ['Tornillo', 'Martillo', 'Lámpara', 'Cable', 'Taladro', 'Cuaderno', 'Lapicera', 'Galletita',
+         'Aceite', 'Cinta', 'Pintura', 'Batería', 'Enchufe', 'Destornillador', 'Llave']
+DETALLES = ['acero', 'inoxidable', 'azul', 'rojo', 'negro', 'grande', 'chico', 'reforzado', 'eco',
+            'profesional', 'hogar', 'industrial', 'pack', 'unidad', 'premium']
+TERMINOS = ['taladro', 'tram', 'lámpara led', 'cable 15', 'inox', 'zzz', 'destornillador phil']
+
+
+def descripcion(azar, i):
+    return (f'{azar.choice(TIPOS)} {azar.choice(MARCAS)} {azar.choice(DETALLES)} '
+            f'{azar.choice(DETALLES)} {azar.randint(1, 500)}mm SKU{i:07d}')
+
+
+def generar(app, productos, semilla):
+    from app import db
+    from app.models import Producto
+    from app.services import busqueda
+
+    azar = random.Random(semilla)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for inicio in range(0, productos, 20000):
+            with db.engine.begin() as conexion:
+                conexion.execute(Producto.__table__.insert(), [
+                    {'descripcion': descripcion(azar, i), 'precio': 1, 'stock': 1}
+                    for i in range(inicio, min(inicio + 20000, productos))
+                ])
+        busqueda.reconstruir_indice()
+        db.session.commit()
+
+
+def fts(texto):
+    from app.services import busqueda
+
+    return len(busqueda.buscar_productos(20, texto=texto))
+
+
+def like_contiene(texto):
+    """Lo que haría un `ilike('%x%')` directo: recorre toda la tabla."""
+    from app import db
+    from app.models import Producto
+
+    query = Producto.query
+    for palabra in texto.split():
+        query = query.filter(db.func.lower(Producto.descripcion).like(f'%{palabra.lower()}%'))
+    return len(query.order_by(Producto.descripcion, Producto.id).limit(21).all())
+
+
+def like_prefijo(texto):
+    """El camino de respaldo de `busqueda.filtrar_productos` en motores sin FTS5."""
+    from app import db
+    from app.models import Producto
+
+    query = Producto.query.filter(db.func.lower(Producto.descripcion).like(f'{texto.lower()}%'))
+    return len(query.order_by(Producto.descripcion, Producto.id).limit(21).all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--productos', type=int, default=100000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    app = crear_app(f'busqueda-p{args.productos}-s{args.semilla}')
+    from app import db
+    from app.models import Producto
+
+    with app.app_context():
+        existente = False
+        try:
+            existente = db.session.query(db.func.count(Producto.id)).scalar() == args.productos
+        except Exception:
+            db.session.rollback()
+    if not existente:
+        generar(app, args.productos, args.semilla)
+
+    resultados = {}
+    with app.app_context():
+        for nombre, funcion in (('fts5', fts), ('like_contiene', like_contiene), ('like_prefijo', like_prefijo)):
+            muestras = []
+            encontrados = {}
+            for _ in range(args.repeticiones):
+                for termino in TERMINOS:
+                    inicio = time.perf_counter()
+                    encontrados[termino] = funcion(termino)
+                    muestras.append(time.perf_counter() - inicio)
+                    db.session.remove()
+            resultados[nombre] = dict(percentiles(muestras), resultados=sum(encontrados.values()))
+    imprimir(resultados, args.json)
+
+
+if __name__ == '__main__':
+    main()
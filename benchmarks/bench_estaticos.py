@@ -0,0 +1,102 @@
+"""Bytes y peticiones de estáticos en la primera visita y en las siguientes.
+
+Compara el servido de Flask con los fuentes (como antes) contra WhiteNoise
+con los archivos versionados de `flask estaticos construir`. Para cada
+página sigue los estáticos propios que enlaza, como un navegador que acepta
+gzip y brotli: en la primera visita los descarga y en la siguiente sólo
+revalida (petición condicional) los que no llegaron con `immutable` ni con
+un `max-age` vigente.
+
+    python -m benchmarks.bench_estaticos
+"""
+import argparse
+import re
+
+from .comun import crear_app, imprimir
+
+BASE = 'bench-estaticos'
+PASSWORD = 'benchmark'
+PAGINAS = {'login': (None, '/auth/login'), 'nueva_factura': ('admin', '/facturas/nueva')}
+
+MODOS = {
+    'flask': {'ESTATICOS_MANIFIESTO': False, 'ESTATICOS_WHITENOISE': False},
+    'versionados': {'ESTATICOS_MANIFIESTO': True, 'ESTATICOS_WHITENOISE': True},
+}
+
+_ENLACE = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def _preparar():
+    from app import db
+    from app.models import Usuario
+    from app.services import estaticos
+
+    app = crear_app(BASE, **MODOS['flask'])
+    estaticos.construir(app.static_folder, app.config['ESTATICOS_DIR'])
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = Usuario(nombre='Administrador', email='admin@bench.example.com')
+        admin.password = PASSWORD
+        db.session.add(admin)
+        db.session.commit()
+
+
+def _fresco(cabeceras):
+    control = cabeceras.get('Cache-Control', '')
+    if 'immutable' in control:
+        return True
+    m = _MAX_AGE.search(control)
+    # Un max-age corto también vence entre visitas de una sucursal; se toma
+    # como fresco sólo si dura al menos un día.
+    return bool(m) and int(m.group(1)) >= 86400
+
+
+def visitar(app, usuario, url):
+    web = app.test_client()
+    if usuario == 'admin':
+        web.post('/auth/login', data={'email': 'admin@bench.example.com', 'password': PASSWORD})
+    html = web.get(url).get_data(as_text=True)
+    enlaces = sorted(set(_ENLACE.findall(html)))
+
+    primera = {'peticiones': 0, 'bytes': 0}
+    segunda = {'peticiones': 0, 'bytes': 0}
+    for enlace in enlaces:
+        respuesta = web.get(enlace, headers={'Accept-Encoding': 'br, gzip'})
+        primera['peticiones'] += 1
+        primera['bytes'] += len(respuesta.data)
+        if _fresco(respuesta.headers):
+            continue
+        condicional = {}
+        if respuesta.headers.get('ETag'):
+            condicional['If-None-Match'] = respuesta.headers['ETag']
+        if respuesta.headers.get('Last-Modified'):
+            condicional['If-Modified-Since'] = respuesta.headers['Last-Modified']
+        respuesta = web.get(enlace, headers={'Accept-Encoding': 'br, gzip', **condicional})
+        segunda['peticiones'] += 1
+        segunda['bytes'] += len(respuesta.data)
+    return {
+        'estaticos': len(enlaces),
+        'bytes_primera': primera['bytes'],
+        'peticiones_siguiente': segunda['peticiones'],
+        'bytes_siguiente': segunda['bytes'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    _preparar()
+    resultados = {}
+    for modo, opciones in MODOS.items():
+        app = crear_app(BASE, **opciones)
+        for pagina, (usuario, url) in PAGINAS.items():
+            resultados[f'{pagina}_{modo}'] = visitar(app, usuario, url)
+    imprimir(resultados, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Agregaciones del reporte con importes Numeric(10,2) vs. centavos enteros.
+
+Copia las facturas del conjunto sintético a dos tablas iguales salvo por el
+tipo de `total`: Numeric(10,2) (en SQLite se guarda como REAL y SQLAlchemy
+lo convierte a Decimal fila por fila) y `Dinero` (BIGINT en centavos). Para
+cada una mide el total del rango, los totales por cliente y por mes en SQL y
+la suma en Python, y verifica que coincidan con la suma exacta:
+
+    python -m benchmarks.bench_importes --facturas 1000000 --repeticiones 3
+"""
+import argparse
+import os
+from decimal import Decimal
+
+import sqlalchemy as sa
+
+from .comun import DIRECTORIO_DATOS, imprimir, medir
+from .datos import DEFECTOS, argumentos, preparar
+
+
+def _tablas(metadata):
+    from app.services.dinero import Dinero
+
+    tablas = {}
+    for nombre, tipo in (('numeric', sa.Numeric(10, 2)), ('centavos', Dinero())):
+        tablas[nombre] = sa.Table(
+            f'importes_{nombre}', metadata,
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('id_cliente', sa.Integer, nullable=False),
+            sa.Column('fecha', sa.DateTime, nullable=False),
+            sa.Column('total', tipo, nullable=False),
+        )
+    return tablas
+
+
+def copiar(origen, destino, tablas, lote=50000):
+    """Copia id, cliente, fecha y total de las facturas a cada tabla; devuelve la suma exacta."""
+    from app.models import Factura
+
+    metadata = next(iter(tablas.values())).metadata
+    metadata.drop_all(destino)
+    metadata.create_all(destino)
+    exacto = Decimal('0')
+    consulta = sa.select(Factura.id, Factura.id_cliente, Factura.fecha, Factura.total).order_by(Factura.id)
+    with origen.connect() as lectura:
+        filas = lectura.execute(consulta.execution_options(yield_per=lote))
+        for grupo in filas.partitions():
+            datos = [dict(fila._mapping) for fila in grupo]
+            exacto += sum((d['total'] for d in datos), Decimal('0'))
+            with destino.begin() as escritura:
+                for tabla in tablas.values():
+                    escritura.execute(tabla.insert(), datos)
+    return exacto
+
+
+def escenarios(motor, tabla):
+    mes = sa.func.strftime('%Y-%m', tabla.c.fecha)
+
+    def total():
+        with motor.connect() as conexion:
+            return conexion.execute(sa.select(sa.func.coalesce(sa.func.sum(tabla.c.total), 0))).scalar()
+
+    def por_cliente():
+        with motor.connect() as conexion:
+            filas = conexion.execute(
+                sa.select(tabla.c.id_cliente, sa.func.sum(tabla.c.total)).group_by(tabla.c.id_cliente)
+            ).all()
+        return sum((monto for _, monto in filas), Decimal('0'))
+
+    def por_mes():
+        with motor.connect() as conexion:
+            filas = conexion.execute(sa.select(mes, sa.func.sum(tabla.c.total)).group_by(mes)).all()
+        return sum((monto for _, monto in filas), Decimal('0'))
+
+    def suma_python():
+        with motor.connect() as conexion:
+            return sum(conexion.execute(sa.select(tabla.c.total)).scalars(), Decimal('0'))
+
+    return {'total_sql': total, 'por_cliente_sql': por_cliente, 'por_mes_sql': por_mes, 'suma_python': suma_python}
+
+
+def main():
+    parser = argumentos(argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter))
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    if args.facturas is None:
+        args.facturas = 1000000
+
+    app = preparar(**{k: getattr(args, k) for k in DEFECTOS})
+    from app import db
+
+    destino = sa.create_engine(f"sqlite:///{os.path.join(DIRECTORIO_DATOS, 'importes.db')}")
+    tablas = _tablas(sa.MetaData())
+    with app.app_context():
+        exacto = copiar(db.engine, destino, tablas)
+
+    resultados = {}
+    for nombre, tabla in tablas.items():
+        for escenario, funcion in escenarios(destino, tabla).items():
+            metricas, valor = medir(funcion, args.repeticiones)
+            metricas['resultado'] = str(valor)
+            metricas['exacto'] = valor == exacto
+            resultados[f'{nombre}_{escenario}'] = metricas
+    destino.dispose()
+    imprimir(resultados, args.json)
+
+
+if __name__ == '__main__':
+    main()
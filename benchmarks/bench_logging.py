@@ -0,0 +1,185 @@
+"""Costo del logging en el hilo que loguea: escritura directa vs. cola.
+
+Con nivel INFO y un archivo chico (para que también haya rotaciones), mide:
+
+- cuánto tarda cada llamada a `logger.info` en el hilo que loguea, con uno o
+  varios hilos a la vez, escribiendo en el handler (`sincronico`, como antes)
+  o encolando para el hilo escritor (`cola`);
+- cuánto cuesta una llamada por debajo del nivel con f-string y con argumentos;
+- p50/p95/p99 de las peticiones a `/facturas` con cada modo, con el registro
+  de accesos completo y muestreado.
+
+    python -m benchmarks.bench_logging --llamadas 20000 --hilos 1 8 --peticiones 500
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from .comun import crear_app, imprimir, percentiles
+
+BASE = 'bench-logging'
+PASSWORD = 'benchmark'
+
+MODOS = {
+    'sincronico': {'LOG_COLA': False, 'LOG_MUESTREO': {}},
+    'cola': {'LOG_COLA': True, 'LOG_MUESTREO': {}},
+    'cola_muestreo': {'LOG_COLA': True, 'LOG_MUESTREO': {'app.peticiones': 10}},
+}
+
+
+def _app(directorio, modo, **opciones):
+    return crear_app(
+        BASE,
+        LOG_LEVEL='INFO',
+        LOG_FILE=os.path.join(directorio, modo, 'app.log'),
+        LOG_MAX_BYTES=1024 * 1024,
+        LOG_BACKUPS=2,
+        **MODOS[modo],
+        **opciones,
+    )
+
+
+def _preparar(directorio, facturas):
+    from app import db
+    from app.models import Cliente, Factura, Usuario
+
+    app = _app(directorio, 'sincronico')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = Usuario(nombre='Administrador', email='admin@bench.example.com')
+        admin.password = PASSWORD
+        cliente = Cliente(nombre='Cliente', email='cliente@bench.example.com')
+        cliente.set_password(PASSWORD)
+        db.session.add_all([admin, cliente])
+        db.session.flush()
+        db.session.add_all(Factura(id_cliente=cliente.id, total=i) for i in range(facturas))
+        db.session.commit()
+
+
+def _terminar(app):
+    """Espera a que el escritor vacíe la cola, para no medirlo en el modo siguiente."""
+    from app.services import registro
+
+    registro._desinstalar(app.logger)
+
+
+def _vaciar(app):
+    """Espera a que el escritor termine lo encolado, para que no compita con la medición siguiente."""
+    for handler in app.logger.handlers:
+        cola = getattr(handler, 'queue', None)
+        while cola is not None and not cola.empty():
+            time.sleep(0.01)
+
+
+def llamadas(app, hilos, cantidad):
+    """Duración de cada `logger.info` en el hilo que loguea."""
+    logger = app.logger
+    muestras = []
+    lock = threading.Lock()
+
+    def loguear(numero):
+        propias = []
+        for i in range(cantidad):
+            inicio = time.perf_counter()
+            logger.info('Factura %s creada con %s ítems por el hilo %s', i, i % 7, numero)
+            propias.append(time.perf_counter() - inicio)
+        with lock:
+            muestras.extend(propias)
+
+    trabajadores = [threading.Thread(target=loguear, args=(n,)) for n in range(hilos)]
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    total = time.perf_counter() - inicio
+    _vaciar(app)
+    resultado = percentiles(muestras)
+    resultado['us_por_llamada'] = round(sum(muestras) / len(muestras) * 1e6, 2)
+    resultado['llamadas_por_s'] = round(len(muestras) / total)
+    return resultado
+
+
+def descartadas(app, cantidad):
+    """µs por llamada a `debug` con nivel INFO: f-string vs. argumentos."""
+    logger = app.logger
+    datos = {'email': 'cliente@bench.example.com', 'items': list(range(20))}
+    resultado = {}
+
+    inicio = time.perf_counter()
+    for _ in range(cantidad):
+        logger.debug(f'Datos del formulario: {datos}')
+    resultado['fstring_us'] = round((time.perf_counter() - inicio) / cantidad * 1e6, 3)
+
+    inicio = time.perf_counter()
+    for _ in range(cantidad):
+        logger.debug('Datos del formulario: %s', datos)
+    resultado['argumentos_us'] = round((time.perf_counter() - inicio) / cantidad * 1e6, 3)
+    return resultado
+
+
+def peticiones(app, cantidad):
+    web = app.test_client()
+    web.post('/auth/login', data={'email': 'admin@bench.example.com', 'password': PASSWORD})
+    muestras = []
+    for _ in range(cantidad):
+        inicio = time.perf_counter()
+        web.get('/facturas').get_data()
+        muestras.append(time.perf_counter() - inicio)
+    return percentiles(muestras)
+
+
+def _lineas(directorio, modo):
+    carpeta = os.path.join(directorio, modo)
+    total = 0
+    for nombre in os.listdir(carpeta):
+        with open(os.path.join(carpeta, nombre), 'rb') as archivo:
+            total += sum(1 for _ in archivo)
+    return total
+
+
+def _consolas(app):
+    """StreamHandlers a stderr, estén en el logger o detrás de la cola."""
+    from app.services import registro
+
+    handlers, listener = registro._instalados[app.logger.name]
+    if listener is not None:
+        handlers = listener.handlers
+    return [h for h in handlers if type(h) is logging.StreamHandler]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--llamadas', type=int, default=20000, help='llamadas a logger.info por hilo')
+    parser.add_argument('--hilos', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--peticiones', type=int, default=500)
+    parser.add_argument('--facturas', type=int, default=200)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        _preparar(directorio, args.facturas)
+        for modo in MODOS:
+            app = _app(directorio, modo)
+            # Consola a /dev/null: se mide el archivo, no la terminal.
+            with open(os.devnull, 'w') as nulo:
+                for handler in _consolas(app):
+                    handler.setStream(nulo)
+                if modo != 'cola_muestreo':
+                    for hilos in args.hilos:
+                        resultados[f'info_{modo}_{hilos}h'] = llamadas(app, hilos, args.llamadas)
+                resultados[f'facturas_{modo}'] = peticiones(app, args.peticiones)
+                if modo == 'sincronico':
+                    resultados['debug_descartado'] = descartadas(app, args.llamadas)
+                _terminar(app)
+            resultados[f'facturas_{modo}']['lineas_log'] = _lineas(directorio, modo)
+    imprimir(resultados, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Rendimiento del inicio de sesión bajo carga concurrente.
+
+Varios hilos inician sesión en paralelo mientras otro hilo navega
+`/facturas` con una sesión ya abierta; se mide cuántos logins por segundo se
+atienden y cuánto se degrada la latencia del tráfico normal, con la
+verificación en línea y con el pool de procesos.
+
+    python -m benchmarks.bench_login --hilos 16 --logins 8 --workers 0 2 4
+"""
+import argparse
+import threading
+import time
+
+from .comun import crear_app, imprimir, percentiles
+
+BASE = 'bench-login'
+PASSWORD = 'benchmark'
+
+
+def _preparar(cuentas, metodo):
+    from app import db
+    from app.models import Cliente, Factura, Usuario
+
+    app = crear_app(BASE, PASSWORD_HASH_METHOD=metodo)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = Usuario(nombre='Administrador', email='admin@bench.example.com')
+        admin.password = PASSWORD
+        clientes = []
+        for i in range(cuentas):
+            cliente = Cliente(nombre=f'Cliente {i}', email=f'login{i}@bench.example.com')
+            cliente.set_password(PASSWORD)
+            clientes.append(cliente)
+        db.session.add(admin)
+        db.session.add_all(clientes)
+        db.session.flush()
+        db.session.add_all(Factura(id_cliente=c.id, total=0) for c in clientes)
+        db.session.commit()
+
+
+def _escenario(workers, hilos, logins, metodo, pendientes):
+    app = crear_app(
+        BASE,
+        PASSWORD_HASH_METHOD=metodo,
+        PASSWORD_VERIFY_WORKERS=workers,
+        PASSWORD_VERIFY_MAX_PENDING=pendientes,
+        LOGIN_MAX_INTENTOS_IP=10**9,
+        LOGIN_MAX_INTENTOS_EMAIL=10**9,
+    )
+    navegador = app.test_client()
+    navegador.post('/auth/login', data={'email': 'admin@bench.example.com', 'password': PASSWORD})
+
+    latencias_login = []
+    latencias_pagina = []
+    rechazados = []
+    fin = threading.Event()
+    lock = threading.Lock()
+
+    def iniciar_sesiones(numero):
+        cliente = app.test_client()
+        for i in range(logins):
+            email = f'login{(numero * logins + i) % (hilos * logins)}@bench.example.com'
+            inicio = time.perf_counter()
+            respuesta = cliente.post('/auth/login', data={'email': email, 'password': PASSWORD})
+            duracion = time.perf_counter() - inicio
+            cliente.get('/auth/logout')
+            with lock:
+                if respuesta.status_code == 302:
+                    latencias_login.append(duracion)
+                else:
+                    rechazados.append(respuesta.status_code)
+
+    def navegar():
+        while not fin.is_set():
+            inicio = time.perf_counter()
+            navegador.get('/facturas')
+            latencias_pagina.append(time.perf_counter() - inicio)
+
+    fondo = threading.Thread(target=navegar)
+    fondo.start()
+    time.sleep(0.5)
+    base = list(latencias_pagina)
+    inicio = time.perf_counter()
+    trabajadores = [threading.Thread(target=iniciar_sesiones, args=(n,)) for n in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    duracion = time.perf_counter() - inicio
+    fin.set()
+    fondo.join()
+
+    bajo_carga = latencias_pagina[len(base):]
+    return {
+        'logins_por_segundo': round(len(latencias_login) / duracion, 2),
+        'rechazados': len(rechazados),
+        'login': percentiles(latencias_login),
+        'pagina_sin_carga': percentiles(base),
+        'pagina_bajo_carga': percentiles(bajo_carga),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=8, help='inicios de sesión por hilo')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2],
+                        help='tamaños del pool de verificación a comparar (0 = en línea)')
+    parser.add_argument('--pendientes', type=int, default=16)
+    parser.add_argument('--metodo', default='pbkdf2:sha256:600000')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    _preparar(args.hilos * args.logins, args.metodo)
+    resultados = {}
+    from app.services import seguridad
+
+    for workers in args.workers:
+        resultados[f'workers={workers}'] = _escenario(workers, args.hilos, args.logins, args.metodo, args.pendientes)
+        seguridad.cerrar_pool()
+    imprimir(resultados, args.json)
+
+
+if __name__ == '__main__':
+    main()
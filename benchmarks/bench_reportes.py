@@ -0,0 +1,107 @@
+"""Compara el cálculo de totales del reporte: bucle en Python vs. agregación en SQL.
+
+    python -m benchmarks.bench_reportes --facturas 1000000 --json
+"""
+import argparse
+from datetime import date, timedelta
+
+from .comun import imprimir, medir
+from .datos import DEFECTOS, argumentos, preparar
+
+
+def bucle_python(desde, hasta):
+    """Implementación original de `main.reportes`: hidrata todas las facturas."""
+    from app import db
+    from app.models import Factura
+
+    facturas = Factura.query.options(db.joinedload(Factura.cliente)).filter(
+        db.func.date(Factura.fecha) >= desde,
+        db.func.date(Factura.fecha) <= hasta,
+    ).order_by(Factura.fecha.asc()).all()
+    ventas_total = sum(float(f.total) if f.total is not None else 0.0 for f in facturas)
+    totales = {}
+    for factura in facturas:
+        cid = factura.id_cliente
+        if cid not in totales:
+            totales[cid] = {
+                'cliente_id': cid,
+                'cliente_nombre': factura.cliente.nombre,
+                'monto_total': 0.0,
+                'cantidad': 0,
+            }
+        totales[cid]['monto_total'] += float(factura.total) if factura.total is not None else 0.0
+        totales[cid]['cantidad'] += 1
+    por_cliente = sorted(totales.values(), key=lambda x: x['cliente_nombre'])
+    return len(facturas), ventas_total, len(por_cliente)
+
+
+def agregacion_sql(desde, hasta):
+    """Agregación sobre `facturas` en la base, como antes del resumen diario."""
+    from app import db
+    from app.models import Cliente, Factura
+    from app.services.facturas import filtrar_facturas
+
+    cantidad, monto = filtrar_facturas(
+        db.session.query(db.func.count(Factura.id), db.func.coalesce(db.func.sum(Factura.total), 0)),
+        desde=desde, hasta=hasta,
+    ).one()
+    por_cliente = (
+        filtrar_facturas(
+            db.session.query(Factura.id_cliente, Cliente.nombre, db.func.count(Factura.id),
+                             db.func.sum(Factura.total))
+            .join(Cliente, Cliente.id == Factura.id_cliente),
+            desde=desde, hasta=hasta,
+        )
+        .group_by(Factura.id_cliente, Cliente.nombre)
+        .order_by(Cliente.nombre)
+        .all()
+    )
+    return cantidad, float(monto), len(por_cliente)
+
+
+def resumen_diario(desde, hasta):
+    from app.services import resumenes
+
+    por_cliente, ventas_total, cantidad = resumenes.totales_por_cliente(desde, hasta)
+    return cantidad, float(ventas_total), len(por_cliente)
+
+
+def producto_por_mes(desde, hasta):
+    from app.services import reportes
+
+    return len(reportes.por_producto(desde, hasta, periodo='mes'))
+
+
+def main():
+    parser = argumentos(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--rango-dias', type=int, default=None,
+                        help='días hacia atrás cubiertos por el reporte (por defecto, todos)')
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    if args.facturas is None:
+        args.facturas = 1000000
+
+    app = preparar(**{k: getattr(args, k) for k in DEFECTOS})
+    from app import db
+
+    hasta = date.today()
+    desde = hasta - timedelta(days=args.rango_dias or args.dias or DEFECTOS['dias'])
+    escenarios = {
+        'bucle_python': bucle_python,
+        'agregacion_sql': agregacion_sql,
+        'resumen_diario': resumen_diario,
+        'producto_por_mes_sql': producto_por_mes,
+    }
+    resultados = {}
+    with app.app_context():
+        for nombre, funcion in escenarios.items():
+            metricas, valor = medir(lambda: funcion(desde, hasta), args.repeticiones)
+            db.session.remove()
+            metricas['resultado'] = valor
+            resultados[nombre] = metricas
+    imprimir(resultados, args.json)
+
+
+if __name__ == '__main__':
+    main()
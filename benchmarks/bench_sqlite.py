@@ -0,0 +1,106 @@
+"""Lectores y escritores concurrentes sobre SQLite con y sin el perfil de pragmas.
+
+Cada proceso imita un worker de gunicorn: los lectores piden `/reportes`
+por GET y los escritores crean facturas por `/api/facturas/lote`. Se compara
+el modo anterior (journal DELETE, sin conexión de lectura) con el perfil de
+`Config.SQLITE_PRAGMAS` (WAL, synchronous NORMAL, busy_timeout, ...).
+
+    python -m benchmarks.bench_sqlite --lectores 4 --escritores 2 --segundos 10
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from datetime import date, timedelta
+
+from .comun import DIRECTORIO_DATOS, copiar_base, crear_app, imprimir, percentiles
+from .datos import ADMIN_EMAIL, ADMIN_PASSWORD, DEFECTOS, argumentos, nombre_base, preparar
+
+PERFILES = {
+    'antes': {'SQLITE_PRAGMAS': {'journal_mode': 'DELETE'}, 'SQLITE_LECTURA': False},
+    'despues': {},
+}
+
+
+def _trabajar(argumentos):
+    rol, base, perfil, segundos, barrera, clientes, productos = argumentos
+    app = crear_app(base, **PERFILES[perfil])
+    cliente = app.test_client()
+    cliente.post('/auth/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    hasta = date.today()
+    url_reporte = (f'/reportes?fecha_desde={(hasta - timedelta(days=30)).isoformat()}'
+                   f'&fecha_hasta={hasta.isoformat()}&cliente_id=0&agrupacion=dia')
+    # Todos empiezan a medir juntos, cuando el último proceso terminó de arrancar.
+    barrera.wait()
+
+    contador = 0
+    duraciones = []
+    errores = 0
+    fin = time.time() + segundos
+    while time.time() < fin:
+        contador += 1
+        comienzo = time.perf_counter()
+        if rol == 'lector':
+            respuesta = cliente.get(url_reporte)
+            fallo = respuesta.status_code != 200 or b'Error al generar' in respuesta.data
+        else:
+            respuesta = cliente.post('/api/facturas/lote', json={'facturas': [{
+                'id_cliente': 1 + contador % clientes,
+                'items': [
+                    {'id_producto': 1 + (contador * 7 + i) % productos, 'cantidad': 1}
+                    for i in range(3)
+                ],
+            }]})
+            fallo = respuesta.status_code != 200 or respuesta.get_json()['creadas'] != 1
+        duraciones.append(time.perf_counter() - comienzo)
+        errores += fallo
+    return rol, duraciones, errores
+
+
+def _escenario(base, perfil, lectores, escritores, segundos, clientes, productos):
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Manager() as gestor, contexto.Pool(lectores + escritores) as pool:
+        barrera = gestor.Barrier(lectores + escritores)
+        tareas = ([('lector', base, perfil, segundos, barrera, clientes, productos)] * lectores
+                  + [('escritor', base, perfil, segundos, barrera, clientes, productos)] * escritores)
+        salidas = pool.map(_trabajar, tareas)
+
+    resultado = {}
+    for rol in ('lector', 'escritor'):
+        duraciones = [d for r, ds, _ in salidas if r == rol for d in ds]
+        errores = sum(e for r, _, e in salidas if r == rol)
+        resultado[f'{rol}es_por_s'] = round((len(duraciones) - errores) / segundos, 1)
+        resultado[f'{rol}es_errores'] = errores
+        resultado.update({f'{rol}_{k}': v for k, v in percentiles(duraciones).items()})
+    return resultado
+
+
+def main():
+    parser = argumentos(argparse.ArgumentParser(description=__doc__))
+    parser.add_argument('--lectores', type=int, default=4)
+    parser.add_argument('--escritores', type=int, default=2)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    if args.facturas is None:
+        args.facturas = 50000
+
+    parametros = {k: getattr(args, k) for k in DEFECTOS}
+    preparar(**parametros)
+    valores = dict(DEFECTOS, **{k: v for k, v in parametros.items() if v is not None})
+    original = os.path.join(DIRECTORIO_DATOS, f'{nombre_base(valores)}.db')
+
+    resultados = {}
+    for perfil in PERFILES:
+        # Cada perfil trabaja sobre una copia: las escrituras no afectan al siguiente.
+        base = f'sqlite-{perfil}'
+        copiar_base(original, os.path.join(DIRECTORIO_DATOS, f'{base}.db'))
+        resultados[perfil] = _escenario(
+            base, perfil, args.lectores, args.escritores, args.segundos,
+            valores['clientes'], valores['productos'],
+        )
+    imprimir(resultados, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""Pruebas de carga del circuito de facturación.
+
+Escenarios: ráfaga de logins, alta de facturas, listado de facturas, reporte
+de un año y eliminación de facturas. Cada uno corre `--segundos` con
+`--usuarios` usuarios concurrentes, a través del cliente de pruebas de Flask
+(en el mismo proceso) o por HTTP contra un gunicorn local con `--workers`
+procesos. Informa p50/p95/p99, peticiones por segundo y el pico de memoria
+residente; con `--salida` guarda el JSON para comparar commits.
+
+    python -m benchmarks.carga --modo flask --segundos 10
+    python -m benchmarks.carga --modo http --workers 4 --usuarios 8 --salida antes.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from config import Config
+
+from .comun import DIRECTORIO_DATOS, copiar_base, crear_app, imprimir, percentiles
+from .datos import ADMIN_EMAIL, ADMIN_PASSWORD, CLIENTE_PASSWORD, DEFECTOS, argumentos, nombre_base, preparar
+
+BASE = 'carga'
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sin límite de intentos (la ráfaga de logins lo superaría) y con el hash de
+# contraseñas de producción, que es el que generan los datos sintéticos.
+OPCIONES = {
+    'LOGIN_MAX_INTENTOS_EMAIL': 10**9,
+    'LOGIN_MAX_INTENTOS_IP': 10**9,
+    'PASSWORD_HASH_METHOD': Config.PASSWORD_HASH_METHOD,
+}
+
+Peticion = namedtuple('Peticion', 'metodo ruta datos json esperado', defaults=(None, None, 200))
+
+
+# --- Clientes ----------------------------------------------------------------
+
+class ClienteFlask:
+    """Cliente de pruebas de Flask con la interfaz común de los escenarios."""
+
+    def __init__(self, app):
+        self._app = app
+        self._cliente = app.test_client()
+
+    def pedir(self, peticion):
+        respuesta = self._cliente.open(
+            peticion.ruta, method=peticion.metodo, data=peticion.datos, json=peticion.json,
+        )
+        respuesta.get_data()
+        return respuesta.status_code
+
+    def olvidar(self):
+        self._cliente = self._app.test_client()
+
+
+class ClienteHTTP:
+    """Cliente HTTP mínimo (sin dependencias) que conserva las cookies."""
+
+    def __init__(self, host, puerto):
+        self._host = host
+        self._puerto = puerto
+        self._cookies = {}
+
+    def pedir(self, peticion):
+        encabezados = {}
+        cuerpo = None
+        if self._cookies:
+            encabezados['Cookie'] = '; '.join(f'{k}={v}' for k, v in self._cookies.items())
+        if peticion.json is not None:
+            cuerpo = json.dumps(peticion.json)
+            encabezados['Content-Type'] = 'application/json'
+        elif peticion.datos is not None:
+            cuerpo = urlencode(peticion.datos)
+            encabezados['Content-Type'] = 'application/x-www-form-urlencoded'
+        conexion = http.client.HTTPConnection(self._host, self._puerto, timeout=60)
+        try:
+            conexion.request(peticion.metodo, peticion.ruta, body=cuerpo, headers=encabezados)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            for cabecera in respuesta.headers.get_all('Set-Cookie') or ():
+                nombre, _, valor = cabecera.split(';', 1)[0].partition('=')
+                self._cookies[nombre.strip()] = valor
+            return respuesta.status
+        finally:
+            conexion.close()
+
+    def olvidar(self):
+        self._cookies.clear()
+
+
+# --- Escenarios --------------------------------------------------------------
+
+class Contexto:
+    def __init__(self, valores, usuarios):
+        self.valores = valores
+        self.usuarios = usuarios
+        hoy = date.today()
+        self.hoy = hoy.isoformat()
+        self.hace_un_anio = (hoy - timedelta(days=365)).isoformat()
+
+
+def _login(cliente, azar, usuario, iteracion, contexto):
+    cliente.olvidar()
+    id_cliente = azar.randint(1, contexto.valores['clientes'])
+    return Peticion('POST', '/auth/login', datos={
+        'email': f'cliente{id_cliente}@bench.example.com', 'password': CLIENTE_PASSWORD,
+    }, esperado=302)
+
+
+def _crear(cliente, azar, usuario, iteracion, contexto):
+    datos = {'cliente_id': azar.randint(1, contexto.valores['clientes']), 'fecha': contexto.hoy}
+    for i in range(azar.randint(1, contexto.valores['lineas'])):
+        datos[f'items-{i}-producto_id'] = azar.randint(1, contexto.valores['productos'])
+        datos[f'items-{i}-cantidad'] = azar.randint(1, 5)
+        datos[f'items-{i}-precio_unitario'] = '10.00'
+    return Peticion('POST', '/facturas/nueva', datos=datos, esperado=302)
+
+
+def _listar(cliente, azar, usuario, iteracion, contexto):
+    if iteracion % 2:
+        return Peticion('GET', f"/facturas?cliente_id={azar.randint(1, contexto.valores['clientes'])}")
+    return Peticion('GET', '/facturas')
+
+
+def _reporte(cliente, azar, usuario, iteracion, contexto):
+    return Peticion('GET', f'/reportes?fecha_desde={contexto.hace_un_anio}&fecha_hasta={contexto.hoy}&cliente_id=0')
+
+
+def _eliminar(cliente, azar, usuario, iteracion, contexto):
+    # Cada usuario elimina facturas distintas: usuario, usuario + U, ...
+    id_factura = 1 + usuario + iteracion * contexto.usuarios
+    if id_factura > contexto.valores['facturas']:
+        return None
+    return Peticion('POST', f'/facturas/eliminar/{id_factura}', esperado=302)
+
+
+# (nombre, inicia sesión como administrador, generador de peticiones)
+ESCENARIOS = [
+    ('login', False, _login),
+    ('listar', True, _listar),
+    ('reporte', True, _reporte),
+    ('crear', True, _crear),
+    ('eliminar', True, _eliminar),
+]
+
+
+# --- Memoria -----------------------------------------------------------------
+
+def _procesos(pid):
+    """El proceso y sus descendientes (Linux)."""
+    pids = [pid]
+    for actual in pids:
+        try:
+            with open(f'/proc/{actual}/task/{actual}/children') as archivo:
+                pids.extend(int(p) for p in archivo.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _reiniciar_pico(pid):
+    for actual in _procesos(pid):
+        try:
+            with open(f'/proc/{actual}/clear_refs', 'w') as archivo:
+                archivo.write('5')
+        except OSError:
+            pass
+
+
+def _pico_rss_mib(pid):
+    """Suma de los picos de RSS (VmHWM) del proceso y sus hijos, o None fuera de Linux."""
+    total = 0
+    encontrado = False
+    for actual in _procesos(pid):
+        try:
+            with open(f'/proc/{actual}/status') as archivo:
+                for linea in archivo:
+                    if linea.startswith('VmHWM:'):
+                        total += int(linea.split()[1])
+                        encontrado = True
+        except OSError:
+            pass
+    return round(total / 1024, 1) if encontrado else None
+
+
+# --- Ejecución ---------------------------------------------------------------
+
+def _correr(nuevo_cliente, generador, admin, contexto, usuarios, segundos, pid):
+    barrera = threading.Barrier(usuarios + 1, timeout=300)
+    resultados = [None] * usuarios
+
+    def trabajar(usuario):
+        azar = random.Random(usuario)
+        cliente = nuevo_cliente()
+        if admin:
+            cliente.pedir(Peticion('POST', '/auth/login', datos={
+                'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD,
+            }, esperado=302))
+        duraciones = []
+        errores = 0
+        barrera.wait()
+        fin = time.perf_counter() + segundos
+        iteracion = 0
+        while time.perf_counter() < fin:
+            peticion = generador(cliente, azar, usuario, iteracion, contexto)
+            iteracion += 1
+            if peticion is None:
+                break
+            inicio = time.perf_counter()
+            try:
+                fallo = cliente.pedir(peticion) != peticion.esperado
+            except Exception:
+                fallo = True
+            duraciones.append(time.perf_counter() - inicio)
+            errores += fallo
+        resultados[usuario] = (duraciones, errores)
+
+    hilos = [threading.Thread(target=trabajar, args=(u,)) for u in range(usuarios)]
+    for hilo in hilos:
+        hilo.start()
+    barrera.wait()
+    _reiniciar_pico(pid)
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.perf_counter() - inicio
+
+    duraciones = [d for ds, _ in resultados for d in ds]
+    errores = sum(e for _, e in resultados)
+    return {
+        'peticiones': len(duraciones),
+        'errores': errores,
+        'por_s': round((len(duraciones) - errores) / transcurrido, 1) if transcurrido else 0.0,
+        **percentiles(duraciones),
+        'rss_pico_mib': _pico_rss_mib(pid),
+    }
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar(puerto, proceso, limite=60):
+    fin = time.time() + limite
+    while time.time() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError('gunicorn terminó al arrancar')
+        try:
+            ClienteHTTP('127.0.0.1', puerto).pedir(Peticion('GET', '/auth/login'))
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn no respondió a tiempo')
+
+
+def ejecutar(modo, valores, usuarios, segundos, workers, escenarios):
+    """Corre los escenarios sobre una copia nueva de la base y devuelve los resultados."""
+    copiar_base(os.path.join(DIRECTORIO_DATOS, f'{nombre_base(valores)}.db'),
+                os.path.join(DIRECTORIO_DATOS, f'{BASE}.db'))
+    contexto = Contexto(valores, usuarios)
+    resultados = {}
+
+    if modo == 'flask':
+        app = crear_app(BASE, **OPCIONES)
+        for nombre, admin, generador in ESCENARIOS:
+            if nombre in escenarios:
+                resultados[nombre] = _correr(lambda: ClienteFlask(app), generador, admin, contexto,
+                                             usuarios, segundos, os.getpid())
+        return resultados
+
+    puerto = _puerto_libre()
+    entorno = dict(os.environ, BENCH_BASE=BASE, BENCH_OPCIONES=json.dumps(OPCIONES))
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{puerto}',
+         '--log-level', 'warning', 'benchmarks.wsgi:app'],
+        cwd=RAIZ, env=entorno,
+    )
+    try:
+        _esperar(puerto, proceso)
+        for nombre, admin, generador in ESCENARIOS:
+            if nombre in escenarios:
+                resultados[nombre] = _correr(lambda: ClienteHTTP('127.0.0.1', puerto), generador, admin,
+                                             contexto, usuarios, segundos, proceso.pid)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+    return resultados
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argumentos(argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter))
+    parser.add_argument('--modo', choices=('flask', 'http'), default='flask')
+    parser.add_argument('--usuarios', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2, help='procesos de gunicorn en modo http')
+    parser.add_argument('--escenarios', nargs='+', choices=[e[0] for e in ESCENARIOS],
+                        default=[e[0] for e in ESCENARIOS])
+    parser.add_argument('--salida', help='guarda el resultado en este archivo JSON')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    parametros = {k: getattr(args, k) for k in DEFECTOS}
+    preparar(**parametros)
+    valores = dict(DEFECTOS, **{k: v for k, v in parametros.items() if v is not None})
+
+    resultados = ejecutar(args.modo, valores, args.usuarios, args.segundos, args.workers, args.escenarios)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump({
+                'commit': _commit(),
+                'modo': args.modo,
+                'usuarios': args.usuarios,
+                'segundos': args.segundos,
+                'workers': args.workers if args.modo == 'http' else None,
+                'datos': valores,
+                'escenarios': resultados,
+            }, archivo, indent=2, ensure_ascii=False)
+    imprimir(resultados, args.json)
+
+
+if __name__ == '__main__':
+    main()
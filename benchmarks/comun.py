@@ -0,0 +1,75 @@
+import gc
+import json
+import os
+import sqlite3
+import time
+import tracemalloc
+from contextlib import closing
+
+from config import TestingConfig, config
+
+DIRECTORIO_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.datos')
+
+
+def crear_app(nombre_base, **opciones):
+    """Crea la aplicación de pruebas sobre `benchmarks/.datos/<nombre_base>.db`.
+
+    `opciones` se agregan a la configuración, p. ej. `PASSWORD_VERIFY_WORKERS=2`.
+    """
+    from app import create_app
+
+    os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+    ruta = os.path.join(DIRECTORIO_DATOS, f'{nombre_base}.db')
+    config['benchmark'] = type('BenchmarkConfig', (TestingConfig,), dict(
+        opciones,
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{ruta}',
+    ))
+    return create_app('benchmark')
+
+
+def copiar_base(origen, destino):
+    """Copia una base SQLite con la API de backup, que incluye lo que siga en el WAL."""
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(destino + sufijo):
+            os.remove(destino + sufijo)
+    with closing(sqlite3.connect(origen)) as fuente, closing(sqlite3.connect(destino)) as copia:
+        fuente.backup(copia)
+
+
+def percentiles(muestras):
+    """p50, p95 y p99 en milisegundos de una lista de duraciones en segundos."""
+    if not muestras:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    ordenadas = sorted(muestras)
+
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000, 2)
+
+    return {'p50_ms': p(0.50), 'p95_ms': p(0.95), 'p99_ms': p(0.99)}
+
+
+def medir(funcion, repeticiones=1):
+    """Ejecuta `funcion` y devuelve el mejor tiempo (s) y el pico de memoria (MiB)."""
+    mejor = None
+    pico = 0
+    resultado = None
+    for _ in range(repeticiones):
+        gc.collect()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio
+        _, pico_actual = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        mejor = duracion if mejor is None else min(mejor, duracion)
+        pico = max(pico, pico_actual)
+    return {'segundos': round(mejor, 4), 'memoria_mib': round(pico / 2**20, 2)}, resultado
+
+
+def imprimir(resultados, como_json=False):
+    if como_json:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+        return
+    for nombre, datos in resultados.items():
+        detalle = ', '.join(f'{k}={v}' for k, v in datos.items())
+        print(f'{nombre:<28} {detalle}')
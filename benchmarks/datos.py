@@ -0,0 +1,178 @@
+"""Generador de datos sintéticos para los benchmarks.
+
+    python -m benchmarks.datos --facturas 100000 --lineas 10 --dias 365
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from werkzeug.security import generate_password_hash
+
+from .comun import crear_app
+
+ADMIN_EMAIL = 'admin@bench.example.com'
+ADMIN_PASSWORD = 'benchmark'
+CLIENTE_PASSWORD = 'benchmark'
+
+DEFECTOS = {
+    'clientes': 1000,
+    'productos': 5000,
+    'facturas': 100000,
+    'lineas': 5,
+    'dias': 365,
+    'semilla': 42,
+}
+
+
+def nombre_base(parametros):
+    return 'bench-' + '-'.join(f'{k[0]}{parametros[k]}' for k in sorted(DEFECTOS))
+
+
+def _lotes(iterable, tamano):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def generar(app, clientes, productos, facturas, lineas, dias, semilla, lote=20000, inicio=None):
+    """Carga un conjunto de datos reproducible en la base de `app`.
+
+    Cada factura tiene entre 1 y `lineas` ítems y una fecha uniforme en los
+    `dias` anteriores a `inicio` (por defecto, hoy).
+    """
+    from app import db
+    from app.models import Cliente, DetalleFactura, Factura, Producto, Usuario
+    from app.services import busqueda, resumenes
+
+    azar = random.Random(semilla)
+    fin = inicio or datetime.now().replace(microsecond=0)
+    origen = fin - timedelta(days=dias)
+    segundos = dias * 24 * 3600
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        hash_cliente = generate_password_hash(CLIENTE_PASSWORD)
+        with db.engine.begin() as conexion:
+            conexion.execute(Usuario.__table__.insert(), [{
+                'nombre': 'Administrador',
+                'email': ADMIN_EMAIL,
+                'password': generate_password_hash(ADMIN_PASSWORD),
+            }])
+            conexion.execute(Cliente.__table__.insert(), [
+                {
+                    'id': i,
+                    'nombre': f'Cliente {i:07d}',
+                    'email': f'cliente{i}@bench.example.com',
+                    'direccion': f'Calle {i}',
+                    'telefono': f'{i:010d}',
+                    'password_hash': hash_cliente,
+                    'es_cliente': True,
+                }
+                for i in range(1, clientes + 1)
+            ])
+            precios = [Decimal(azar.randint(100, 100000)) / 100 for _ in range(productos)]
+            conexion.execute(Producto.__table__.insert(), [
+                {'id': i + 1, 'descripcion': f'Producto {i + 1:07d}', 'precio': precio, 'stock': 10**9}
+                for i, precio in enumerate(precios)
+            ])
+
+        def filas():
+            for id_factura in range(1, facturas + 1):
+                detalles = []
+                for _ in range(azar.randint(1, lineas)):
+                    id_producto = azar.randint(1, productos)
+                    cantidad = azar.randint(1, 5)
+                    precio = precios[id_producto - 1]
+                    detalles.append({
+                        'id_factura': id_factura,
+                        'id_producto': id_producto,
+                        'cantidad': cantidad,
+                        'precio_unitario': precio,
+                        'subtotal': precio * cantidad,
+                    })
+                factura = {
+                    'id': id_factura,
+                    'id_cliente': azar.randint(1, clientes),
+                    'fecha': origen + timedelta(seconds=azar.randrange(segundos)),
+                    'total': sum(d['subtotal'] for d in detalles),
+                    'cantidad_lineas': len(detalles),
+                    'cantidad_unidades': sum(d['cantidad'] for d in detalles),
+                }
+                yield factura, detalles
+
+        for grupo in _lotes(filas(), lote):
+            with db.engine.begin() as conexion:
+                conexion.execute(Factura.__table__.insert(), [f for f, _ in grupo])
+                conexion.execute(DetalleFactura.__table__.insert(), [d for _, ds in grupo for d in ds])
+
+        resumenes.reconstruir()
+        busqueda.reconstruir_indice()
+        db.session.commit()
+
+
+def _esquema_al_dia(db):
+    """True si la base tiene todas las tablas, columnas (con su tipo) e índices de los modelos actuales."""
+    from sqlalchemy import inspect
+
+    inspector = inspect(db.engine)
+    for tabla in db.metadata.sorted_tables:
+        if not inspector.has_table(tabla.name):
+            return False
+        tipos = {c['name']: str(c['type']) for c in inspector.get_columns(tabla.name)}
+        if any(tipos.get(c.name) != c.type.compile(dialect=db.engine.dialect) for c in tabla.columns):
+            return False
+        if not {i.name for i in tabla.indexes} <= {i['name'] for i in inspector.get_indexes(tabla.name)}:
+            return False
+    return True
+
+
+def preparar(reutilizar=True, **parametros):
+    """Devuelve una app cuya base contiene el conjunto de datos pedido.
+
+    La base se identifica por sus parámetros, así que se genera una sola vez
+    (y otra vez si los modelos cambiaron desde entonces).
+    """
+    valores = dict(DEFECTOS, **{k: v for k, v in parametros.items() if v is not None})
+    app = crear_app(nombre_base(valores))
+    from app import db
+    from app.models import Factura
+
+    with app.app_context():
+        existente = False
+        if reutilizar:
+            try:
+                existente = (
+                    _esquema_al_dia(db)
+                    and db.session.query(db.func.count(Factura.id)).scalar() == valores['facturas']
+                )
+            except Exception:
+                db.session.rollback()
+    if not existente:
+        generar(app, **valores)
+    return app
+
+
+def argumentos(parser):
+    for nombre, defecto in DEFECTOS.items():
+        parser.add_argument(f'--{nombre}', type=int, default=None, help=f'por defecto {defecto}')
+    return parser
+
+
+def main():
+    parser = argumentos(argparse.ArgumentParser(description=__doc__))
+    args = parser.parse_args()
+    inicio = time.perf_counter()
+    preparar(reutilizar=False, **{k: getattr(args, k) for k in DEFECTOS})
+    print(f'Datos generados en {time.perf_counter() - inicio:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
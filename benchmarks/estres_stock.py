@@ -0,0 +1,124 @@
+"""Prueba de estrés de ventas concurrentes sobre un único producto.
+
+Lanza varios procesos que venden el mismo producto a través de
+`main.nueva_factura` y verifica al final que el stock nunca quedó negativo y
+que ninguna venta se perdió: cada unidad descontada corresponde a una línea de
+factura y, si la demanda supera el stock, se vende exactamente el stock inicial.
+
+    python -m benchmarks.estres_stock --procesos 8 --ventas 50 --stock 300
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+from datetime import date
+
+from .comun import crear_app, imprimir
+
+BASE = 'estres-stock'
+
+
+def _preparar(stock):
+    from werkzeug.security import generate_password_hash
+
+    from app import db
+    from app.models import Cliente, Producto, Usuario
+
+    app = crear_app(BASE)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin = Usuario(nombre='Administrador', email='admin@bench.example.com')
+        admin.password_hash = generate_password_hash('benchmark')
+        cliente = Cliente(nombre='Cliente estrés', email='cliente@bench.example.com')
+        producto = Producto(descripcion='Producto disputado', precio=10, stock=stock)
+        db.session.add_all([admin, cliente, producto])
+        db.session.commit()
+        return cliente.id, producto.id
+
+
+def _vender(argumentos):
+    id_cliente, id_producto, ventas, inicio = argumentos
+    app = crear_app(BASE)
+    cliente = app.test_client()
+    cliente.post('/auth/login', data={'email': 'admin@bench.example.com', 'password': 'benchmark'})
+    while time.time() < inicio:
+        time.sleep(0.001)
+
+    conteo = {'vendidas': 0, 'rechazadas': 0, 'errores': 0}
+    for _ in range(ventas):
+        respuesta = cliente.post('/facturas/nueva', data={
+            'cliente_id': id_cliente,
+            'fecha': date.today().isoformat(),
+            'items-0-producto_id': id_producto,
+            'items-0-cantidad': 1,
+            'items-0-precio_unitario': '10.00',
+        })
+        if respuesta.status_code == 302:
+            conteo['vendidas'] += 1
+        elif respuesta.status_code == 200 and b'stock' in respuesta.data:
+            conteo['rechazadas'] += 1
+        else:
+            conteo['errores'] += 1
+    return conteo
+
+
+def _verificar(stock, id_producto, totales):
+    from app import db
+    from app.models import DetalleFactura, Factura, Producto
+
+    app = crear_app(BASE)
+    with app.app_context():
+        final = db.session.get(Producto, id_producto).stock
+        facturas = db.session.query(db.func.count(Factura.id)).scalar()
+        unidades = db.session.query(db.func.coalesce(db.func.sum(DetalleFactura.cantidad), 0)).scalar()
+
+    demanda = sum(totales.values())
+    fallas = []
+    if final < 0:
+        fallas.append(f'stock negativo: {final}')
+    if stock - final != unidades:
+        fallas.append(f'el stock descontado ({stock - final}) no coincide con las unidades facturadas ({unidades})')
+    if facturas != totales['vendidas']:
+        fallas.append(f'facturas en la base ({facturas}) != ventas confirmadas ({totales["vendidas"]})')
+    if totales['errores']:
+        fallas.append(f'{totales["errores"]} ventas terminaron con error')
+    if demanda >= stock and totales['vendidas'] != stock:
+        fallas.append(f'se vendieron {totales["vendidas"]} de {stock} unidades disponibles')
+    return final, fallas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procesos', type=int, default=8)
+    parser.add_argument('--ventas', type=int, default=50, help='ventas intentadas por proceso')
+    parser.add_argument('--stock', type=int, default=300)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    id_cliente, id_producto = _preparar(args.stock)
+    contexto = multiprocessing.get_context('spawn')
+    inicio = time.time() + 3
+    with contexto.Pool(args.procesos) as pool:
+        parciales = pool.map(_vender, [(id_cliente, id_producto, args.ventas, inicio)] * args.procesos)
+    duracion = time.time() - inicio
+
+    totales = {clave: sum(p[clave] for p in parciales) for clave in parciales[0]}
+    final, fallas = _verificar(args.stock, id_producto, totales)
+    imprimir({
+        'estres_stock': dict(
+            totales,
+            stock_inicial=args.stock,
+            stock_final=final,
+            segundos=round(duracion, 2),
+            ventas_por_segundo=round(sum(totales.values()) / duracion, 1),
+            correcto=not fallas,
+        ),
+    }, args.json)
+    for falla in fallas:
+        print(f'FALLA: {falla}', file=sys.stderr)
+    return 1 if fallas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Busca recorridos completos de tablas en las consultas de cada ruta.
+
+Recorre los mismos casos que `presupuesto_sql` sobre una copia del conjunto
+de datos sintético, repite cada SELECT, UPDATE y DELETE que ejecutó la ruta
+con `EXPLAIN QUERY PLAN` y falla (código de salida 1) si SQLite recorre una
+tabla entera sin índice (`SCAN tabla`) y el caso no figura en `PERMITIDOS`:
+
+    python -m benchmarks.planes_sql
+    python -m benchmarks.planes_sql --planes
+
+Los recorridos de un índice completo (`SCAN ... USING INDEX`) no se marcan:
+son los de los listados paginados, que se cortan con el LIMIT.
+"""
+import argparse
+import re
+import sys
+import tempfile
+
+from .comun import imprimir
+from .datos import argumentos
+from .presupuesto_sql import preparar_casos, recorrer
+
+# (endpoint, tabla): motivo. Recorridos completos aceptados a conciencia.
+PERMITIDOS = {
+    ('main.listar_clientes', 'clientes'): 'la búsqueda por subcadena del nombre no puede usar un índice',
+    ('main.nueva_factura', 'productos'): 'carga el catálogo completo, que queda en caché (services/catalogo.py)',
+    ('main.autocompletar', 'productos'): 'carga el catálogo completo, que queda en caché (services/catalogo.py)',
+}
+
+SENTENCIAS_CON_PLAN = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+_TABLA = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+"?(\w+)"?(?:\s+(?:AS\s+)?"?(\w+)"?)?', re.IGNORECASE)
+_RECORRIDO = re.compile(r'^SCAN (\w+)$')
+_SUBCONSULTA = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\w+)')
+
+_PALABRAS = {'WHERE', 'ON', 'SET', 'GROUP', 'ORDER', 'LIMIT', 'JOIN', 'LEFT', 'INNER', 'OUTER', 'CROSS',
+             'USING', 'VALUES', 'SELECT', 'UNION', 'HAVING', 'AND', 'OR'}
+
+
+def _alias(sentencia):
+    """Alias (o nombre) de cada tabla de la sentencia, con la tabla a la que corresponde."""
+    alias = {}
+    for tabla, nombre in _TABLA.findall(sentencia):
+        alias[tabla] = tabla
+        if nombre and nombre.upper() not in _PALABRAS:
+            alias[nombre] = tabla
+    return alias
+
+
+def recorridos(conexion, sentencia, parametros):
+    """Plan de la sentencia y tablas que recorre enteras, sin índice."""
+    plan = [fila[3] for fila in conexion.exec_driver_sql(f'EXPLAIN QUERY PLAN {sentencia}', parametros)]
+    subconsultas = {m.group(1) for m in map(_SUBCONSULTA.match, plan) if m}
+    alias = _alias(sentencia)
+    tablas = []
+    for detalle in plan:
+        m = _RECORRIDO.match(detalle)
+        if m and m.group(1) not in subconsultas and not m.group(1).startswith('sqlite_'):
+            tablas.append(alias.get(m.group(1), m.group(1)))
+    return plan, tablas
+
+
+def hallar(app, medicion):
+    """`(tabla, sentencia, plan)` de cada recorrido completo no permitido en las sentencias del caso."""
+    from app import db
+
+    hallados = []
+    with app.app_context(), db.engine.connect() as conexion:
+        for sentencia, parametros in medicion.ejecuciones:
+            if not sentencia.lstrip().upper().startswith(SENTENCIAS_CON_PLAN):
+                continue
+            plan, tablas = recorridos(conexion, sentencia, parametros)
+            for tabla in tablas:
+                if (medicion.caso.endpoint, tabla) not in PERMITIDOS:
+                    hallados.append((tabla, ' '.join(sentencia.split()), plan))
+    return hallados
+
+
+def ejecutar(app, valores, mostrar_planes=False):
+    resultados = {}
+    fallas = []
+    for medicion in recorrer(app, valores):
+        caso = medicion.caso
+        hallados = hallar(app, medicion)
+        nombre = f'{medicion.indice:02d} {caso.metodo} {medicion.url}'[:80]
+        resultados[nombre] = {
+            'endpoint': caso.endpoint,
+            'sentencias': len(medicion.ejecuciones),
+            'resultado': 'FALLA' if hallados else 'ok',
+        }
+        for tabla, sentencia, plan in hallados:
+            fallas.append((f'{caso.endpoint} {caso.metodo} {medicion.url}: recorre {tabla} completa',
+                           [sentencia] + (plan if mostrar_planes else [])))
+    return resultados, fallas
+
+
+def main():
+    parser = argumentos(argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter))
+    parser.add_argument('--planes', action='store_true', help='muestra el plan completo de las sentencias marcadas')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pdfs:
+        app, valores = preparar_casos(args, 'planes', PDF_CACHE_DIR=pdfs)
+        resultados, fallas = ejecutar(app, valores, args.planes)
+
+    imprimir(resultados, args.json)
+    if fallas:
+        print(f'\n{len(fallas)} recorrido(s) completo(s):', file=sys.stderr)
+        for falla, lineas in fallas:
+            print(f'  {falla}', file=sys.stderr)
+            for linea in lineas:
+                print(f'      {linea[:200]}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
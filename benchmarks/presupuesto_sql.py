@@ -0,0 +1,309 @@
+"""Presupuesto de sentencias SQL y de tiempo para cada ruta de `main` y `auth`.
+
+Recorre todos los endpoints de los blueprints con el cliente de pruebas sobre
+una copia del conjunto de datos sintético y falla (código de salida 1) si
+alguno ejecuta más sentencias SQL o tarda más de lo que permite su
+presupuesto, o si hay un endpoint sin presupuesto. Sirve para detectar N+1 y
+regresiones antes de publicar:
+
+    python -m benchmarks.presupuesto_sql
+    python -m benchmarks.presupuesto_sql --factor-tiempo 3 --detalle
+
+Las cachés del proceso se vacían antes de cada petición, así que los límites
+corresponden al camino sin caché.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .comun import DIRECTORIO_DATOS, copiar_base, crear_app, imprimir
+from .datos import ADMIN_EMAIL, ADMIN_PASSWORD, CLIENTE_PASSWORD, DEFECTOS, argumentos, nombre_base, preparar
+
+BLUEPRINTS = ('main', 'auth')
+
+PARAMETROS = {'clientes': 2000, 'productos': 3000, 'facturas': 20000, 'lineas': 5}
+
+# `usuario`: None o 'anonimo' (sin sesión), 'admin', 'cliente' o 'salida'
+# (otro cliente, para el cierre de sesión). `url` y los datos del
+# formulario se completan con `valores_casos()`. El orden importa: las altas
+# crean el cliente y el producto que después se eliminan.
+Caso = namedtuple('Caso', 'endpoint metodo url usuario sentencias ms estado datos', defaults=(200, None))
+
+CASOS = [
+    Caso('auth.login', 'GET', '/auth/login', None, 0, 200),
+    Caso('auth.register', 'GET', '/auth/register', None, 0, 200),
+    Caso('auth.register', 'POST', '/auth/register', None, 3, 1500, 302, {
+        'nombre': 'Cliente nuevo', 'email': 'nuevo@bench.example.com',
+        'password': 'secreto', 'confirm_password': 'secreto',
+    }),
+    Caso('auth.login', 'POST', '/auth/login', 'anonimo', 1, 1500, 302, {
+        'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD,
+    }),
+    Caso('auth.logout', 'GET', '/auth/logout', 'salida', 1, 200, 302),
+
+    Caso('main.index', 'GET', '/', 'admin', 1, 200, 302),
+    Caso('main.estado_cache', 'GET', '/admin/cache', 'admin', 1, 200),
+    Caso('main.exportar_metricas', 'GET', '/metrics', 'admin', 1, 200),
+
+    Caso('main.listar_clientes', 'GET', '/clientes', 'admin', 2, 300),
+    Caso('main.listar_clientes', 'GET', '/clientes?q=cliente 00012', 'admin', 2, 300),
+    Caso('main.nuevo_cliente', 'GET', '/clientes/nuevo', 'admin', 1, 200),
+    Caso('main.nuevo_cliente', 'POST', '/clientes/nuevo', 'admin', 3, 1500, 302, {
+        'nombre': 'Cliente alta', 'email': 'alta@bench.example.com',
+        'password': 'secreto', 'confirm_password': 'secreto',
+    }),
+    Caso('main.editar_cliente', 'GET', '/clientes/editar/1', 'admin', 2, 200),
+    Caso('main.editar_cliente', 'POST', '/clientes/editar/1', 'admin', 4, 300, 302, {
+        'nombre': 'Cliente editado', 'email': 'cliente1@bench.example.com',
+    }),
+    Caso('main.confirmar_eliminar_cliente', 'GET', '/clientes/eliminar/{cliente_nuevo}', 'admin', 3, 200),
+    Caso('main.eliminar_cliente', 'POST', '/clientes/eliminar/{cliente_nuevo}', 'admin', 4, 300, 302),
+
+    Caso('main.listar_productos', 'GET', '/productos', 'admin', 2, 300),
+    Caso('main.listar_productos', 'GET', '/productos?q=producto 00012', 'admin', 3, 300),
+    Caso('main.buscar_productos', 'GET', '/api/productos?q=producto 0001', 'admin', 2, 300),
+    Caso('main.nuevo_producto', 'GET', '/productos/nuevo', 'admin', 1, 200),
+    Caso('main.nuevo_producto', 'POST', '/productos/nuevo', 'admin', 4, 300, 302, {
+        'descripcion': 'Producto alta', 'precio': '12.50', 'stock': '10',
+    }),
+    Caso('main.editar_producto', 'GET', '/productos/editar/1', 'admin', 2, 200),
+    Caso('main.editar_producto', 'POST', '/productos/editar/1', 'admin', 5, 300, 302, {
+        'descripcion': 'Producto editado', 'precio': '10.00', 'stock': '1000000000',
+    }),
+    Caso('main.confirmar_eliminar_producto', 'GET', '/productos/eliminar/{producto_nuevo}', 'admin', 2, 200),
+    Caso('main.eliminar_producto', 'POST', '/productos/eliminar/{producto_nuevo}', 'admin', 4, 300, 302),
+
+    Caso('main.listar_facturas', 'GET', '/facturas', 'admin', 3, 1000),
+    Caso('main.listar_facturas', 'GET', '/facturas?cliente_id=1', 'admin', 3, 1000),
+    Caso('main.listar_facturas', 'GET', '/facturas', 'cliente', 2, 300),
+    Caso('main.ver_factura', 'GET', '/facturas/1', 'admin', 3, 300),
+    Caso('main.ver_factura', 'GET', '/facturas/{factura_cliente}', 'cliente', 3, 300),
+    Caso('main.ver_factura_json', 'GET', '/api/facturas/1', 'admin', 3, 300),
+    Caso('main.ver_factura_pdf', 'GET', '/facturas/1/pdf', 'admin', 3, 300),
+    Caso('main.nueva_factura', 'GET', '/facturas/nueva', 'admin', 3, 1500),
+    Caso('main.nueva_factura', 'POST', '/facturas/nueva', 'admin', 9, 1500, 302, {
+        'cliente_id': '1', 'fecha': '{hoy}',
+        'items-0-producto_id': '1', 'items-0-cantidad': '2', 'items-0-precio_unitario': '10.00',
+        'items-1-producto_id': '2', 'items-1-cantidad': '1', 'items-1-precio_unitario': '10.00',
+    }),
+    Caso('main.crear_facturas_lote', 'POST', '/api/facturas/lote', 'admin', 7, 500, 200, {
+        'facturas': [{'id_cliente': 2, 'items': [{'id_producto': 3, 'cantidad': 1}, {'id_producto': 4, 'cantidad': 2}]}],
+    }),
+    Caso('main.autocompletar', 'GET', '/api/catalogo/clientes?q=cliente 00001', 'admin', 2, 300),
+    Caso('main.autocompletar', 'GET', '/api/catalogo/productos?q=producto 00001', 'admin', 2, 300),
+    Caso('main.confirmar_eliminar_factura', 'GET', '/facturas/eliminar/1', 'admin', 3, 200),
+    Caso('main.eliminar_factura', 'POST', '/facturas/eliminar/1', 'admin', 7, 500, 302),
+    Caso('main.anular_facturas', 'GET', '/facturas/anular', 'admin', 2, 300),
+    # Un mes entero de facturas: las sentencias no dependen de cuántas sean.
+    Caso('main.anular_facturas', 'POST', '/facturas/anular', 'admin', 8, 1000, 302, {
+        'fecha_desde': '{anio}', 'fecha_hasta': '{anio_mes}', 'cliente_id': '0',
+    }),
+
+    Caso('main.reportes', 'GET', '/reportes', 'admin', 2, 1000),
+    Caso('main.reportes', 'GET', '/reportes?fecha_desde={desde}&fecha_hasta={hoy}&cliente_id=0', 'admin', 4, 1000),
+    Caso('main.reportes', 'GET', '/reportes?fecha_desde={desde}&fecha_hasta={hoy}&cliente_id=0&agrupacion=mes',
+         'admin', 5, 1000),
+    Caso('main.exportar_reporte', 'GET', '/reportes/exportar/csv?fecha_desde={desde}&fecha_hasta={hoy}&cliente_id=0',
+         'admin', 3, 1000),
+    Caso('main.facturas_pdf_lote', 'GET', '/facturas/pdf/lote?fecha_desde={semana}&fecha_hasta={hoy}&cliente_id=0',
+         'admin', 8, 5000),
+]
+
+
+def valores_casos(parametros):
+    hoy = date.today()
+    return {
+        'hoy': hoy.isoformat(),
+        'desde': (hoy - timedelta(days=90)).isoformat(),
+        'semana': (hoy - timedelta(days=7)).isoformat(),
+        'anio': (hoy - timedelta(days=365)).isoformat(),
+        'anio_mes': (hoy - timedelta(days=335)).isoformat(),
+        'cliente_nuevo': parametros['clientes'] + 1,
+        'producto_nuevo': parametros['productos'] + 1,
+    }
+
+
+def completar(valor, valores):
+    if isinstance(valor, str):
+        return valor.format(**valores)
+    if isinstance(valor, dict):
+        return {k: completar(v, valores) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [completar(v, valores) for v in valor]
+    return valor
+
+
+class Contador:
+    """Sentencias SQL ejecutadas mientras está activo, en cualquier motor.
+
+    `ejecuciones` guarda además el texto original con sus parámetros (de un
+    executemany, los de la primera fila) para poder repetirlas.
+    """
+
+    def __init__(self):
+        self.activo = False
+        self.sentencias = []
+        self.ejecuciones = []
+        event.listen(Engine, 'after_cursor_execute', self._registrar)
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        if self.activo:
+            self.sentencias.append(' '.join(statement.split()))
+            self.ejecuciones.append((statement, parameters[0] if executemany else parameters))
+
+    def limpiar(self):
+        self.sentencias.clear()
+        self.ejecuciones.clear()
+
+    def cerrar(self):
+        event.remove(Engine, 'after_cursor_execute', self._registrar)
+
+
+def pedir(cliente, caso, url, datos):
+    if caso.metodo == 'GET':
+        return cliente.get(url)
+    if url.startswith('/api/'):
+        return cliente.post(url, json=datos)
+    return cliente.post(url, data=datos or {})
+
+
+def clientes_web(app):
+    anonimo = app.test_client()
+    admin = app.test_client()
+    admin.post('/auth/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    cliente = app.test_client()
+    cliente.post('/auth/login', data={'email': 'cliente1@bench.example.com', 'password': CLIENTE_PASSWORD})
+    salida = app.test_client()
+    salida.post('/auth/login', data={'email': 'cliente2@bench.example.com', 'password': CLIENTE_PASSWORD})
+    return {None: anonimo, 'anonimo': app.test_client(), 'admin': admin, 'cliente': cliente, 'salida': salida}
+
+
+def factura_de_cliente(app, id_cliente):
+    from app.models import Factura
+
+    with app.app_context():
+        return Factura.query.filter_by(id_cliente=id_cliente).order_by(Factura.id).first().id
+
+
+Medicion = namedtuple('Medicion', 'indice caso url estado ms sentencias ejecuciones')
+
+
+def recorrer(app, valores):
+    """Ejecuta `CASOS` en orden, con las cachés vacías, y devuelve una `Medicion` por caso."""
+    from app.services import cache
+
+    web = clientes_web(app)
+    contador = Contador()
+    mediciones = []
+    try:
+        for i, caso in enumerate(CASOS):
+            url = completar(caso.url, valores)
+            datos = completar(caso.datos, valores)
+            for c in cache.REGISTRO.values():
+                c.limpiar()
+
+            contador.limpiar()
+            contador.activo = True
+            inicio = time.perf_counter()
+            respuesta = pedir(web[caso.usuario], caso, url, datos)
+            respuesta.get_data()
+            ms = (time.perf_counter() - inicio) * 1000
+            contador.activo = False
+            respuesta.close()
+            mediciones.append(Medicion(i, caso, url, respuesta.status_code, ms,
+                                       list(contador.sentencias), list(contador.ejecuciones)))
+    finally:
+        contador.cerrar()
+    return mediciones
+
+
+def problemas(medicion, factor_tiempo=1.0):
+    """Lo que excede el presupuesto del caso: estado, sentencias o tiempo."""
+    caso = medicion.caso
+    limite_ms = caso.ms * factor_tiempo
+    encontrados = []
+    if medicion.estado != caso.estado:
+        encontrados.append(f'estado {medicion.estado} (esperado {caso.estado})')
+    if len(medicion.sentencias) > caso.sentencias:
+        encontrados.append(f'{len(medicion.sentencias)} sentencias (máximo {caso.sentencias})')
+    if medicion.ms > limite_ms:
+        encontrados.append(f'{medicion.ms:.0f} ms (máximo {limite_ms:.0f})')
+    return encontrados
+
+
+def sin_presupuesto(app):
+    """Endpoints de `BLUEPRINTS` que no tienen ningún caso."""
+    cubiertos = {caso.endpoint for caso in CASOS}
+    return [
+        f'{regla.endpoint} ({regla.rule})'
+        for regla in app.url_map.iter_rules()
+        if regla.endpoint.split('.')[0] in BLUEPRINTS and regla.endpoint not in cubiertos
+    ]
+
+
+def ejecutar(app, valores, factor_tiempo=1.0, detalle=False):
+    resultados = {}
+    fallas = []
+    for medicion in recorrer(app, valores):
+        caso = medicion.caso
+        encontrados = problemas(medicion, factor_tiempo)
+        nombre = f'{medicion.indice:02d} {caso.metodo} {medicion.url}'[:80]
+        resultados[nombre] = {
+            'endpoint': caso.endpoint,
+            'sentencias': f'{len(medicion.sentencias)}/{caso.sentencias}',
+            'ms': f'{medicion.ms:.1f}/{caso.ms * factor_tiempo:.0f}',
+            'resultado': 'FALLA' if encontrados else 'ok',
+        }
+        if encontrados:
+            fallas.append((f'{caso.endpoint} {caso.metodo} {medicion.url}: ' + '; '.join(encontrados),
+                           medicion.sentencias if detalle else []))
+    fallas.extend((f'{endpoint} no tiene presupuesto', []) for endpoint in sin_presupuesto(app))
+    return resultados, fallas
+
+
+def preparar_casos(args, nombre, **opciones):
+    """App sobre una copia nueva del conjunto de datos y los valores para completar `CASOS`.
+
+    Los casos modifican la base, así que cada ejecución trabaja sobre su copia.
+    """
+    parametros = dict(PARAMETROS, **{k: getattr(args, k) for k in DEFECTOS if getattr(args, k) is not None})
+    preparar(**parametros)
+    valores = dict(DEFECTOS, **parametros)
+
+    copiar_base(os.path.join(DIRECTORIO_DATOS, f'{nombre_base(valores)}.db'),
+                os.path.join(DIRECTORIO_DATOS, f'{nombre}.db'))
+    app = crear_app(nombre, **opciones)
+    return app, dict(valores_casos(valores), factura_cliente=factura_de_cliente(app, 1))
+
+
+def main():
+    parser = argumentos(argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter))
+    parser.add_argument('--factor-tiempo', type=float, default=1.0,
+                        help='multiplica los límites de tiempo (máquinas lentas o CI compartida)')
+    parser.add_argument('--detalle', action='store_true', help='muestra las sentencias de los casos que fallan')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pdfs:
+        app, valores = preparar_casos(args, 'presupuesto', PDF_CACHE_DIR=pdfs)
+        resultados, fallas = ejecutar(app, valores, args.factor_tiempo, args.detalle)
+
+    imprimir(resultados, args.json)
+    if fallas:
+        print(f'\n{len(fallas)} problema(s):', file=sys.stderr)
+        for falla, sentencias in fallas:
+            print(f'  {falla}', file=sys.stderr)
+            for sentencia in sentencias:
+                print(f'      {sentencia[:200]}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
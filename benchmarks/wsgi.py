@@ -0,0 +1,13 @@
+"""Aplicación WSGI de benchmarks para levantar gunicorn sobre una base sintética.
+
+`BENCH_BASE` es el nombre de la base en `benchmarks/.datos/` y
+`BENCH_OPCIONES` (JSON, opcional) se agrega a la configuración:
+
+    BENCH_BASE=carga gunicorn -w 4 benchmarks.wsgi:app
+"""
+import json
+import os
+
+from .comun import crear_app
+
+app = crear_app(os.environ['BENCH_BASE'], **json.loads(os.environ.get('BENCH_OPCIONES', '{}')))
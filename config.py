@@ -29,8 +29,70 @@ class Config:
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     LOG_FILE = 'logs/sis_facturacion.log'
     LOG_REQUEST_DETAILS = False
+    # 'json' (un objeto por línea) o 'texto' (LOG_FORMAT).
+    LOG_FORMATO = os.environ.get('LOG_FORMATO', 'json')
+    # Escribir desde un hilo aparte; False escribe en el hilo de la petición.
+    LOG_COLA = True
+    LOG_MAX_BYTES = 10 * 1024 * 1024
+    LOG_BACKUPS = 10
+    # logger: N. Deja pasar 1 de cada N registros por debajo de WARNING.
+    LOG_MUESTREO = {'app.peticiones': int(os.environ.get('LOG_MUESTREO_PETICIONES', 10))}
     ITEMS_PER_PAGE = 20
+    FACTURAS_LOTE_MAX = 5000
+    CACHE_USUARIOS_MAX = 1024
+    CACHE_USUARIOS_TTL = 60
+    CACHE_FACTURAS_MAX = 2048
+    # Vistas de factura por worker. Antes de servir una se comprueba que la
+    # factura exista con los mismos totales, así que eliminarla o repararla
+    # en otro proceso se ve enseguida; un cambio de nombre del cliente o del
+    # producto puede tardar hasta este TTL en verse en los otros workers.
+    CACHE_FACTURAS_TTL = 3600
+    PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR')
+    PDF_WORKERS = int(os.environ.get('PDF_WORKERS', 2))
+    PDF_EN_VUELO = 8
+    PDF_PRERENDER = True
+    PDF_COLA_MAX = 10000
+    # Estáticos versionados (`flask estaticos construir`, ver services/estaticos.py).
+    ESTATICOS_DIR = 'dist'
+    ESTATICOS_MANIFIESTO = True
+    ESTATICOS_WHITENOISE = True
+    # Cache-Control de los archivos sin versionar; los versionados son inmutables.
+    ESTATICOS_MAX_AGE = 3600
+    CATALOGO_TTL = 300
+    CATALOGO_MAX_OPCIONES = 500
+    CATALOGO_AUTOCOMPLETAR_LIMITE = 20
+    METRICAS_ACTIVAS = True
+    # Server-Timing con el SQL de la petición para todos; si no, sólo para administradores.
+    METRICAS_SERVER_TIMING = False
+    # Umbrales para el registro de consultas y peticiones lentas y de posibles N+1.
+    SQL_LENTA_SEGUNDOS = float(os.environ.get('SQL_LENTA_SEGUNDOS', 0.25))
+    PETICION_LENTA_SEGUNDOS = float(os.environ.get('PETICION_LENTA_SEGUNDOS', 1.0))
+    SQL_N_MAS_UNO_UMBRAL = 10
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_SALT_LENGTH = 16
+    PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 0))
+    PASSWORD_VERIFY_MAX_PENDING = 16
+    PASSWORD_VERIFY_TIMEOUT = 10
+    LOGIN_MAX_INTENTOS_EMAIL = 10
+    LOGIN_MAX_INTENTOS_IP = 50
+    LOGIN_VENTANA_SEGUNDOS = 300
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///facturacion.db'
+    # Se aplican a cada conexión SQLite nueva; `foreign_keys` siempre se activa.
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'cache_size': -20000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    }
+    # Los reportes leen por una conexión aparte abierta en modo de sólo lectura.
+    SQLITE_LECTURA = True
+    # Réplica de lectura opcional: listados, detalle de facturas y reportes leen
+    # de ella. En local puede ser otro archivo SQLite (`flask replica sincronizar`).
+    SQLALCHEMY_BINDS = {'replica': os.environ['REPLICA_DATABASE_URL']} if os.environ.get('REPLICA_DATABASE_URL') else {}
+    # Segundos que un usuario sigue leyendo de la principal después de escribir.
+    REPLICA_VENTANA_ESCRITURA = int(os.environ.get('REPLICA_VENTANA_ESCRITURA', 10))
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
@@ -44,6 +106,9 @@ class DevelopmentConfig(Config):
     SQLALCHEMY_ECHO = False
     SESSION_COOKIE_SECURE = False
     LOG_LEVEL = 'INFO'
+    # Los fuentes sin minificar y sin caché, para editarlos sin reconstruir.
+    ESTATICOS_MANIFIESTO = False
+    ESTATICOS_MAX_AGE = 0
 
 
 class TestingConfig(Config):
@@ -51,6 +116,9 @@ class TestingConfig(Config):
     TESTING = True
     WTF_CSRF_ENABLED = False
     LOG_LEVEL = 'WARNING'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PDF_WORKERS = 0
+    PDF_PRERENDER = False
 
 
 class ProductionConfig(Config):
@@ -0,0 +1,36 @@
+"""ventas diarias
+
+Revision ID: 3b9e2c7d41a0
+Revises: f4f3580b4bb8
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e2c7d41a0'
+down_revision = 'f4f3580b4bb8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ventas_diarias',
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('id_cliente', sa.Integer(), nullable=False),
+    sa.Column('cantidad', sa.Integer(), nullable=False),
+    sa.Column('monto', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['id_cliente'], ['clientes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('fecha', 'id_cliente')
+    )
+    with op.batch_alter_table('ventas_diarias', schema=None) as batch_op:
+        batch_op.create_index('idx_venta_diaria_cliente', ['id_cliente', 'fecha'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ventas_diarias', schema=None) as batch_op:
+        batch_op.drop_index('idx_venta_diaria_cliente')
+
+    op.drop_table('ventas_diarias')
@@ -0,0 +1,66 @@
+"""totales desnormalizados de factura
+
+Revision ID: 5d7a1e93c2b4
+Revises: 8c41d2f0a9e5
+Create Date: 2026-10-18 15:20:09.531774
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7a1e93c2b4'
+down_revision = '8c41d2f0a9e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sin batch: en SQLite, recrear `facturas` con las claves foráneas activas
+    # borraría en cascada las líneas. ADD COLUMN con valor por defecto no la
+    # recrea; las restricciones CHECK quedan sólo en los otros motores.
+    op.add_column('facturas', sa.Column('cantidad_lineas', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('facturas', sa.Column('cantidad_unidades', sa.Integer(), server_default='0', nullable=False))
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_check_constraint('check_cantidad_lineas_no_negativa', 'facturas', 'cantidad_lineas >= 0')
+        op.create_check_constraint('check_cantidad_unidades_no_negativa', 'facturas', 'cantidad_unidades >= 0')
+
+    # Las bases creadas sólo con migraciones todavía usan `factura_id`: los
+    # totales se recalculan en e7c2a4b9f150, después de renombrarla.
+    if 'id_factura' not in {c['name'] for c in sa.inspect(op.get_bind()).get_columns('detalle_factura')}:
+        return
+
+    # El total también se recalcula: antes se acumulaba con float. Si alguno
+    # cambia, reconstruir el resumen con `flask resumenes reconstruir`.
+    op.execute(
+        "UPDATE facturas SET "
+        "cantidad_lineas = (SELECT COUNT(*) FROM detalle_factura d WHERE d.id_factura = facturas.id), "
+        "cantidad_unidades = (SELECT COALESCE(SUM(d.cantidad), 0) FROM detalle_factura d WHERE d.id_factura = facturas.id), "
+        "total = (SELECT COALESCE(SUM(d.subtotal), 0) FROM detalle_factura d WHERE d.id_factura = facturas.id) "
+        "WHERE EXISTS (SELECT 1 FROM detalle_factura d WHERE d.id_factura = facturas.id)"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('check_cantidad_unidades_no_negativa', 'facturas', type_='check')
+        op.drop_constraint('check_cantidad_lineas_no_negativa', 'facturas', type_='check')
+        op.drop_column('facturas', 'cantidad_unidades')
+        op.drop_column('facturas', 'cantidad_lineas')
+        return
+
+    # Las bases creadas con `db.create_all()` tienen las restricciones CHECK
+    # de los modelos, que SQLite no deja sin su columna: hay que recrear la
+    # tabla, y con las claves foráneas apagadas para no borrar las líneas.
+    existentes = {c['name'] for c in sa.inspect(op.get_bind()).get_check_constraints('facturas')}
+    with op.get_context().autocommit_block():
+        op.execute('PRAGMA foreign_keys=OFF')
+    with op.batch_alter_table('facturas', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        for restriccion in ('check_cantidad_unidades_no_negativa', 'check_cantidad_lineas_no_negativa'):
+            if restriccion in existentes:
+                batch_op.drop_constraint(restriccion, type_='check')
+        batch_op.drop_column('cantidad_unidades')
+        batch_op.drop_column('cantidad_lineas')
+    with op.get_context().autocommit_block():
+        op.execute('PRAGMA foreign_keys=ON')
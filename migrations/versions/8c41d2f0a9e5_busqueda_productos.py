@@ -0,0 +1,41 @@
+"""busqueda de productos
+
+Revision ID: 8c41d2f0a9e5
+Revises: 3b9e2c7d41a0
+Create Date: 2026-10-18 12:05:47.118203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2f0a9e5'
+down_revision = '3b9e2c7d41a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('productos', schema=None) as batch_op:
+        batch_op.create_index('idx_producto_descripcion', ['descripcion', 'id'], unique=False)
+
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5("
+            "descripcion, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        op.execute("INSERT INTO productos_fts (rowid, descripcion) SELECT id, descripcion FROM productos")
+    elif op.get_bind().dialect.name == 'postgresql':
+        # La búsqueda sin FTS compara lower(descripcion) por prefijo (ver services/busqueda.py).
+        op.execute("CREATE INDEX idx_producto_descripcion_minusculas ON productos "
+                   "(lower(descripcion) text_pattern_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS productos_fts")
+    elif op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS idx_producto_descripcion_minusculas")
+
+    with op.batch_alter_table('productos', schema=None) as batch_op:
+        batch_op.drop_index('idx_producto_descripcion')
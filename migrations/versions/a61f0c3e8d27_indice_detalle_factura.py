@@ -0,0 +1,27 @@
+"""indice de lineas por factura
+
+Revision ID: a61f0c3e8d27
+Revises: 5d7a1e93c2b4
+Create Date: 2026-10-18 16:02:44.270915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61f0c3e8d27'
+down_revision = '5d7a1e93c2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Con el esquema de la migración inicial (`factura_id`) lo crea e7c2a4b9f150.
+    if 'id_factura' not in {c['name'] for c in sa.inspect(op.get_bind()).get_columns('detalle_factura')}:
+        return
+    op.create_index('idx_detalle_factura_factura', 'detalle_factura', ['id_factura'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_detalle_factura_factura', table_name='detalle_factura')
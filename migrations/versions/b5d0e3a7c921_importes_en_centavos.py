@@ -0,0 +1,90 @@
+"""importes en centavos
+
+Revision ID: b5d0e3a7c921
+Revises: e7c2a4b9f150
+Create Date: 2026-10-18 19:26:13.408255
+
+Precios, subtotales, totales y montos del resumen pasan de Numeric(10,2) a
+BIGINT con el importe en centavos (ver app/services/dinero.py).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d0e3a7c921'
+down_revision = 'e7c2a4b9f150'
+branch_labels = None
+depends_on = None
+
+# tabla: [(columna, tipo anterior)]
+IMPORTES = {
+    'productos': [('precio', sa.Numeric(10, 2))],
+    'facturas': [('total', sa.Numeric(10, 2))],
+    'detalle_factura': [('precio_unitario', sa.Numeric(10, 2)), ('subtotal', sa.Numeric(10, 2))],
+    'ventas_diarias': [('monto', sa.Numeric(12, 2))],
+}
+
+# Para multiplicar por 100 sin desbordar la precisión de la columna original.
+INTERMEDIO = sa.Numeric(14, 2)
+
+
+def _sin_claves_foraneas(activar):
+    # Recrear una tabla en SQLite borra la original: con las claves foráneas
+    # activas se borrarían en cascada las filas hijas. Ver e7c2a4b9f150.
+    with op.get_context().autocommit_block():
+        op.execute(f"PRAGMA foreign_keys={'ON' if activar else 'OFF'}")
+
+
+def _a_centavos(tabla, columna):
+    op.execute(f'UPDATE {tabla} SET {columna} = ROUND({columna} * 100)')
+
+
+def _a_pesos(tabla, columna):
+    op.execute(f'UPDATE {tabla} SET {columna} = {columna} / 100.0')
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite guarda NUMERIC como REAL: se multiplica en el lugar y el
+        # batch copia la tabla con CAST(... AS BIGINT).
+        _sin_claves_foraneas(False)
+        for tabla, columnas in IMPORTES.items():
+            for columna, _ in columnas:
+                _a_centavos(tabla, columna)
+            autoincremento = {'sqlite_autoincrement': True} if tabla != 'ventas_diarias' else {}
+            with op.batch_alter_table(tabla, table_kwargs=autoincremento) as batch_op:
+                for columna, anterior in columnas:
+                    batch_op.alter_column(columna, existing_type=anterior, type_=sa.BigInteger(),
+                                          existing_nullable=False)
+        _sin_claves_foraneas(True)
+        return
+
+    for tabla, columnas in IMPORTES.items():
+        for columna, anterior in columnas:
+            op.alter_column(tabla, columna, existing_type=anterior, type_=INTERMEDIO, existing_nullable=False)
+            _a_centavos(tabla, columna)
+            op.alter_column(tabla, columna, existing_type=INTERMEDIO, type_=sa.BigInteger(),
+                            existing_nullable=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        _sin_claves_foraneas(False)
+        for tabla, columnas in IMPORTES.items():
+            autoincremento = {'sqlite_autoincrement': True} if tabla != 'ventas_diarias' else {}
+            with op.batch_alter_table(tabla, table_kwargs=autoincremento) as batch_op:
+                for columna, anterior in columnas:
+                    batch_op.alter_column(columna, existing_type=sa.BigInteger(), type_=anterior,
+                                          existing_nullable=False)
+            for columna, _ in columnas:
+                _a_pesos(tabla, columna)
+        _sin_claves_foraneas(True)
+        return
+
+    for tabla, columnas in IMPORTES.items():
+        for columna, anterior in columnas:
+            op.alter_column(tabla, columna, existing_type=sa.BigInteger(), type_=INTERMEDIO,
+                            existing_nullable=False)
+            _a_pesos(tabla, columna)
+            op.alter_column(tabla, columna, existing_type=INTERMEDIO, type_=anterior, existing_nullable=False)
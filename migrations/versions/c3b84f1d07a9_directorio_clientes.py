@@ -0,0 +1,23 @@
+"""directorio de clientes
+
+Revision ID: c3b84f1d07a9
+Revises: a61f0c3e8d27
+Create Date: 2026-10-18 17:11:36.804552
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3b84f1d07a9'
+down_revision = 'a61f0c3e8d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_cliente_nombre', 'clientes', ['nombre', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_cliente_nombre', table_name='clientes')
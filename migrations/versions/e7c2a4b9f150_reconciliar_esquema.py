@@ -0,0 +1,218 @@
+"""reconciliar esquema con los modelos e indices compuestos
+
+Revision ID: e7c2a4b9f150
+Revises: c3b84f1d07a9
+Create Date: 2026-10-18 18:04:52.617390
+
+La migración inicial no coincide con `app/models.py`: usa `cliente_id`,
+`factura_id` y `producto_id`, guarda importes en Float y tiene columnas que
+los modelos no conocen (`numero`, `codigo`, `activo`, `rol`, ...). Las bases
+creadas con `db.create_all()` ya tienen la forma de los modelos, así que cada
+paso inspecciona la tabla y sólo se aplica si encuentra el esquema viejo.
+
+Las columnas sobrantes se descartan (la aplicación nunca las leyó) y la
+bajada sólo revierte los índices y, en SQLite, las restricciones CHECK que
+5d7a1e93c2b4 necesita quitar para eliminar sus columnas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c2a4b9f150'
+down_revision = 'c3b84f1d07a9'
+branch_labels = None
+depends_on = None
+
+# En SQLite las claves foráneas reflejadas no tienen nombre; con esta
+# convención el batch les asigna uno para poder eliminarlas.
+CONVENCION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _columnas(tabla):
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns(tabla)}
+
+
+def _indices(tabla):
+    return {i['name'] for i in sa.inspect(op.get_bind()).get_indexes(tabla)}
+
+
+def _clave_foranea(tabla, columna):
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(tabla):
+        if fk['constrained_columns'] == [columna]:
+            return fk['name'] or f"fk_{tabla}_{columna}_{fk['referred_table']}"
+    return None
+
+
+def _reconciliar_usuarios():
+    columnas = _columnas('usuarios')
+    if 'cliente_id' not in columnas and 'rol' not in columnas:
+        return
+    fk = _clave_foranea('usuarios', 'cliente_id')
+    with op.batch_alter_table('usuarios', naming_convention=CONVENCION) as batch_op:
+        if fk:
+            batch_op.drop_constraint(fk, type_='foreignkey')
+        for columna in ('rol', 'cliente_id'):
+            if columna in columnas:
+                batch_op.drop_column(columna)
+
+
+def _reconciliar_clientes():
+    columnas = _columnas('clientes')
+    if 'password_hash' in columnas:
+        return
+    # El modelo exige email: los que falten reciben uno que no puede iniciar sesión.
+    op.execute("UPDATE clientes SET email = 'cliente' || id || '@sin-email.invalid' WHERE email IS NULL")
+    with op.batch_alter_table('clientes', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.add_column(sa.Column('password_hash', sa.String(length=256), nullable=True))
+        batch_op.add_column(sa.Column('es_cliente', sa.Boolean(), server_default=sa.true(), nullable=True))
+        for columna in ('uq_clientes_cuit', 'fecha_alta', 'activo'):
+            if columna in columnas:
+                batch_op.drop_column(columna)
+        batch_op.alter_column('email', existing_type=sa.String(length=120), nullable=False)
+
+
+def _reconciliar_productos():
+    columnas = _columnas('productos')
+    if 'codigo' not in columnas:
+        return
+    op.execute("UPDATE productos SET stock = 0 WHERE stock IS NULL")
+    with op.batch_alter_table('productos', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        for columna in ('codigo', 'stock_minimo', 'activo'):
+            if columna in columnas:
+                batch_op.drop_column(columna)
+        batch_op.alter_column('precio', existing_type=sa.Float(), type_=sa.Numeric(10, 2),
+                              existing_nullable=False)
+        batch_op.alter_column('stock', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_check_constraint('check_precio_positivo', 'precio >= 0')
+        batch_op.create_check_constraint('check_stock_no_negativo', 'stock >= 0')
+
+
+def _reconciliar_facturas():
+    columnas = _columnas('facturas')
+    if 'cliente_id' not in columnas:
+        return
+    op.execute("UPDATE facturas SET total = 0 WHERE total IS NULL")
+    fk = _clave_foranea('facturas', 'cliente_id')
+    with op.batch_alter_table('facturas', naming_convention=CONVENCION,
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        if fk:
+            batch_op.drop_constraint(fk, type_='foreignkey')
+        batch_op.alter_column('cliente_id', new_column_name='id_cliente', existing_type=sa.Integer(),
+                              existing_nullable=False)
+        for columna in ('numero', 'fecha_vencimiento', 'pagada', 'anulada', 'fecha_anulacion'):
+            if columna in columnas:
+                batch_op.drop_column(columna)
+        batch_op.alter_column('total', existing_type=sa.Float(), type_=sa.Numeric(10, 2), nullable=False)
+    # En el mismo batch que el renombre, SQLite descartaría la clave nueva.
+    with op.batch_alter_table('facturas', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.create_foreign_key('fk_facturas_id_cliente_clientes', 'clientes', ['id_cliente'], ['id'],
+                                    ondelete='RESTRICT')
+        batch_op.create_check_constraint('check_total_no_negativo', 'total >= 0')
+        if op.get_bind().dialect.name == 'sqlite':
+            # En los otros motores ya las agregó 5d7a1e93c2b4.
+            batch_op.create_check_constraint('check_cantidad_lineas_no_negativa', 'cantidad_lineas >= 0')
+            batch_op.create_check_constraint('check_cantidad_unidades_no_negativa', 'cantidad_unidades >= 0')
+
+
+def _reconciliar_detalle():
+    columnas = _columnas('detalle_factura')
+    if 'factura_id' not in columnas:
+        return
+    fks = [_clave_foranea('detalle_factura', 'factura_id'), _clave_foranea('detalle_factura', 'producto_id')]
+    with op.batch_alter_table('detalle_factura', naming_convention=CONVENCION,
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        for fk in fks:
+            if fk:
+                batch_op.drop_constraint(fk, type_='foreignkey')
+        batch_op.alter_column('factura_id', new_column_name='id_factura', existing_type=sa.Integer(),
+                              existing_nullable=False)
+        batch_op.alter_column('producto_id', new_column_name='id_producto', existing_type=sa.Integer(),
+                              existing_nullable=False)
+        for columna in ('precio_unitario', 'subtotal'):
+            batch_op.alter_column(columna, existing_type=sa.Float(), type_=sa.Numeric(10, 2),
+                                  existing_nullable=False)
+    with op.batch_alter_table('detalle_factura', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        batch_op.create_foreign_key('fk_detalle_factura_id_factura_facturas', 'facturas', ['id_factura'], ['id'],
+                                    ondelete='CASCADE')
+        batch_op.create_foreign_key('fk_detalle_factura_id_producto_productos', 'productos', ['id_producto'],
+                                    ['id'], ondelete='CASCADE')
+        batch_op.create_check_constraint('check_cantidad_positiva', 'cantidad > 0')
+        batch_op.create_check_constraint('check_precio_unitario_positivo', 'precio_unitario >= 0')
+        batch_op.create_check_constraint('check_subtotal_positivo', 'subtotal >= 0')
+
+    # Lo que 5d7a1e93c2b4 no pudo calcular con las columnas viejas.
+    op.execute(
+        "UPDATE facturas SET "
+        "cantidad_lineas = (SELECT COUNT(*) FROM detalle_factura d WHERE d.id_factura = facturas.id), "
+        "cantidad_unidades = (SELECT COALESCE(SUM(d.cantidad), 0) FROM detalle_factura d WHERE d.id_factura = facturas.id), "
+        "total = (SELECT COALESCE(SUM(d.subtotal), 0) FROM detalle_factura d WHERE d.id_factura = facturas.id) "
+        "WHERE EXISTS (SELECT 1 FROM detalle_factura d WHERE d.id_factura = facturas.id)"
+    )
+
+
+def _crear_indices(tabla, indices):
+    existentes = _indices(tabla)
+    for nombre, columnas, unico in indices:
+        if nombre not in existentes:
+            op.create_index(nombre, tabla, columnas, unique=unico)
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        # Recrear una tabla en SQLite es copiarla y borrar la original: con las
+        # claves foráneas activas, el DROP borraría en cascada (o rechazaría)
+        # las filas hijas. El PRAGMA no tiene efecto dentro de una transacción.
+        with op.get_context().autocommit_block():
+            op.execute('PRAGMA foreign_keys=OFF')
+
+    _reconciliar_usuarios()
+    _reconciliar_clientes()
+    _reconciliar_productos()
+    _reconciliar_facturas()
+    _reconciliar_detalle()
+
+    _crear_indices('usuarios', [('idx_usuario_email', ['email'], True)])
+    _crear_indices('clientes', [('idx_cliente_email', ['email'], True), ('idx_cliente_nombre', ['nombre', 'id'], False)])
+    _crear_indices('productos', [('idx_producto_descripcion', ['descripcion', 'id'], False)])
+    if 'idx_factura_cliente' in _indices('facturas'):
+        # El compuesto lo reemplaza: empieza por la misma columna.
+        op.drop_index('idx_factura_cliente', table_name='facturas')
+    _crear_indices('facturas', [
+        ('idx_factura_cliente_fecha', ['id_cliente', 'fecha', 'id'], False),
+        ('idx_factura_fecha', ['fecha'], False),
+    ])
+    _crear_indices('detalle_factura', [
+        ('idx_detalle_factura_factura', ['id_factura'], False),
+        ('idx_detalle_factura_producto', ['id_producto'], False),
+    ])
+
+    if sqlite:
+        with op.get_context().autocommit_block():
+            huerfanas = op.get_bind().exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+            op.execute('PRAGMA foreign_keys=ON')
+        if huerfanas:
+            raise RuntimeError(f'{len(huerfanas)} fila(s) violan claves foráneas después de reconciliar: '
+                               f'{huerfanas[:10]}')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        # Las agregó `_reconciliar_facturas`; con ellas, SQLite no puede
+        # eliminar las columnas al bajar 5d7a1e93c2b4.
+        existentes = {c['name'] for c in sa.inspect(op.get_bind()).get_check_constraints('facturas')}
+        quitar = [r for r in ('check_cantidad_lineas_no_negativa', 'check_cantidad_unidades_no_negativa')
+                  if r in existentes]
+        if quitar:
+            with op.get_context().autocommit_block():
+                op.execute('PRAGMA foreign_keys=OFF')
+            with op.batch_alter_table('facturas', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+                for restriccion in quitar:
+                    batch_op.drop_constraint(restriccion, type_='check')
+            with op.get_context().autocommit_block():
+                op.execute('PRAGMA foreign_keys=ON')
+
+    op.drop_index('idx_detalle_factura_producto', table_name='detalle_factura')
+    op.drop_index('idx_factura_cliente_fecha', table_name='facturas')
+    op.create_index('idx_factura_cliente', 'facturas', ['id_cliente'], unique=False)
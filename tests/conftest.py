@@ -0,0 +1,102 @@
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from config import TestingConfig, config
+
+from benchmarks.datos import DEFECTOS, generar
+from benchmarks.presupuesto_sql import PARAMETROS, factura_de_cliente, recorrer, valores_casos
+
+
+def _crear_app(directorio, **opciones):
+    """App de pruebas sobre `directorio/pruebas.db`; logs y PDFs también quedan en `directorio`."""
+    from app import create_app
+
+    config['pytest'] = type('PytestConfig', (TestingConfig,), dict(
+        {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{directorio / 'pruebas.db'}",
+            'LOG_FILE': os.fspath(directorio / 'logs' / 'sis_facturacion.log'),
+            'PDF_CACHE_DIR': os.fspath(directorio / 'pdf'),
+        },
+        **opciones,
+    ))
+    return create_app('pytest')
+
+
+@pytest.fixture
+def crear_app(tmp_path):
+    """Crea una app con el esquema vacío en un archivo SQLite propio de la prueba."""
+    from app import db
+    from app.services import cache, seguridad
+
+    def crear(**opciones):
+        app = _crear_app(tmp_path, **opciones)
+        with app.app_context():
+            db.create_all()
+        return app
+
+    for c in cache.REGISTRO.values():
+        c.limpiar()
+    seguridad._intentos.clear()
+    yield crear
+    seguridad.cerrar_pool()
+
+
+@pytest.fixture
+def app_facturas(crear_app):
+    """App con un admin, un cliente, un producto (stock 100) y 11 facturas de una línea.
+
+    Las fechas, desde el 2 de marzo de 2026, se repiten de a tres.
+    """
+    from app import db
+    from app.models import Cliente, DetalleFactura, Factura, Producto, Usuario
+
+    app = crear_app()
+    inicio = datetime(2026, 3, 2, 10, 0)
+    with app.app_context():
+        admin = Usuario(nombre='Administrador', email='admin@prueba.example.com')
+        admin.password = 'secreto1'
+        cliente = Cliente(nombre='Cliente', email='cliente@prueba.example.com')
+        producto = Producto(descripcion='Producto', precio=Decimal('10.00'), stock=100)
+        db.session.add_all([admin, cliente, producto])
+        db.session.flush()
+        for i in range(11):
+            factura = Factura(id_cliente=cliente.id, fecha=inicio + timedelta(hours=i // 3))
+            factura.detalles.append(DetalleFactura(id_producto=producto.id, cantidad=1,
+                                                   precio_unitario=Decimal('10.00'), subtotal=Decimal('10.00')))
+            factura.calcular_total()
+            db.session.add(factura)
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def sesion_admin(app_facturas):
+    """Crea clientes de pruebas con la sesión del admin de `app_facturas` (uno por hilo)."""
+    def crear():
+        web = app_facturas.test_client()
+        web.post('/auth/login', data={'email': 'admin@prueba.example.com', 'password': 'secreto1'})
+        return web
+    return crear
+
+
+@pytest.fixture
+def web_admin(sesion_admin):
+    return sesion_admin()
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """App de pruebas sobre un archivo SQLite temporal con el conjunto de datos de `presupuesto_sql`."""
+    app = _crear_app(tmp_path_factory.mktemp('app'))
+    generar(app, **dict(DEFECTOS, **PARAMETROS))
+    return app
+
+
+@pytest.fixture(scope='session')
+def mediciones(app):
+    """Una `Medicion` por caso de `CASOS`: se recorren todos y en orden, porque unos dependen de otros."""
+    valores = dict(valores_casos(dict(DEFECTOS, **PARAMETROS)), factura_cliente=factura_de_cliente(app, 1))
+    return recorrer(app, valores)
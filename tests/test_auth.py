@@ -0,0 +1,40 @@
+import pytest
+
+from app import db
+from app.models import Usuario
+
+EMAIL = 'cajero@prueba.example.com'
+PASSWORD = 'secreto1'
+
+
+@pytest.fixture
+def app(crear_app):
+    app = crear_app()
+    with app.app_context():
+        usuario = Usuario(nombre='Cajero', email=EMAIL)
+        usuario.password = PASSWORD
+        db.session.add(usuario)
+        db.session.commit()
+    return app
+
+
+def _login(app, password=PASSWORD):
+    return app.test_client().post('/auth/login', data={'email': EMAIL, 'password': password})
+
+
+def test_inicios_correctos_no_agotan_el_limite_de_la_ip(app):
+    for _ in range(app.config['LOGIN_MAX_INTENTOS_IP'] + 10):
+        assert _login(app).status_code == 302
+
+
+def test_intentos_fallidos_agotan_el_limite_de_la_ip(app):
+    app.config['LOGIN_MAX_INTENTOS_EMAIL'] = 1000
+    for _ in range(app.config['LOGIN_MAX_INTENTOS_IP']):
+        assert _login(app, 'incorrecta').status_code == 200
+    assert _login(app).status_code == 429
+
+
+def test_verificacion_que_no_responde_a_tiempo_devuelve_503(app):
+    # El pool recién creado tarda más en arrancar que el límite de espera.
+    app.config.update(PASSWORD_VERIFY_WORKERS=1, PASSWORD_VERIFY_TIMEOUT=0.001)
+    assert _login(app).status_code == 503
@@ -0,0 +1,21 @@
+import io
+import zipfile
+
+from app.models import Factura
+from app.services import documentos
+
+
+def test_lote_zip_recorre_varios_bloques(app_facturas, web_admin, monkeypatch):
+    # Bloques de 4 con fechas repetidas de a 3: los cortes caen entre facturas de la misma fecha.
+    monkeypatch.setattr(documentos, 'LOTE', 4)
+    with app_facturas.app_context():
+        ids = sorted(f.id for f in Factura.query)
+
+    respuesta = web_admin.get('/facturas/pdf/lote?fecha_desde=2026-03-01&fecha_hasta=2026-03-31&cliente_id=0')
+
+    assert respuesta.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(respuesta.get_data())) as archivo:
+        nombres = archivo.namelist()
+        assert all(archivo.read(nombre).startswith(b'%PDF') for nombre in nombres)
+    assert len(ids) > documentos.LOTE * 2
+    assert sorted(nombres) == [f'factura_{i:08d}.pdf' for i in ids]
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from app import db
+from app.models import Factura, Producto
+from app.services import facturacion
+
+STOCK = 5
+
+
+@pytest.fixture
+def producto(app_facturas):
+    with app_facturas.app_context():
+        db.session.execute(db.update(Producto).values(stock=STOCK))
+        db.session.commit()
+        return db.session.query(Producto.id).scalar()
+
+
+def _lote(id_producto, cantidad):
+    return {'facturas': [{'id_cliente': 1, 'items': [{'id_producto': id_producto, 'cantidad': cantidad}]}]}
+
+
+def _en_hilo(funcion):
+    resultado = {}
+    hilo = threading.Thread(target=lambda: resultado.update(respuesta=funcion()))
+    hilo.start()
+    return hilo, resultado
+
+
+def _estado(app):
+    with app.app_context():
+        return db.session.query(Producto.stock).scalar(), db.session.query(db.func.count(Factura.id)).scalar()
+
+
+def test_ventas_concurrentes_no_venden_por_debajo_de_cero(app_facturas, sesion_admin, producto, monkeypatch):
+    # La primera venta se demora entre validar y reservar, con el lock de
+    # escritura tomado; la segunda tiene que esperarla y validar el stock nuevo.
+    reservar = facturacion.reservar_stock
+    validada = threading.Event()
+
+    def reservar_demorado(cantidades):
+        if not validada.is_set():
+            validada.set()
+            time.sleep(0.3)
+        reservar(cantidades)
+
+    monkeypatch.setattr(facturacion, 'reservar_stock', reservar_demorado)
+    primera, segunda = sesion_admin(), sesion_admin()
+    facturas_antes = _estado(app_facturas)[1]
+
+    hilo_1, venta_1 = _en_hilo(lambda: primera.post('/api/facturas/lote', json=_lote(producto, STOCK)))
+    assert validada.wait(5)
+    hilo_2, venta_2 = _en_hilo(lambda: segunda.post('/api/facturas/lote', json=_lote(producto, STOCK)))
+    hilo_1.join(10)
+    hilo_2.join(10)
+
+    assert venta_1['respuesta'].status_code == 200
+    assert venta_1['respuesta'].get_json()['creadas'] == 1
+    assert venta_2['respuesta'].status_code == 200
+    rechazo = venta_2['respuesta'].get_json()
+    assert rechazo['creadas'] == 0
+    assert rechazo['resultados'][0]['error'] == 'Cantidad supera el stock disponible'
+    assert _estado(app_facturas) == (0, facturas_antes + 1)
+
+
+def test_reserva_con_stock_ya_vendido_devuelve_409(app_facturas, sesion_admin, producto, monkeypatch):
+    # Sin el lock de `iniciar_escritura` (motores sin bloqueo de filas), otra
+    # venta puede confirmarse entre la validación y la reserva: el UPDATE
+    # condicional no descuenta y el lote entero se revierte.
+    cargar = facturacion._cargar_productos
+    validada, vendida = threading.Event(), threading.Event()
+
+    def cargar_y_esperar(ids):
+        productos = cargar(ids)
+        validada.set()
+        assert vendida.wait(5)
+        return productos
+
+    monkeypatch.setattr(facturacion, 'iniciar_escritura', lambda: None)
+    monkeypatch.setattr(facturacion, '_cargar_productos', cargar_y_esperar)
+    primera, segunda = sesion_admin(), sesion_admin()
+    facturas_antes = _estado(app_facturas)[1]
+
+    hilo_1, venta_1 = _en_hilo(lambda: primera.post('/api/facturas/lote', json=_lote(producto, 4)))
+    assert validada.wait(5)
+    monkeypatch.setattr(facturacion, '_cargar_productos', cargar)
+    venta_2 = segunda.post('/api/facturas/lote', json=_lote(producto, 3))
+    vendida.set()
+    hilo_1.join(10)
+
+    assert venta_2.get_json()['creadas'] == 1
+    assert venta_1['respuesta'].status_code == 409
+    assert _estado(app_facturas) == (STOCK - 3, facturas_antes + 1)
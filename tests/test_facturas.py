@@ -0,0 +1,26 @@
+from decimal import Decimal
+
+from app import db
+from app.models import Factura
+
+
+def _otro_proceso(app, sentencia):
+    """Ejecuta `sentencia` por una conexión aparte, sin pasar por la caché de este proceso."""
+    with app.app_context(), db.engine.begin() as conexion:
+        conexion.execute(sentencia)
+
+
+def test_vista_en_cache_de_factura_eliminada_en_otro_worker(app_facturas, web_admin):
+    assert web_admin.get('/facturas/1').status_code == 200
+    _otro_proceso(app_facturas, db.delete(Factura).where(Factura.id == 1))
+
+    assert web_admin.get('/facturas/1').status_code == 404
+    assert web_admin.get('/api/facturas/1').status_code == 404
+    assert web_admin.get('/facturas/1/pdf').status_code == 404
+
+
+def test_vista_en_cache_se_regenera_si_cambian_los_totales(app_facturas, web_admin):
+    assert web_admin.get('/api/facturas/2').get_json()['total'] == '10.00'
+    _otro_proceso(app_facturas, db.update(Factura).where(Factura.id == 2).values(total=Decimal('12.50')))
+
+    assert web_admin.get('/api/facturas/2').get_json()['total'] == '12.50'
@@ -0,0 +1,15 @@
+import pytest
+
+from benchmarks.planes_sql import hallar
+from benchmarks.presupuesto_sql import CASOS
+
+
+def _id(indice):
+    caso = CASOS[indice]
+    return f'{indice:02d} {caso.metodo} {caso.url}'
+
+
+@pytest.mark.parametrize('indice', range(len(CASOS)), ids=_id)
+def test_sin_recorridos_completos(app, mediciones, indice):
+    hallados = hallar(app, mediciones[indice])
+    assert not hallados, '\n'.join(f'recorre {tabla} completa: {sentencia[:200]}' for tabla, sentencia, _ in hallados)
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from benchmarks.presupuesto_sql import CASOS, problemas, sin_presupuesto
+
+# Multiplica los límites de tiempo en máquinas lentas o CI compartida.
+FACTOR_TIEMPO = float(os.environ.get('PRESUPUESTO_FACTOR_TIEMPO', '1'))
+
+
+def _id(indice):
+    caso = CASOS[indice]
+    return f'{indice:02d} {caso.metodo} {caso.url}'
+
+
+@pytest.mark.parametrize('indice', range(len(CASOS)), ids=_id)
+def test_caso_dentro_del_presupuesto(mediciones, indice):
+    medicion = mediciones[indice]
+    encontrados = problemas(medicion, FACTOR_TIEMPO)
+    assert not encontrados, '; '.join(encontrados) + ''.join(f'\n    {s[:200]}' for s in medicion.sentencias)
+
+
+def test_todos_los_endpoints_tienen_presupuesto(app):
+    assert sin_presupuesto(app) == []